@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+HOUR_NS = 3600 * 10**9
+
+def to_utc_ns(datetimes) -> np.ndarray:
+    index = pd.DatetimeIndex(datetimes)
+    if index.tz is None:
+        raise ValueError("timestamps must be timezone-aware to be aligned")
+    return index.tz_convert('UTC').as_unit('ns').asi8
+
+def canonical_index(start, end) -> np.ndarray:
+    # hourly UTC grid as int64 nanoseconds, both ends included
+    first = -(-to_utc_ns([start])[0] // HOUR_NS) * HOUR_NS
+    last = to_utc_ns([end])[0] // HOUR_NS * HOUR_NS
+    # integer steps, np.arange(first, last, HOUR_NS) miscounts at nanosecond epoch magnitudes
+    return first + HOUR_NS * np.arange(max((last - first) // HOUR_NS + 1, 0), dtype=np.int64)
+
+def right_label(df: pd.DataFrame) -> pd.DataFrame:
+    # aggregate raw readings to hourly means with closed='left', label='right':
+    # readings in [10:00, 11:00) belong to the value labelled 11:00
+    times = to_utc_ns(df['Datetime'])
+    labels = (times // HOUR_NS + 1) * HOUR_NS
+    df = df.drop(columns='Datetime').groupby(labels, sort=True).mean(numeric_only=True)
+    df.index = pd.DatetimeIndex(df.index, tz='UTC')
+    return df.reset_index(names='Datetime')
+
+def _positions(times: np.ndarray, index: np.ndarray) -> np.ndarray:
+    # row of the source for every canonical hour, -1 where the source has no row
+    if len(times) == 0:
+        return np.full(len(index), -1)
+    pos = np.minimum(np.searchsorted(times, index), len(times) - 1)
+    return np.where(times[pos] == index, pos, -1)
+
+def align_source(df: pd.DataFrame, index: np.ndarray, name: str = 'source', raw: bool = False) -> tuple[pd.DataFrame, dict]:
+    if raw:
+        df = right_label(df)
+    times = to_utc_ns(df['Datetime'])
+    if (times % HOUR_NS).any():
+        raise ValueError(f"{name} has timestamps off the hourly grid, align it with raw=True")
+    if not (np.diff(times) > 0).all():
+        order = np.argsort(times, kind='stable')
+        df, times = df.iloc[order], times[order]
+        if (np.diff(times) == 0).any():
+            raise ValueError(f"{name} has duplicate timestamps")
+
+    take = _positions(times, index)
+    columns = {column: pd.api.extensions.take(df[column].to_numpy(), take, allow_fill=True)
+               for column in df.columns if column != 'Datetime'}
+    aligned = pd.DataFrame(columns)
+
+    present = (take >= 0) & aligned.notna().any(axis=1).to_numpy() if len(columns) else take >= 0
+    return aligned, _coverage(name, index, present)
+
+def _coverage(name: str, index: np.ndarray, present: np.ndarray) -> dict:
+    missing = np.r_[False, ~present, False].astype(np.int8)
+    run_starts = np.flatnonzero(np.diff(missing) == 1)
+    run_ends = np.flatnonzero(np.diff(missing) == -1)
+    rows = np.flatnonzero(present)
+    return {'source': name,
+            'hours': len(index),
+            'present': len(rows),
+            'coverage': len(rows) / len(index) if len(index) else np.nan,
+            'gaps': len(run_starts),
+            'max_gap_hours': int((run_ends - run_starts).max()) if len(run_starts) else 0,
+            'first': pd.Timestamp(index[rows[0]], tz='UTC') if len(rows) else pd.NaT,
+            'last': pd.Timestamp(index[rows[-1]], tz='UTC') if len(rows) else pd.NaT}
+
+def align_sources(sources: dict, start=None, end=None, raw: tuple = (), tz: str = 'UTC') -> tuple[pd.DataFrame, pd.DataFrame]:
+    # left join onto the span of the first source unless start/end are given
+    names = list(sources)
+    first = sources[names[0]]['Datetime']
+    index = canonical_index(first.min() if start is None else start, first.max() if end is None else end)
+
+    frames, coverage, seen = [], [], set()
+    for name in names:
+        aligned, report = align_source(sources[name], index, name=name, raw=name in raw)
+        clash = seen.intersection(aligned.columns)
+        if clash:
+            raise ValueError(f"{name} repeats columns {sorted(clash)}")
+        seen.update(aligned.columns)
+        frames.append(aligned)
+        coverage.append(report)
+
+    datetimes = pd.DatetimeIndex(index, tz='UTC').tz_convert(tz)
+    df = pd.concat([pd.DataFrame({'Datetime': datetimes})] + frames, axis=1)
+    return df, pd.DataFrame(coverage)
@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# out to a year of hourly lags, so yearly seasonality is visible next to the daily and weekly one
+ACF_LAGS = 24*366
+PACF_LAGS = 24*8
+PERIODS = [24, 24*7]
+# calendar keys of the profile moments: one table by year, month, weekday and hour (season profiles
+# reduce from it) and one by day of the year, each far smaller than the hourly data
+PROFILE_GROUPS = [['Year', 'Month', 'DayOfWeek', 'Hour'], ['DayOfYear']]
+SEASONS = {12: 'Winter', 1: 'Winter', 2: 'Winter', 3: 'Spring', 4: 'Spring', 5: 'Spring',
+           6: 'Summer', 7: 'Summer', 8: 'Summer', 9: 'Autumn', 10: 'Autumn', 11: 'Autumn'}
+
+def acf_fft(values: np.ndarray, nlags: int = ACF_LAGS) -> np.ndarray:
+    # autocorrelation of every column of an (n, columns) array in one zero-padded FFT, (nlags + 1, columns).
+    # Missing values are left out: the sum over each lag is scaled by its share of valid pairs, which
+    # equals the usual biased estimator (statsmodels acf, adjusted=False) when nothing is missing
+    from scipy import fft
+
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    n = len(values)
+    nlags = min(nlags, n - 1)
+    valid = ~np.isnan(values)
+    x = np.where(valid, values - np.nanmean(values, axis=0), 0.0)
+    size = fft.next_fast_len(2 * n - 1, real=True)
+
+    def lagged_sums(a: np.ndarray) -> np.ndarray:
+        spectrum = fft.rfft(a, n=size, axis=0, workers=-1)
+        return fft.irfft(spectrum * spectrum.conj(), n=size, axis=0, workers=-1)[:nlags + 1]
+
+    sums = lagged_sums(x)
+    if valid.all():
+        return sums / sums[0]
+    pairs = np.rint(lagged_sums(valid.astype(float)))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        acov = np.where(pairs > 0, sums / pairs, np.nan) * ((n - np.arange(nlags + 1)) / n)[:, None]
+    return acov / acov[0]
+
+def pacf_durbin_levinson(acf: np.ndarray, nlags: int = PACF_LAGS) -> np.ndarray:
+    # partial autocorrelation from the acf (Durbin-Levinson recursion), all columns at once
+    acf = np.asarray(acf, dtype=float)
+    if acf.ndim == 1:
+        acf = acf[:, None]
+    nlags = min(nlags, len(acf) - 1)
+    pacf = np.zeros((nlags + 1, acf.shape[1]))
+    pacf[0] = 1.0
+    phi = np.zeros((nlags + 1, acf.shape[1]))
+    variance = np.ones(acf.shape[1])
+    for k in range(1, nlags + 1):
+        reflection = (acf[k] - np.einsum('ij,ij->j', phi[1:k], acf[k - 1:0:-1])) / variance
+        phi[1:k] = phi[1:k] - reflection * phi[k - 1:0:-1]
+        phi[k] = reflection
+        variance = variance * (1 - reflection ** 2)
+        pacf[k] = reflection
+    return pacf
+
+def decompose(values: np.ndarray, period: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # additive decomposition of every column: centered moving-average trend, the mean detrended value
+    # per phase of the period as seasonal pattern (centered to mean 0), and the residual
+    from scipy.ndimage import correlate1d
+
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    n = len(values)
+    # 2 x period moving average for even periods, so the window is centered on the hour
+    kernel = np.r_[0.5, np.ones(period - 1), 0.5] / period if period % 2 == 0 else np.ones(period) / period
+    half = len(kernel) // 2
+    missing = np.isnan(values)
+    trend = correlate1d(np.where(missing, 0.0, values), kernel, axis=0, mode='constant')
+    # hours whose window is cut by the edges or contains a missing value get no trend
+    gaps = correlate1d(missing.astype(float), np.ones(len(kernel)), axis=0, mode='constant') > 0
+    gaps[:half] = gaps[n - half:] = True
+    trend[gaps] = np.nan
+
+    detrended = values - trend
+    phases = np.full((period * int(np.ceil(n / period)), values.shape[1]), np.nan)
+    phases[:n] = detrended
+    pattern = np.nanmean(phases.reshape(-1, period, values.shape[1]), axis=0)
+    pattern -= pattern.mean(axis=0)
+    seasonal = np.tile(pattern, (int(np.ceil(n / period)), 1))[:n]
+    return trend, seasonal, values - trend - seasonal
+
+def seasonal_strength(seasonal: np.ndarray, residual: np.ndarray) -> np.ndarray:
+    # 1 - var(residual) / var(seasonal + residual), between 0 (no seasonality) and 1
+    keep = ~np.isnan(residual)
+    strength = np.empty(seasonal.shape[1])
+    for j in range(seasonal.shape[1]):
+        total = np.var(seasonal[keep[:, j], j] + residual[keep[:, j], j])
+        strength[j] = max(0.0, 1 - np.var(residual[keep[:, j], j]) / total) if total > 0 else 0.0
+    return strength
+
+def profile_moments(df: pd.DataFrame, columns: list[str]) -> list[pd.DataFrame]:
+    # count, sum and sum of squares of every column per key group of PROFILE_GROUPS; profiles over
+    # any subset of a group's keys are reduced from these tables without touching the data again
+    datetimes = df['Datetime'].dt
+    keys = pd.DataFrame({'Year': datetimes.year, 'Month': datetimes.month, 'DayOfYear': datetimes.dayofyear,
+                         'DayOfWeek': datetimes.dayofweek, 'Hour': datetimes.hour}, index=df.index)
+    values = df[columns].astype(float)
+    frame = pd.concat([keys, values, (values ** 2).add_suffix('|sq'), values.notna().astype(float).add_suffix('|n')], axis=1)
+    tables = []
+    for group in PROFILE_GROUPS:
+        moments = frame.drop(columns=[key for key in keys if key not in group]).groupby(group, sort=True).sum(min_count=1)
+        moments = moments.reset_index()
+        moments.columns = [f"{column}|sum" if column in columns else column for column in moments.columns]
+        tables.append(moments)
+    return tables
+
+def profile(moments: list[pd.DataFrame], column: str, by: list[str]) -> pd.DataFrame:
+    # mean and std of a column per key, e.g. by=['Season', 'Hour']; 'Season' is derived from 'Month'
+    needed = {'Month' if key == 'Season' else key for key in by}
+    tables = [table for table in moments if needed <= set(table.columns)]
+    if not tables:
+        raise KeyError(f"no profile moments by {by}")
+    moments = tables[0]
+    moments = moments.assign(Season=moments['Month'].map(SEASONS)) if 'Season' in by else moments
+    grouped = moments.groupby(by, sort=True)[[f"{column}|n", f"{column}|sum", f"{column}|sq"]].sum()
+    n, total, squares = (grouped[f"{column}|{part}"] for part in ('n', 'sum', 'sq'))
+    mean = total / n
+    # sample std like DataFrame.groupby().std()
+    std = np.sqrt(((squares - n * mean ** 2) / (n - 1)).clip(lower=0))
+    return pd.DataFrame({'mean': mean, 'std': std, 'count': n}).reset_index()
+
+def dataset_fingerprint(df: pd.DataFrame, columns: list[str], params: dict) -> str:
+    # hash of the hours, the analysed columns and the settings the statistics were computed with
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(df['Datetime'].to_numpy(dtype='datetime64[ns]').view(np.int64)).tobytes())
+    digest.update(json.dumps([columns, params], sort_keys=True).encode())
+    digest.update(np.ascontiguousarray(df[columns].to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+# autocorrelation, partial autocorrelation, seasonal patterns and calendar profiles of many columns
+# of an hourly dataset, computed together and stored under the dataset fingerprint, so plots and
+# lag selection read them instead of recomputing
+class SeriesAnalytics:
+    def __init__(self, columns: list[str], n_obs: np.ndarray, acf: np.ndarray, pacf: np.ndarray,
+                 patterns: dict[int, np.ndarray], strength: dict[int, np.ndarray], moments: list[pd.DataFrame]):
+        self.columns = list(columns)
+        self.n_obs = n_obs
+        self.acf = acf
+        self.pacf = pacf
+        self.patterns = patterns
+        self.strength = strength
+        self.moments = moments
+
+    @classmethod
+    def compute(cls, df: pd.DataFrame, columns: list[str], nlags: int = ACF_LAGS, pacf_lags: int = PACF_LAGS,
+                periods: list[int] = PERIODS) -> 'SeriesAnalytics':
+        # df has an hourly 'Datetime' column without gaps in the hours
+        values = df[columns].to_numpy(dtype=float)
+        acf = acf_fft(values, nlags)
+        patterns, strength = {}, {}
+        for period in periods:
+            _, seasonal, residual = decompose(values, period)
+            patterns[period] = seasonal[:period]
+            strength[period] = seasonal_strength(seasonal, residual)
+        return cls(columns, (~np.isnan(values)).sum(axis=0), acf, pacf_durbin_levinson(acf, pacf_lags),
+                   patterns, strength, profile_moments(df, columns))
+
+    def _column(self, column: str) -> int:
+        return self.columns.index(column)
+
+    def acf_of(self, column: str) -> pd.Series:
+        return pd.Series(self.acf[:, self._column(column)], name=column).rename_axis('lag')
+
+    def pacf_of(self, column: str) -> pd.Series:
+        return pd.Series(self.pacf[:, self._column(column)], name=column).rename_axis('lag')
+
+    def confidence(self, column: str) -> float:
+        # half-width of the approximate 95% band of a white-noise acf
+        return 1.96 / np.sqrt(self.n_obs[self._column(column)])
+
+    def profile(self, column: str, by: list[str]) -> pd.DataFrame:
+        return profile(self.moments, column, by)
+
+    def summary(self) -> pd.DataFrame:
+        # seasonal strength per column and period
+        return pd.DataFrame({f"strength_{period}h": values for period, values in self.strength.items()},
+                            index=self.columns)
+
+    def save(self, root: str) -> None:
+        root = Path(root)
+        tmp = root.with_name(root.name + '.tmp')
+        tmp.mkdir(parents=True, exist_ok=True)
+        np.savez(tmp / 'arrays.npz', n_obs=self.n_obs, acf=self.acf, pacf=self.pacf,
+                 **{f"pattern_{period}": pattern for period, pattern in self.patterns.items()},
+                 **{f"strength_{period}": strength for period, strength in self.strength.items()})
+        for i, moments in enumerate(self.moments):
+            moments.to_parquet(tmp / f"moments_{i}.parquet", index=False)
+        (tmp / 'meta.json').write_text(json.dumps({'columns': self.columns, 'periods': list(self.patterns),
+                                                  'profiles': len(self.moments)}))
+        os.replace(tmp, root)
+
+    @classmethod
+    def load(cls, root: str) -> 'SeriesAnalytics':
+        root = Path(root)
+        meta = json.loads((root / 'meta.json').read_text())
+        arrays = np.load(root / 'arrays.npz')
+        return cls(meta['columns'], arrays['n_obs'], arrays['acf'], arrays['pacf'],
+                   {period: arrays[f"pattern_{period}"] for period in meta['periods']},
+                   {period: arrays[f"strength_{period}"] for period in meta['periods']},
+                   [pd.read_parquet(root / f"moments_{i}.parquet") for i in range(meta['profiles'])])
+
+def analytics_for(df: pd.DataFrame, columns: list[str], nlags: int = ACF_LAGS, pacf_lags: int = PACF_LAGS,
+                  periods: list[int] = PERIODS, cache_root: str = 'data/cache/analytics') -> SeriesAnalytics:
+    # cached statistics of the columns, computed only when the data or the settings changed
+    params = {'nlags': nlags, 'pacf_lags': pacf_lags, 'periods': list(periods), 'profiles': PROFILE_GROUPS}
+    path = Path(cache_root) / dataset_fingerprint(df, columns, params)[:16]
+    if path.exists():
+        return SeriesAnalytics.load(path)
+    analytics = SeriesAnalytics.compute(df, columns, nlags, pacf_lags, periods)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    analytics.save(path)
+    return analytics
+
+def select_lags(analytics: SeriesAnalytics, column: str = 'Power', max_short: int = 48, n_seasonal: int = 6,
+                min_acf: float = 0.3) -> list[int]:
+    # lags for a forecaster: the significant partial autocorrelations up to max_short hours, plus the
+    # strongest daily multiples beyond that (acf peaks at 24 k hours, e.g. a week or a year back)
+    pacf = analytics.pacf_of(column).to_numpy()
+    acf = analytics.acf_of(column).to_numpy()
+    band = analytics.confidence(column)
+    short = [lag for lag in range(1, min(max_short, len(pacf) - 1) + 1) if abs(pacf[lag]) > band]
+
+    daily = np.arange(24 * (max_short // 24 + 1), len(acf), 24)
+    daily = daily[acf[daily] > min_acf]
+    seasonal = daily[np.argsort(acf[daily])[::-1][:n_seasonal]]
+    return sorted(set(short) | {int(lag) for lag in seasonal})
+
+if __name__ == "__main__":
+    from dataset_store import read_dataset
+
+    parser = argparse.ArgumentParser(description="Precompute autocorrelation and seasonality statistics of the dataset")
+    parser.add_argument('--columns', nargs='+', default=['Power', 'Grid Load', 'Residual Load', 'Temperature'])
+    parser.add_argument('--lags', type=int, default=ACF_LAGS)
+    args = parser.parse_args()
+
+    df = read_dataset('data/dataset', columns=args.columns)
+    analytics = analytics_for(df, args.columns, nlags=args.lags)
+    print(analytics.summary())
+    print("suggested lags for Power:", select_lags(analytics, 'Power'))
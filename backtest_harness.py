@@ -0,0 +1,180 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from feature_store import EXOG_FEATURES, FeatureStore
+
+WINDOW_FEATURES = {'stats': ['mean', 'std', 'min', 'max'],
+                   'window_sizes': [24*3, 24*7, 24*7, 24*7]}
+
+# forecaster configurations as plain dicts, so they can be shipped to worker processes
+MODEL_REGISTRY = {
+    'seasonal_naive': {'forecaster': 'equivalent_date', 'offset_days': 1, 'n_offsets': 1},
+    'lgbm_recursive': {'forecaster': 'recursive', 'estimator': 'lightgbm', 'lags': 24*7,
+                       'window_features': WINDOW_FEATURES, 'params': {'random_state': 123, 'verbose': -1}},
+    'lgbm_recursive_exog': {'forecaster': 'recursive', 'estimator': 'lightgbm', 'lags': 24*7,
+                            'window_features': WINDOW_FEATURES, 'exog': EXOG_FEATURES,
+                            'params': {'random_state': 123, 'verbose': -1}},
+    'xgb_recursive': {'forecaster': 'recursive', 'estimator': 'xgboost', 'lags': 24*7,
+                      'window_features': WINDOW_FEATURES, 'params': {'random_state': 123}},
+    'rf_recursive': {'forecaster': 'recursive', 'estimator': 'random_forest', 'lags': 24*7,
+                     'window_features': WINDOW_FEATURES, 'params': {'n_estimators': 100, 'random_state': 123}},
+}
+
+def build_estimator(name: str, params: dict, n_jobs: int):
+    if name == 'lightgbm':
+        from lightgbm import LGBMRegressor
+        return LGBMRegressor(n_jobs=n_jobs, **params)
+    if name == 'xgboost':
+        from xgboost import XGBRegressor
+        return XGBRegressor(n_jobs=n_jobs, **params)
+    if name == 'random_forest':
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(n_jobs=n_jobs, **params)
+    raise ValueError(f"unknown estimator '{name}'")
+
+def build_forecaster(config: dict, n_jobs: int = 1):
+    from skforecast.preprocessing import RollingFeatures
+    from skforecast.recursive import ForecasterEquivalentDate, ForecasterRecursive
+
+    if config['forecaster'] == 'equivalent_date':
+        return ForecasterEquivalentDate(offset=pd.DateOffset(days=config['offset_days']), n_offsets=config['n_offsets'])
+    if config['forecaster'] == 'recursive':
+        window_features = RollingFeatures(**config['window_features']) if config.get('window_features') else None
+        estimator = build_estimator(config['estimator'], config.get('params', {}), n_jobs)
+        return ForecasterRecursive(estimator=estimator, lags=config['lags'], window_features=window_features)
+    raise ValueError(f"unknown forecaster '{config['forecaster']}'")
+
+def _limit_threads(threads: int) -> None:
+    # set before the ML backends start their OpenMP/BLAS pools in this worker
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[variable] = str(threads)
+
+def run_job(name: str, config: dict, df_power: pd.DataFrame, cv_kwargs: dict, threads: int,
+            matrix_spec: dict | None = None, feature_path: str | None = None) -> dict:
+    from threadpoolctl import threadpool_limits
+    from skforecast.model_selection import TimeSeriesFold
+    from feature_cache import LagMatrix
+    from toy_model import backtest_series, backtesting
+
+    start = time.perf_counter()
+    exog = None
+    if config.get('exog'):
+        # memory-mapped features written once by the parent process
+        exog = FeatureStore.load(feature_path).exog_for(backtest_series(df_power).index, config['exog'])
+    shm, matrix = LagMatrix.attach(matrix_spec) if matrix_spec else (None, None)
+    try:
+        with threadpool_limits(limits=threads):
+            forecaster = build_forecaster(config, n_jobs=threads)
+            metric, predictions = backtesting(df_power, forecaster, TimeSeriesFold(**cv_kwargs), matrix=matrix, exog=exog)
+    finally:
+        if shm is not None:
+            del matrix
+            shm.close()
+    wall_time = time.perf_counter() - start
+
+    predictions = predictions[['pred']].rename_axis('Datetime').reset_index().assign(model=name)
+    return {'model': name,
+            'mean_absolute_error': float(metric['mean_absolute_error'].iloc[0]),
+            'wall_time_s': wall_time,
+            'folds': predictions.shape[0] // cv_kwargs['steps'],
+            'threads': threads,
+            'predictions': predictions}
+
+def _shared_matrices(df_power: pd.DataFrame, registry: dict, features: FeatureStore | None = None) -> tuple[list, dict]:
+    # one lag/window matrix per distinct feature set, built here and attached read-only by the workers
+    from feature_cache import LagMatrix
+    from toy_model import backtest_series
+
+    y = backtest_series(df_power)
+    values = y.to_numpy(dtype=float)
+    blocks, specs, by_features = [], {}, {}
+    for name, config in registry.items():
+        if config['forecaster'] != 'recursive':
+            continue
+        window_features = config.get('window_features') or {'stats': [], 'window_sizes': []}
+        exog_columns = config.get('exog') or []
+        key = (config['lags'], tuple(window_features['stats']), tuple(window_features['window_sizes']), tuple(exog_columns))
+        if key not in by_features:
+            exog = features.rows(y.index[0], y.index[-1], exog_columns) if exog_columns else None
+            matrix = LagMatrix(values, range(1, config['lags'] + 1), window_features['stats'], window_features['window_sizes'],
+                               exog=exog)
+            shm, by_features[key] = matrix.share()
+            blocks.append(shm)
+        specs[name] = by_features[key]
+    return blocks, specs
+
+def compare_models(df_power: pd.DataFrame, cv_kwargs: dict, registry: dict | None = None,
+                   workers: int | None = None, output_dir: str | None = 'results',
+                   cached: bool = False, features: FeatureStore | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    registry = registry or MODEL_REGISTRY
+    if features is None and any(config.get('exog') for config in registry.values()):
+        raise ValueError("models with exog need a FeatureStore")
+    cpus = os.cpu_count() or 1
+    workers = workers or min(len(registry), cpus)
+    threads = max(1, cpus // workers)
+    blocks, specs = _shared_matrices(df_power, registry, features) if cached else ([], {})
+    feature_dir = tempfile.TemporaryDirectory(prefix='features_') if features is not None else None
+    if feature_dir is not None:
+        features.save(feature_dir.name)
+
+    # spawn, so no worker inherits an OpenMP runtime already initialized in this process
+    context = multiprocessing.get_context('spawn')
+    rows, predictions = [], []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_limit_threads, initargs=(threads,)) as executor:
+            futures = {name: executor.submit(run_job, name, config, df_power, cv_kwargs, threads, specs.get(name),
+                                             feature_dir and feature_dir.name)
+                       for name, config in registry.items()}
+            for name, future in futures.items():
+                try:
+                    result = future.result()
+                except Exception as error:
+                    rows.append({'model': name, 'threads': threads, 'error': repr(error)})
+                    continue
+                predictions.append(result.pop('predictions'))
+                rows.append(result)
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+        if feature_dir is not None:
+            feature_dir.cleanup()
+
+    results = pd.DataFrame(rows)
+    predictions = pd.concat(predictions, ignore_index=True) if predictions else pd.DataFrame()
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        results.to_csv(Path(output_dir) / 'backtests.csv', index=False)
+        if len(predictions):
+            predictions.to_parquet(Path(output_dir) / 'backtest_predictions.parquet', index=False)
+
+    return results, predictions
+
+if __name__ == "__main__":
+    from dataset_store import read_dataset
+
+    parser = argparse.ArgumentParser(description="Backtest the registered forecasters in parallel")
+    parser.add_argument('--models', nargs='+', choices=list(MODEL_REGISTRY), default=list(MODEL_REGISTRY))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cached', action='store_true', help="share one lag/window matrix across folds and workers")
+    args = parser.parse_args()
+
+    registry = {name: MODEL_REGISTRY[name] for name in args.models}
+    exog_columns = sorted({column for config in registry.values() for column in config.get('exog') or []})
+    df = read_dataset('data/dataset', columns=['Power'] + exog_columns)
+    features = FeatureStore.build(df, columns=exog_columns) if exog_columns else None
+    df_power = df.set_index('Datetime').sort_index()[['Power']]
+    data_train = df_power.loc['2015-01-01':'2024-02-29'].asfreq('h')
+    cv_kwargs = {'steps': 24, 'initial_train_size': len(data_train['Power']), 'refit': True}
+
+    results, _ = compare_models(df_power, cv_kwargs, registry, workers=args.workers, cached=args.cached,
+                                features=features)
+    print(results)
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+# running state of one rolling statistic for many origins at once. Windows move by one value per
+# recursive step, so sums are updated with the entering/leaving value and min/max combine a
+# precomputed suffix extreme of the observed window with the running extreme of the predictions
+class _RollingState:
+    def __init__(self, stat: str, size: int, values: np.ndarray, window_size: int):
+        self.stat, self.size = stat, size
+        tail = values[:, window_size - size:window_size]
+        if stat in ('mean', 'sum', 'std'):
+            # shift by the window mean so the sum of squares does not cancel catastrophically
+            self.shift = tail.mean(axis=1)
+            centred = tail - self.shift[:, None]
+            self.sum = centred.sum(axis=1)
+            self.sumsq = (centred ** 2).sum(axis=1)
+        elif stat in ('min', 'max'):
+            reduce = np.minimum if stat == 'min' else np.maximum
+            self.reduce = reduce
+            # suffix[:, k] is the extreme of tail[:, k:], the observed part of the window after k steps
+            self.suffix = reduce.accumulate(tail[:, ::-1], axis=1)[:, ::-1]
+            self.running = None
+
+    def value(self, values: np.ndarray, t: int, step: int) -> np.ndarray:
+        if self.stat == 'mean':
+            return self.shift + self.sum / self.size
+        if self.stat == 'sum':
+            return self.sum + self.shift * self.size
+        if self.stat == 'std':
+            var = (self.sumsq - self.sum ** 2 / self.size) / (self.size - 1)
+            return np.sqrt(np.maximum(var, 0.0))
+        if self.stat in ('min', 'max'):
+            if step >= self.size:
+                return self.reduce.reduce(values[:, t - self.size:t], axis=1)
+            observed = self.suffix[:, step]
+            return observed if self.running is None else self.reduce(observed, self.running)
+        return getattr(np, self.stat)(values[:, t - self.size:t], axis=1)
+
+    def update(self, values: np.ndarray, t: int) -> None:
+        # values[:, t] just entered the window, values[:, t - size] left it
+        if self.stat in ('mean', 'sum', 'std'):
+            entering = values[:, t] - self.shift
+            leaving = values[:, t - self.size] - self.shift
+            self.sum += entering - leaving
+            self.sumsq += entering ** 2 - leaving ** 2
+        elif self.stat in ('min', 'max'):
+            self.running = values[:, t] if self.running is None else self.reduce(self.running, values[:, t])
+
+def raw_predictor(estimator):
+    # the fitted LightGBM booster skips the sklearn wrapper's per-call input checks, which dominate
+    # when only a few rows are predicted per step; other estimators are used as they are
+    if type(estimator).__name__ == 'LGBMRegressor':
+        return estimator.booster_
+    return estimator
+
+def predict_batched(estimator, windows: np.ndarray, lags, stats=(), sizes=(), steps: int = 24,
+                    exog: np.ndarray | None = None, noise: np.ndarray | None = None) -> np.ndarray:
+    # windows: (n_origins, window_size) observed values before each origin, exog: optional
+    # (n_origins, steps, n_exog) known future inputs, noise: optional (n_origins, steps) values added
+    # to each prediction before it is fed back (bootstrap paths). One estimator.predict call per
+    # step serves all origins; returns (n_origins, steps)
+    lags = np.asarray(lags, dtype=np.int64)
+    window_size = windows.shape[1]
+    values = np.empty((windows.shape[0], window_size + steps))
+    values[:, :window_size] = windows
+    states = [_RollingState(stat, size, values, window_size) for stat, size in zip(stats, sizes)]
+
+    n_exog = 0 if exog is None else exog.shape[2]
+    X = np.empty((windows.shape[0], len(lags) + len(states) + n_exog))
+    for step in range(steps):
+        t = window_size + step
+        X[:, :len(lags)] = values[:, t - lags]
+        for k, state in enumerate(states):
+            X[:, len(lags) + k] = state.value(values, t, step)
+        if n_exog:
+            # skforecast puts exog after the lags and window features
+            X[:, len(lags) + len(states):] = exog[:, step]
+        values[:, t] = estimator.predict(X)
+        if noise is not None:
+            values[:, t] += noise[:, step]
+        for state in states:
+            state.update(values, t)
+
+    return values[:, window_size:]
+
+def origin_windows(values: np.ndarray, origins, window_size: int) -> np.ndarray:
+    # (n_origins, window_size) view of the observations preceding each origin position
+    origins = np.asarray(origins, dtype=np.int64)
+    if (origins < window_size).any() or (origins > len(values)).any():
+        raise ValueError(f"origins need {window_size} observations before them")
+    return np.lib.stride_tricks.sliding_window_view(values, window_size)[origins - window_size]
+
+def origin_exog(exog: np.ndarray, origins, steps: int) -> np.ndarray:
+    # (n_origins, steps, n_exog) view of the exog rows each origin forecasts
+    origins = np.asarray(origins, dtype=np.int64)
+    if (origins < 0).any() or (origins + steps > len(exog)).any():
+        raise ValueError(f"exog must cover the {steps} hours after every origin")
+    return np.lib.stride_tricks.sliding_window_view(exog, steps, axis=0)[origins].transpose(0, 2, 1)
+
+def predict_origins(forecaster, y: pd.Series, origins, steps: int = 24, exog: pd.DataFrame | None = None) -> pd.DataFrame:
+    # forecasts of a fitted ForecasterRecursive from many origins (positions or timestamps in y);
+    # rows are origins (first forecast hour), columns the steps ahead. A forecaster fitted with
+    # exog needs exog indexed by time, covering the steps hours after every origin
+    from feature_cache import window_spec
+
+    if forecaster.differentiation is not None or forecaster.transformer_y is not None:
+        raise ValueError("batched prediction does not support differentiation or transformer_y")
+    origins = pd.Index(origins)
+    if not pd.api.types.is_integer_dtype(origins):
+        origins = pd.Index(y.index.get_indexer(origins))
+        if (origins < 0).any():
+            raise KeyError("some origins are not in the index of y")
+    stats, sizes = window_spec(forecaster.window_features)
+    values = y.to_numpy(dtype=float)
+    windows = origin_windows(values, origins, forecaster.window_size)
+    index = y.index[0] + origins.to_numpy() * pd.Timedelta(y.index.freq)
+    future = None
+    if forecaster.exog_in_:
+        if exog is None:
+            raise ValueError("the forecaster was fitted with exog, pass exog for the forecast hours")
+        exog = exog[forecaster.exog_names_in_]
+        positions = exog.index.get_indexer(index)
+        if (positions < 0).any():
+            raise KeyError("some origins are not in the index of exog")
+        future = origin_exog(exog.to_numpy(dtype=float), positions, steps)
+    predictions = predict_batched(forecaster.estimator, windows, forecaster.lags, stats, sizes, steps, future)
+    return pd.DataFrame(predictions, index=index, columns=range(1, steps + 1))
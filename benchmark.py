@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from fixture_server import FixtureServer, synthetic_hourly
+
+# the synthetic data ends where toy_model's backtest series ends
+END = '2024-03-03'
+DATASET_STAGES = ['smard_fetch', 'public_holidays', 'school_holidays', 'weather', 'merge']
+MODEL_STAGES = ['backtest_baseline', 'backtest_lgbm', 'backtest_lgbm_cached', 'backtest_lgbm_refit',
+                'backtest_lgbm_refit_cached', 'predict_24']
+STAGES = DATASET_STAGES + MODEL_STAGES
+
+def measure(func, repeat: int = 3, memory: bool = True) -> dict:
+    # best and mean wall time over repeat runs; peak memory from one extra traced run, so tracing
+    # does not slow the timed ones. tracemalloc sees Python and numpy allocations, not the native
+    # buffers of LightGBM or XGBoost. func returns a dict of counts (rows, folds, ...) of one run
+    times, counts = [], {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        counts = func() or {}
+        times.append(time.perf_counter() - start)
+    result = {'wall_s': min(times), 'mean_s': float(np.mean(times)), 'repeat': repeat, **counts}
+    for name, count in counts.items():
+        result[f"{name}_per_s"] = count / result['wall_s'] if result['wall_s'] > 0 else None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result
+
+def environment() -> dict:
+    import lightgbm
+    import sklearn
+    import skforecast
+
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {'revision': revision, 'python': platform.python_version(), 'machine': platform.machine(),
+            'cpus': os.cpu_count(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'skforecast': skforecast.__version__, 'lightgbm': lightgbm.__version__, 'sklearn': sklearn.__version__}
+
+def dataset_stages(server: FixtureServer, start: pd.Timestamp, end: pd.Timestamp, repeat: int, memory: bool,
+                   stages: list[str]) -> dict:
+    # create_dataset.py steps against the stand-in: SMARD download, holidays, weather, merge
+    from meteostat import Hourly
+    from create_dataset import (CONSUMPTION, FORCASTED_GENERATION, GENERATION, fetch_holiday_data,
+                                fetch_smard_groups, fetch_weather_data, merge_sources, scrap_school_holidays_data)
+    from holiday_calendar import HolidayCalendar
+    from smard_client import SmardClient
+
+    years = list(range(start.year, end.year + 1))
+    results, data = {}, {}
+
+    def smard():
+        requests_before = server.requests
+        # no rate limit, the stand-in is local and the client pool is what is measured
+        with SmardClient(base_url=server.url('smard'), rate_limit=None) as client:
+            data['smard'] = fetch_smard_groups(start.to_pydatetime(), end.to_pydatetime(),
+                                               [CONSUMPTION, GENERATION, FORCASTED_GENERATION],
+                                               region='50Hertz', resolution='hour', client=client)
+        return {'rows': len(data['smard'][0]), 'chunks': server.requests - requests_before}
+
+    def public_holidays():
+        data['holidays'] = fetch_holiday_data(years, base_url=server.url('digidates'))
+        return {'years': len(years)}
+
+    def school_holidays():
+        data['school'] = scrap_school_holidays_data(years[0], years[-1], base_url=server.url('schulferien'))
+        return {'years': len(years)}
+
+    def weather():
+        endpoint, max_age = Hourly.endpoint, Hourly.max_age
+        Hourly.endpoint, Hourly.max_age = server.url('meteostat') + '/', 0
+        try:
+            data['weather'] = fetch_weather_data(start.tz_convert(None), end.tz_convert(None), station_id='10382')
+        finally:
+            Hourly.endpoint, Hourly.max_age = endpoint, max_age
+        return {'rows': len(data['weather'])}
+
+    def merge():
+        calendar = HolidayCalendar.from_frames(data['holidays'], data['school'], years=years)
+        df, _ = merge_sources(*data['smard'], data['weather'], calendar)
+        return {'rows': len(df)}
+
+    # the merge needs the outputs of the fetch stages, so they run whenever merge is asked for
+    steps = {'smard_fetch': smard, 'public_holidays': public_holidays, 'school_holidays': school_holidays,
+             'weather': weather, 'merge': merge}
+    needed = set(stages) | ({'smard_fetch', 'public_holidays', 'school_holidays', 'weather'} if 'merge' in stages else set())
+    for name, func in steps.items():
+        if name in needed:
+            bytes_before = server.bytes_sent
+            results[name] = measure(func, repeat, memory)
+            results[name]['bytes_per_run'] = (server.bytes_sent - bytes_before) / (repeat + memory)
+    return {name: result for name, result in results.items() if name in stages}
+
+def model_stages(y: pd.Series, folds: int, repeat: int, memory: bool, stages: list[str],
+                 n_estimators: int = 100) -> dict:
+    # toy_model.py steps on synthetic Power: backtests over the last folds days and 24-step predictions
+    from lightgbm import LGBMRegressor
+    from skforecast.model_selection import TimeSeriesFold
+    from skforecast.preprocessing import RollingFeatures
+    from skforecast.recursive import ForecasterRecursive
+    from toy_model import backtesting, baseline, forecaster_recursive
+
+    df_power = y.to_frame('Power')
+    data_train = df_power.iloc[:-24 * folds]
+    window_features = RollingFeatures(stats=['mean', 'std', 'min', 'max'], window_sizes=[24*3, 24*7, 24*7, 24*7])
+    results, models = {}, {}
+
+    def fitted_lgbm():
+        if 'lgbm' not in models:
+            models['lgbm'] = forecaster_recursive(LGBMRegressor(n_estimators=n_estimators, random_state=123, verbose=-1),
+                                                  lags=24*7, window_features=window_features, data_train=data_train)
+        return models['lgbm']
+
+    def backtest_baseline():
+        cv = TimeSeriesFold(steps=24, initial_train_size=len(data_train), refit=True)
+        _, predictions = backtesting(df_power, baseline(data_train), cv)
+        return {'folds': folds, 'rows': len(predictions)}
+
+    def backtest_lgbm():
+        # one fit on the training years, then every fold predicted with it (refit=False)
+        models.pop('lgbm', None)
+        cv = TimeSeriesFold(steps=24, initial_train_size=len(data_train), refit=False)
+        _, predictions = backtesting(df_power, fitted_lgbm(), cv)
+        return {'folds': folds, 'rows': len(predictions)}
+
+    def backtest_lgbm_cached():
+        models.pop('lgbm', None)
+        cv = TimeSeriesFold(steps=24, initial_train_size=len(data_train), refit=False)
+        _, predictions = backtesting(df_power, fitted_lgbm(), cv, cached=True)
+        return {'folds': folds, 'rows': len(predictions)}
+
+    def backtest_lgbm_refit(cached: bool = False):
+        # refit before every fold, as toy_model.run_backtests does: the path the cached lag matrix
+        # saves most on, since skforecast rebuilds the training matrix for each refit
+        forecaster = ForecasterRecursive(estimator=LGBMRegressor(n_estimators=n_estimators, random_state=123, verbose=-1),
+                                         lags=24*7, window_features=window_features)
+        cv = TimeSeriesFold(steps=24, initial_train_size=len(data_train), refit=True)
+        _, predictions = backtesting(df_power, forecaster, cv, cached=cached)
+        return {'folds': folds, 'rows': len(predictions)}
+
+    def predict_24(calls: int = 50):
+        forecaster = fitted_lgbm()
+        for _ in range(calls):
+            forecaster.predict(steps=24)
+        return {'calls': calls}
+
+    steps = {'backtest_baseline': backtest_baseline, 'backtest_lgbm': backtest_lgbm,
+             'backtest_lgbm_cached': backtest_lgbm_cached, 'backtest_lgbm_refit': backtest_lgbm_refit,
+             'backtest_lgbm_refit_cached': lambda: backtest_lgbm_refit(cached=True), 'predict_24': predict_24}
+    for name, func in steps.items():
+        if name in stages:
+            results[name] = measure(func, repeat, memory)
+    if 'predict_24' in results:
+        results['predict_24']['ms_per_call'] = 1000 / results['predict_24']['calls_per_s']
+    return results
+
+def run(years: float = 3.0, folds: int = 30, repeat: int = 3, memory: bool = True, stages: list[str] | None = None,
+        fixtures: str = 'data/fixtures', record: bool = False) -> dict:
+    stages = stages or STAGES
+    end = pd.Timestamp(END, tz='Europe/Berlin')
+    start = (end - pd.Timedelta(hours=round(years * 8766))).floor('D')
+    results = {'environment': environment(),
+               'config': {'years': years, 'folds': folds, 'repeat': repeat, 'start': str(start), 'end': str(end)},
+               'created': datetime.now().isoformat(timespec='seconds'), 'stages': {}}
+
+    if set(stages) & set(DATASET_STAGES):
+        with FixtureServer(fixtures, start=start, end=end, record=record) as server:
+            results['stages'].update(dataset_stages(server, start, end, repeat, memory, stages))
+    if set(stages) & set(MODEL_STAGES):
+        # UTC hours: ForecasterEquivalentDate's DateOffset shift fails on the spring DST gap of local time
+        y = synthetic_hourly(start, end, tz='UTC').set_index('Datetime')['Power'].asfreq('h')
+        results['stages'].update(model_stages(y, folds, repeat, memory, stages))
+    return results
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.25) -> pd.DataFrame:
+    # wall time and peak memory per stage relative to a baseline result; a stage regressed when
+    # either grew by more than tolerance
+    rows = []
+    for name, result in current['stages'].items():
+        before = baseline['stages'].get(name)
+        if before is None:
+            continue
+        time_ratio = result['wall_s'] / before['wall_s'] if before['wall_s'] else np.nan
+        memory_ratio = result['peak_mb'] / before['peak_mb'] if before.get('peak_mb') and 'peak_mb' in result else np.nan
+        rows.append({'stage': name, 'wall_s': result['wall_s'], 'baseline_wall_s': before['wall_s'], 'time_ratio': time_ratio,
+                     'peak_mb': result.get('peak_mb'), 'memory_ratio': memory_ratio,
+                     'regressed': bool(time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance)})
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time dataset build, backtesting and prediction on recorded or synthetic data")
+    parser.add_argument('stages', nargs='*', help=f"default: all of {', '.join(STAGES)}")
+    parser.add_argument('--years', type=float, default=3.0, help="length of the data in years")
+    parser.add_argument('--folds', type=int, default=30, help="daily backtest folds")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced run for peak memory")
+    parser.add_argument('--fixtures', default='data/fixtures', help="recorded responses, replayed by the stand-in")
+    parser.add_argument('--record', action='store_true', help="fetch responses that are not recorded yet from the real services")
+    parser.add_argument('--out', default=None, help="default: results/benchmarks/<date>-<revision>.json")
+    parser.add_argument('--compare', default=None, help="baseline result to compare against; exits 1 on a regression")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    results = run(args.years, args.folds, args.repeat, not args.no_memory, args.stages, args.fixtures, args.record)
+    out = Path(args.out or f"results/benchmarks/{datetime.now():%Y%m%d-%H%M%S}-{results['environment']['revision'] or 'local'}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=1, default=float))
+    print(pd.DataFrame(results['stages']).T.to_string(float_format=lambda value: f"{value:.4g}"))
+    print(f"results written to {out}")
+
+    if args.compare:
+        comparison = compare(json.loads(Path(args.compare).read_text()), results, args.tolerance)
+        print(comparison.to_string(index=False, float_format=lambda value: f"{value:.3g}"))
+        if comparison['regressed'].any():
+            sys.exit(1)
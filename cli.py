@@ -0,0 +1,135 @@
+import argparse
+import sys
+import time
+
+from tracing import traced
+
+# one command line for the dataset, the backtests, forecasts and the exploration report. Every
+# subcommand imports what it needs when it runs, so --help and the baseline forecast never load
+# matplotlib, seaborn, statsmodels, scikit-learn, skforecast or the boosting libraries
+
+def cmd_build(args) -> None:
+    from datetime import datetime
+    from create_dataset import write_new_dataset, write_new_panel
+    from smard_cache import SmardCache
+
+    start, end = datetime.fromisoformat(args.start), datetime.fromisoformat(args.end) if args.end else datetime.now()
+    cache = SmardCache(args.cache)
+    if args.panel:
+        panel = write_new_panel(start, end, args.panel_root, cache=cache)
+        print(panel.groupby(['region', 'series'], observed=True)['value'].count())
+        return
+    df, coverage = write_new_dataset(start, end, args.csv, args.root, cache=cache, weather_path=args.weather_cache,
+                                     regional_weather=args.regional_weather)
+    print(coverage)
+    print(f"{len(df)} hours written to {args.csv} and {args.root}/")
+
+def cmd_update(args) -> None:
+    from create_dataset import append_new_hours
+    from smard_cache import SmardCache
+
+    df = append_new_hours(args.csv, args.root, cache=SmardCache(args.cache))
+    print(f"appended {len(df)} hours")
+
+def cmd_backtest(args) -> None:
+    from toy_model import run_backtests
+
+    for name, mae in run_backtests(args.root, plot=args.plot).items():
+        print(f"{name:24s} MAE {mae:10.2f} MWh")
+
+def cmd_predict(args) -> None:
+    from forecast_server import load_model, observed_power
+
+    if args.model == 'baseline':
+        from dataset_store import read_dataset
+        from toy_model import seasonal_naive
+
+        y = observed_power(read_dataset(args.root, columns=['Power']))
+        predictions = seasonal_naive(y, args.steps, n_offsets=args.n_offsets).to_frame()
+    else:
+        try:
+            forecaster, y, features, _ = load_model(args.model, args.models, args.root, args.steps, args.forecasts)
+        except KeyError as error:
+            raise SystemExit(error.args[0])
+        future = None
+        if features is not None:
+            future = features.horizon(y.index[-1], args.steps)
+            # weather and generation columns are only observed up to the end of the dataset
+            unknown = future.columns[future.isna().any()].tolist()
+            if unknown:
+                raise SystemExit(f"{unknown} are not known for every hour from {future.index[0]}; "
+                                 f"pass their forecasts with --forecasts")
+        predictions = forecaster.predict(steps=args.steps, exog=future).to_frame('pred')
+
+    predictions.index.name = 'Datetime'
+    if args.out:
+        predictions.to_csv(args.out, sep=';')
+    else:
+        print(predictions.to_csv(sep=';'), end='')
+
+def cmd_report(args) -> None:
+    from grafical_exploration import check_figures, explore
+
+    try:
+        check_figures(args.figures)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    start = time.perf_counter()
+    timings = explore(args.root, args.figures, args.out, args.workers, args.show)
+    for name, seconds in timings.items():
+        print(f"{name:40s} {seconds:6.2f} s")
+    if not args.show:
+        print(f"report written to {args.out}/ in {time.perf_counter() - start:.1f} s")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='power-forecast', description="Electricity demand dataset, backtests and forecasts")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add(name: str, func, help: str) -> argparse.ArgumentParser:
+        sub = subparsers.add_parser(name, help=help, description=help)
+        sub.set_defaults(func=func)
+        sub.add_argument('--root', default='data/dataset', help="year-partitioned Arrow dataset")
+        sub.add_argument('--trace', default=None, help="write a Chrome trace (JSON) of the run to this path")
+        return sub
+
+    build = add('build', cmd_build, "Download SMARD, holidays and weather into a new dataset")
+    build.add_argument('--start', default='2015-01-01')
+    build.add_argument('--end', default=None, help="default: now")
+    build.add_argument('--csv', default='data/dataset.csv')
+    build.add_argument('--cache', default='data/cache/smard', help="SMARD chunk cache")
+    build.add_argument('--weather-cache', default='data/weather.csv')
+    build.add_argument('--regional-weather', action='store_true', help="average the weather of all 50Hertz stations")
+    build.add_argument('--panel', action='store_true', help="fetch every filter of all four control areas instead")
+    build.add_argument('--panel-root', default='data/panel')
+
+    update = add('update', cmd_update, "Append the hours missing since the last complete hour")
+    update.add_argument('--csv', default='data/dataset.csv')
+    update.add_argument('--cache', default='data/cache/smard', help="SMARD chunk cache")
+
+    backtest = add('backtest', cmd_backtest, "Backtest the baseline and the recursive LightGBM forecaster")
+    backtest.add_argument('--no-plot', dest='plot', action='store_false', help="only print the errors")
+
+    predict = add('predict', cmd_predict, "Forecast the hours after the end of the dataset")
+    predict.add_argument('--model', default='baseline',
+                         help="'baseline' (seasonal naive), a MODEL_REGISTRY name or a saved forecaster")
+    predict.add_argument('--models', default='models', help="saved forecasters")
+    predict.add_argument('--steps', type=int, default=24)
+    predict.add_argument('--forecasts', default=None,
+                         help="CSV (';', Datetime and exog columns) of the weather and generation forecasts of the horizon")
+    predict.add_argument('--n-offsets', type=int, default=1, help="days averaged by the baseline")
+    predict.add_argument('--out', default=None, help="CSV file, default: stdout")
+
+    report = add('report', cmd_report, "Render the exploration figures")
+    report.add_argument('figures', nargs='*', help="default: all")
+    report.add_argument('--out', default='plots')
+    report.add_argument('--workers', type=int, default=None)
+    report.add_argument('--show', action='store_true', help="show the figures one by one instead of writing them")
+    return parser
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    with traced(args.trace):
+        args.func(args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
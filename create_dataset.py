@@ -1,11 +1,30 @@
+import argparse
 from datetime import timedelta, datetime
+import os
 import re
 from meteostat import Hourly
+import numpy as np
 import pandas as pd 
 import requests
 from tqdm import tqdm
+from alignment import align_sources
+from dataset_store import append_dataset, write_dataset, write_panel
+from holiday_calendar import HolidayCalendar
+from regional_weather import STATIONS_50HERTZ, WEATHER_COLUMNS, RegionalWeather
+from smard_cache import SmardCache
+from smard_client import SmardClient, WEEK_MS
+from streaming_resample import iter_hourly
+from tracing import count, span, traced
+
+# public and school holiday sources; base_url arguments can point at a local stand-in instead
+HOLIDAY_API_URL = "https://digidates.de/api/v1/germanpublicholidays"
+SCHOOL_HOLIDAYS_URL = "https://www.schulferien.org/deutschland/ferien"
+
+def load_dataset(path: str, chunksize: int | None = None) -> pd.DataFrame:
+    if chunksize:
+        # streamed in bounded memory, same localization and resampling rules as below
+        return pd.concat(iter_hourly(path, chunksize=chunksize), ignore_index=True)
 
-def load_dataset(path: str) -> pd.DataFrame:
     df = pd.read_csv(path, delimiter=';')
     df['Datetime'] = pd.to_datetime(df['Datetime'], format='%Y-%m-%d %H:%M:00')
     df['Datetime'] = (df['Datetime']
@@ -20,67 +39,143 @@ def load_dataset(path: str) -> pd.DataFrame:
 
     return df
 
-def fetch_smard_data(start_date: datetime, end_date: datetime, filters: dict, region: str, resolution: str) -> pd.DataFrame:
-    base_url = "https://www.smard.de/app/chart_data"
+def _download_smard_series(client: SmardClient | None, start_ts: int, end_ts: int, filters: dict, region: str, resolution: str,
+                           cache: SmardCache | None = None, offline: bool = False) -> dict:
+    filter_ids = list(filters)
+    with span('smard.index', region=region, filters=len(filter_ids)):
+        if offline:
+            index = [cache.timestamps(filter_id, region, resolution) for filter_id in filter_ids]
+        else:
+            index = list(client.map(lambda filter_id: client.get_timestamps(filter_id, region, resolution), filter_ids))
+    newest = {filter_id: max(timestamps, default=None) for filter_id, timestamps in zip(filter_ids, index)}
+    jobs = [(filter_id, ts)
+            for filter_id, timestamps in zip(filter_ids, index)
+            for ts in timestamps if ts <= end_ts and ts + WEEK_MS >= start_ts]
+
+    # serve complete chunks from the cache, download the open week and anything missing
+    chunks = {}
+    if cache is not None:
+        if not offline:
+            for filter_id, timestamps in zip(filter_ids, index):
+                cache.set_timestamps(filter_id, region, resolution, timestamps)
+        for filter_id, ts in jobs:
+            if offline or cache.is_complete(filter_id, region, resolution, ts):
+                chunks[filter_id, ts] = cache.get(filter_id, region, resolution, ts)
+        chunks = {job: chunk for job, chunk in chunks.items() if chunk is not None}
+        count('smard.cache_hits', len(chunks))
+    missing = [job for job in jobs if job not in chunks]
+    if offline and missing:
+        raise FileNotFoundError(f"{len(missing)} SMARD chunks are not cached, e.g. {missing[0]}")
+
+    with span('smard.download', region=region, chunks=len(missing)):
+        downloads = client.map(lambda job: client.get_series(job[0], region, resolution, job[1]), missing) if missing else []
+        try:
+            for (filter_id, ts), chunk in tqdm(zip(missing, downloads), total=len(missing), desc="Downloading"):
+                chunks[filter_id, ts] = chunk
+                count('smard.chunks_fetched')
+                if cache is not None:
+                    cache.put(filter_id, region, resolution, ts, chunk, complete=ts != newest[filter_id])
+        finally:
+            # chunks written before a failed download stay indexed, so a retry skips them
+            if cache is not None:
+                cache.flush()
+
+    series_data = {filter_id: {} for filter_id in filter_ids}
+    for filter_id, ts in jobs:
+        for timestamp_ms, value in chunks[filter_id, ts]:
+            if timestamp_ms and start_ts <= timestamp_ms <= end_ts:
+                series_data[filter_id][timestamp_ms] = value
+
+    return series_data
+
+def _smard_frame(all_data: dict) -> pd.DataFrame:
+    with span('smard.resample', series=len(all_data)) as block:
+        df = pd.DataFrame(all_data)
+        df.index = pd.to_datetime(df.index, unit='ms', utc=True).tz_convert('Europe/Berlin')
+        df = (df.sort_index()
+                .resample('1h', closed="left", label="right")
+                .interpolate(method='linear', limit_area='inside')
+                .reset_index(names='Datetime'))
+        block.set(rows=len(df))
+        count('rows_processed', len(df))
+
+    return df
+
+def fetch_smard_data(start_date: datetime, end_date: datetime, filters: dict, region: str, resolution: str,
+                     client: SmardClient | None = None, workers: int = 8,
+                     cache: SmardCache | None = None, offline: bool = False) -> pd.DataFrame:
+    return fetch_smard_groups(start_date, end_date, [filters], region, resolution,
+                              client=client, workers=workers, cache=cache, offline=offline)[0]
+
+def fetch_smard_groups(start_date: datetime, end_date: datetime, filter_groups: list[dict], region: str, resolution: str,
+                       client: SmardClient | None = None, workers: int = 8,
+                       cache: SmardCache | None = None, offline: bool = False) -> list[pd.DataFrame]:
+    # all groups share one session and one job queue, so the pool stays busy across groups
+    if offline and cache is None:
+        raise ValueError("offline=True requires a cache")
     start_ts = int(start_date.timestamp() * 1000)
     end_ts = int(end_date.timestamp() * 1000)
+    filters = {filter_id: name for group in filter_groups for filter_id, name in group.items()}
 
-    def get_timestamps(filter_id: int) -> list[int]:
-        url = f"{base_url}/{filter_id}/{region}/index_{resolution}.json"
-        response = requests.get(url, timeout=60)
-        response.raise_for_status()
-        return response.json()["timestamps"]
-
-    def get_series(filter_id: int, timestamp: int) -> list:
-        url = f"{base_url}/{filter_id}/{region}/{filter_id}_{region}_{resolution}_{timestamp}.json"
-        response = requests.get(url, timeout=60)
-        response.raise_for_status()
-        return response.json()["series"]
-
-    all_data = {}
-    for filter_id, column_name in tqdm(filters.items(), desc="Downloading"):
-        timestamps = get_timestamps(filter_id)
-        relevant_ts = [ts for ts in timestamps if ts <= end_ts and ts + 7*24*3600*1000 >= start_ts]
-        
-        series_data = {}
-        for ts in relevant_ts:
-            for timestamp_ms, value in get_series(filter_id, ts):
-                if timestamp_ms and start_ts <= timestamp_ms <= end_ts:
-                    series_data[timestamp_ms] = value
-        
-        all_data[column_name] = series_data
-
-    df = pd.DataFrame(all_data)
-    df.index = pd.to_datetime(df.index, unit='ms', utc=True).tz_convert('Europe/Berlin')
-    df = (df.sort_index()
-            .resample('1h', closed="left", label="right")
-            .interpolate(method='linear')
-            .reset_index(names='Datetime'))
-    
-    return df
+    owns_client = client is None and not offline
+    if owns_client:
+        client = SmardClient(workers=workers)
+    try:
+        series_data = _download_smard_series(client, start_ts, end_ts, filters, region, resolution, cache=cache, offline=offline)
+    finally:
+        if owns_client:
+            client.close()
+
+    return [_smard_frame({name: series_data[filter_id] for filter_id, name in group.items()})
+            for group in filter_groups]
+
+def fetch_smard_panel(start_date: datetime, end_date: datetime, filter_groups: list[dict], regions: list[str],
+                      resolution: str = "hour", client: SmardClient | None = None, workers: int = 8,
+                      cache: SmardCache | None = None, offline: bool = False) -> pd.DataFrame:
+    # long panel (Datetime, region, series, value) of every filter in every region, one session for all
+    owns_client = client is None and not offline
+    if owns_client:
+        client = SmardClient(workers=workers)
+    frames = []
+    try:
+        for region in regions:
+            for df in fetch_smard_groups(start_date, end_date, filter_groups, region, resolution,
+                                         client=client, cache=cache, offline=offline):
+                frames.append(df.melt(id_vars='Datetime', var_name='series', value_name='value').assign(region=region))
+    finally:
+        if owns_client:
+            client.close()
 
-def fetch_holiday_data(years: list[int], region: str = 'de-be') -> pd.DataFrame:
+    panel = pd.concat(frames, ignore_index=True)[['Datetime', 'region', 'series', 'value']]
+    panel['value'] = panel['value'].astype(float)
+    panel['region'] = panel['region'].astype(pd.CategoricalDtype(regions))
+    panel['series'] = panel['series'].astype('category')
+    return panel.sort_values(['region', 'series', 'Datetime'], ignore_index=True)
+
+def fetch_holiday_data(years: list[int], region: str = 'de-be', base_url: str = HOLIDAY_API_URL) -> pd.DataFrame:
     holiday_dates = []
     for year in years:
-        url = f"https://digidates.de/api/v1/germanpublicholidays?year={year}&region={region}"
+        url = f"{base_url}?year={year}&region={region}"
         response = requests.get(url)
+        count('http.requests')
+        count('http.bytes_downloaded', len(response.content))
         holidays = response.json()
         [holiday_dates.append(pd.to_datetime(holiday)) for holiday in holidays.keys()]
 
     df_holidays = pd.DataFrame(data={"Holiday": holiday_dates})
     return df_holidays
 
-def scrap_school_holidays_data(year_start=2015, year_end=2025):
+def scrap_school_holidays_data(year_start=2015, year_end=2025, state="Berlin", base_url=SCHOOL_HOLIDAYS_URL):
     def convert(d_str, year):
         d_str = d_str.strip(".")
         day, month = map(int, d_str.split("."))
         return datetime(year, month, day)
                 
-    df_schoolholidays = pd.DataFrame({"date": pd.to_datetime([]), "holiday": []})
+    frames = [pd.DataFrame({"date": pd.to_datetime([]), "holiday": []})]
     for year in range(year_start, year_end + 1):
-        url = f"https://www.schulferien.org/deutschland/ferien/{year}/"
+        url = f"{base_url}/{year}/"
         df = pd.read_html(url)[0]
-        df_berlin = df[(df.iloc[:, 0] == "Berlin") | (df.iloc[:, 0] == "*  Berlin")].copy()
+        df_berlin = df[(df.iloc[:, 0] == state) | (df.iloc[:, 0] == f"*  {state}")].copy()
         df_berlin.dropna()
         for i in range(1,7,1):
             header = df_berlin.columns[i]
@@ -126,69 +221,80 @@ def scrap_school_holidays_data(year_start=2015, year_end=2025):
                                "Herbstferien": "5",
                                "Weihnachtsferien": "6"}
             holiday_name = holiday_mapping.get(holiday_name, holiday_name)
-            new_rows = pd.DataFrame({"date": days, "holiday": holiday_name})
-            df_schoolholidays = pd.concat([df_schoolholidays, new_rows], ignore_index=True).sort_values(by="date")
+            frames.append(pd.DataFrame({"date": days, "holiday": holiday_name}))
+    df_schoolholidays = pd.concat(frames, ignore_index=True).sort_values(by="date")
 
     # correct bridge holidays
-    bridge_holidays = {(datetime(2015, 5, 15), "7"),
-                       (datetime(2016, 5, 6), "7"),
-                       (datetime(2017, 5, 24), "7"),
-                       (datetime(2017, 5, 26), "7"),
-                       (datetime(2017, 10, 2), "7"),
-                       (datetime(2018, 4, 30), "7"),
-                       (datetime(2018, 5, 11), "7"),
-                       (datetime(2019, 5, 31), "7"),
-                       (datetime(2019, 10, 4), "7"), 
-                       (datetime(2020, 5, 8), "7"),
-                       (datetime(2020, 5, 22), "7"),
-                       (datetime(2021, 5, 14), "7"),
-                       (datetime(2021, 10, 4), "7"),
-                       (datetime(2021, 12, 23), "7"),
-                       (datetime(2022, 3, 7), "7"),
-                       (datetime(2022, 5, 27), "7"),
-                       (datetime(2023, 5, 19), "7"),
-                       (datetime(2023, 10, 2), "7"),
-                       (datetime(2024, 5, 10), "7"),
-                       (datetime(2024, 10, 4), "7"),
-                       (datetime(2025, 5, 2), "7"),
-                       (datetime(2025, 5, 30), "7")}
-    for date, holiday_code in bridge_holidays:
-        df_schoolholidays.loc[(df_schoolholidays['date'] == date), 'holiday'] = holiday_code
+    bridge_holidays = pd.to_datetime([datetime(2015, 5, 15),
+                                      datetime(2016, 5, 6),
+                                      datetime(2017, 5, 24),
+                                      datetime(2017, 5, 26),
+                                      datetime(2017, 10, 2),
+                                      datetime(2018, 4, 30),
+                                      datetime(2018, 5, 11),
+                                      datetime(2019, 5, 31),
+                                      datetime(2019, 10, 4),
+                                      datetime(2020, 5, 8),
+                                      datetime(2020, 5, 22),
+                                      datetime(2021, 5, 14),
+                                      datetime(2021, 10, 4),
+                                      datetime(2021, 12, 23),
+                                      datetime(2022, 3, 7),
+                                      datetime(2022, 5, 27),
+                                      datetime(2023, 5, 19),
+                                      datetime(2023, 10, 2),
+                                      datetime(2024, 5, 10),
+                                      datetime(2024, 10, 4),
+                                      datetime(2025, 5, 2),
+                                      datetime(2025, 5, 30)])
+    df_schoolholidays.loc[df_schoolholidays['date'].isin(bridge_holidays), 'holiday'] = "7"
 
     return df_schoolholidays
 
+def load_holiday_calendar(years, region: str = 'de-be', state: str = "Berlin", cache_path: str | None = None) -> HolidayCalendar:
+    # digidates and schulferien.org are only asked for years the cached calendar does not cover yet
+    cache_path = cache_path or f'data/cache/holidays_{region}.npz'
+    if os.path.exists(cache_path):
+        calendar = HolidayCalendar.load(cache_path)
+    elif region == 'de-be' and os.path.exists('data/holidays.csv'):
+        calendar = HolidayCalendar.from_csv('data/holidays.csv', 'data/holidays_school.csv')
+    else:
+        calendar = HolidayCalendar([], [], [], years=[])
+
+    missing = sorted({int(year) for year in years} - set(calendar.years))
+    count('holidays.cache_hits', len(set(int(year) for year in years)) - len(missing))
+    if missing:
+        with span('holidays.public', years=len(missing)):
+            df_holidays = fetch_holiday_data(years=missing, region=region)
+        with span('holidays.school', years=len(missing)):
+            # the page of the year before lists the Christmas holidays running into the first missing year
+            df_school_holidays = scrap_school_holidays_data(year_start=missing[0] - 1, year_end=missing[-1], state=state)
+        calendar = calendar.merge(HolidayCalendar.from_frames(df_holidays, df_school_holidays, years=missing))
+    if missing or not os.path.exists(cache_path):
+        calendar.save(cache_path)
+
+    return calendar
+
 def fetch_weather_data(start: pd.Timestamp, end: pd.Timestamp, station_id: str) -> pd.DataFrame:
-    df_weather = Hourly(station_id, start, end).fetch()
+    with span('weather.fetch', station=station_id):
+        df_weather = Hourly(station_id, start, end).fetch()
+    count('rows_processed', len(df_weather))
     df_weather.index = df_weather.index.tz_localize('UTC')
     df_weather = df_weather.reset_index()
 
-    df_weather = df_weather.rename(columns={
-        'time': 'Datetime',
-        'temp': 'Temperature',
-        'dwpt': 'Dew Point',
-        'rhum': 'Relative Humidity',
-        'prcp': 'Precipitation',
-        'snow': 'Snow Depth',
-        'wdir': 'Wind Direction',
-        'wspd': 'Average Wind Speed',
-        'wpgt': 'Peak Wind Speed',
-        'pres': 'Average Sea-Level Air Pressure',
-        'tsun': 'Sunshine Duration',
-        'coco': 'Weather Condition Code'
-    })
+    df_weather = df_weather.rename(columns=WEATHER_COLUMNS)
 
     return df_weather
 
-# fetch power consumption data
-consumption = {
+# power consumption filters
+CONSUMPTION = {
     410: "Grid Load",
     4359: "Residual Load",
     4387: "Pumped Storage Load"
 }
-df = fetch_smard_data(start_date=datetime(2015, 1, 1), end_date=datetime(2015, 2, 1), filters=consumption, region="50Hertz", resolution="hour")
 
-# fetch power generation data
-generation = {
+# power generation filters
+GENERATION = {
     1223: "Lignite",
     4071: "Natural Gas",
     4069: "Hard Coal",
@@ -201,46 +307,174 @@ generation = {
     4070: "Pumped Storage",
     1228: "Other Renewable",
 }
-df_generation = fetch_smard_data(start_date=datetime(2015, 1, 1), end_date=datetime(2015, 2, 1), filters=generation, region="50Hertz", resolution="hour")
 
-# fetch forcasted generation data
-forcasted_generation = {
+# forcasted generation filters
+FORCASTED_GENERATION = {
     3791: "Forecast Wind Offshore",
     123: "Forecast Wind Onshore",
     125: "Forecast Solar",
     715: "Forecast Other"
 }
-df_forcasted_generation = fetch_smard_data(start_date=datetime(2015, 1, 1), end_date=datetime(2015, 2, 1), filters=forcasted_generation, region="50Hertz", resolution="hour")
-
-# # fetch market data
-# df_market = load_dataset(path='data/day_ahead_prices.csv')
-
-# fetch holiday data
-years = df['Datetime'].dt.strftime("%Y").unique()
-df_holidays = fetch_holiday_data(years=years, region='de-be')
-
-# scrap school holidays data
-df_school_holidays = scrap_school_holidays_data()
-
-# fetch weather data
-start = df['Datetime'].min().tz_localize(None)
-end = df['Datetime'].max().tz_localize(None) + timedelta(hours=1)
-df_weather = fetch_weather_data(start=start, end=end, station_id='10582')
-df_weather.to_csv('data/weather.csv', index=False)
-
-# time-based features
-df['Holiday'] = df['Datetime'].dt.date.isin(df_holidays['Holiday'].dt.date)
-mapping = df_school_holidays.set_index('date')['holiday']
-df['SchoolHoliday'] = df['Datetime'].dt.date.map(mapping).fillna(0)
-df['Hour'] = df['Datetime'].dt.hour
-df['DayOfWeek'] = df['Datetime'].dt.dayofweek
-df['Month'] = df['Datetime'].dt.month
-df['IsWeekend'] = df['DayOfWeek'].isin([5,6]).astype(int)
-
-# merge dataframes
-df = pd.merge(df, df_weather, on=['Datetime'], how='left')
-df = pd.merge(df, df_generation, on=['Datetime'], how='left')
-# df = pd.merge(df, df_market, on=['Datetime'], how='left')
-df.to_csv('data/dataset.csv', sep=';', index=False)
-print(df.head())
-print(df.tail())
\ No newline at end of file
+
+# the four German transmission system operators (control areas)
+TSO_REGIONS = ["50Hertz", "Amprion", "TenneT", "TransnetBW"]
+
+def merge_sources(df: pd.DataFrame, df_generation: pd.DataFrame, df_forcasted_generation: pd.DataFrame,
+                  df_weather: pd.DataFrame, calendar: HolidayCalendar) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # time-based features
+    with span('merge.calendar', rows=len(df)):
+        df['Holiday'], df['SchoolHoliday'] = calendar.label(df['Datetime'])
+        df['Hour'] = df['Datetime'].dt.hour
+        df['DayOfWeek'] = df['Datetime'].dt.dayofweek
+        df['Month'] = df['Datetime'].dt.month
+        df['IsWeekend'] = df['DayOfWeek'].isin([5,6]).astype(int)
+
+    # align all sources on one UTC hourly index, spanning the consumption hours
+    with span('merge.align', rows=len(df)):
+        return align_sources({'consumption': df, 'weather': df_weather, 'generation': df_generation,
+                              'forecast': df_forcasted_generation}, tz='Europe/Berlin')
+
+def build_dataset(start_date: datetime, end_date: datetime, region: str = "50Hertz", station_id: str = '10582',
+                  cache: SmardCache | None = None, weather_path: str | None = None, return_coverage: bool = False,
+                  weather_stations: dict | None = None, client: SmardClient | None = None):
+    # download all three filter groups in one pooled run
+    with span('build.smard', region=region):
+        df, df_generation, df_forcasted_generation = fetch_smard_groups(start_date=start_date, end_date=end_date,
+                                                                        filter_groups=[CONSUMPTION, GENERATION, FORCASTED_GENERATION],
+                                                                        region=region, resolution="hour", client=client, cache=cache)
+
+    # # fetch market data
+    # df_market = load_dataset(path='data/day_ahead_prices.csv')
+
+    # public and school holidays, fetched once per year and cached
+    years = df['Datetime'].dt.year.unique()
+    with span('build.holidays', years=len(years)):
+        calendar = load_holiday_calendar(years=years, region='de-be')
+
+    # fetch weather data
+    start = df['Datetime'].min().tz_localize(None)
+    end = df['Datetime'].max().tz_localize(None) + timedelta(hours=1)
+    with span('build.weather', stations=len(weather_stations) if weather_stations else 1):
+        if weather_stations:
+            # weighted mean over the stations of the region instead of the single station_id
+            df_weather = RegionalWeather(weather_stations).fetch_hourly(df['Datetime'].min(), df['Datetime'].max() + timedelta(hours=1))
+        else:
+            df_weather = fetch_weather_data(start=start, end=end, station_id=station_id)
+    if weather_path:
+        df_weather.to_csv(weather_path, index=False)
+
+    with span('build.merge'):
+        df, coverage = merge_sources(df, df_generation, df_forcasted_generation, df_weather, calendar)
+    # df_market would be aligned with raw=('market',) to get the closed='left', label='right' hourly means
+
+    if return_coverage:
+        return df, coverage
+    return df
+
+def fetch_generation_forecast(start_date: datetime, end_date: datetime, region: str = "50Hertz",
+                              cache: SmardCache | None = None) -> pd.DataFrame:
+    # day-ahead generation forecasts, published for hours the consumption series does not reach yet
+    return fetch_smard_data(start_date=start_date, end_date=end_date, filters=FORCASTED_GENERATION,
+                            region=region, resolution="hour", cache=cache)
+
+def read_dataset_csv(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path, delimiter=';')
+    df['Datetime'] = pd.to_datetime(df['Datetime'], utc=True).dt.tz_convert('Europe/Berlin')
+    return df
+
+def last_complete_hour(df: pd.DataFrame) -> pd.Timestamp:
+    # the newest SMARD week is still open, its future hours have no load values yet
+    complete = df[list(CONSUMPTION.values())].notna().all(axis=1)
+    return df.loc[complete, 'Datetime'].max()
+
+def _validate_overlap(df_old: pd.DataFrame, df_new: pd.DataFrame, columns: list[str]) -> None:
+    overlap = pd.merge(df_old[['Datetime'] + columns], df_new[['Datetime'] + columns],
+                       on='Datetime', suffixes=('_old', '_new'))
+    if overlap.empty:
+        raise ValueError("the update window does not overlap the stored dataset")
+    for column in columns:
+        old = pd.to_numeric(overlap[f'{column}_old'], errors='coerce').to_numpy(dtype=float)
+        new = pd.to_numeric(overlap[f'{column}_new'], errors='coerce').to_numpy(dtype=float)
+        mismatch = ~np.isclose(old, new, rtol=1e-6, atol=1e-6, equal_nan=True)
+        if mismatch.any():
+            first = overlap.loc[mismatch, 'Datetime'].iloc[0]
+            raise ValueError(f"stored and refetched '{column}' differ in {mismatch.sum()} overlapping hours, first at {first}")
+
+def update_dataset(path: str = 'data/dataset.csv', end_date: datetime | None = None, overlap_hours: int = 24,
+                   region: str = "50Hertz", station_id: str = '10582', cache: SmardCache | None = None) -> pd.DataFrame:
+    df_old = read_dataset_csv(path)
+    last_hour = last_complete_hour(df_old)
+    end_date = pd.Timestamp(end_date) if end_date is not None else pd.Timestamp.now(tz='Europe/Berlin').floor('h')
+    if end_date.tz is None:
+        end_date = end_date.tz_localize('Europe/Berlin')
+    if end_date <= last_hour:
+        return df_old.iloc[:0]
+
+    # rebuild only a short window that overlaps the stored tail
+    start_date = last_hour - pd.Timedelta(hours=overlap_hours)
+    df_new = build_dataset(start_date, end_date, region=region, station_id=station_id, cache=cache)
+    df_new = df_new.reindex(columns=df_old.columns)
+    _validate_overlap(df_old[df_old['Datetime'] <= last_hour], df_new,
+                      columns=list(CONSUMPTION.values()) + list(GENERATION.values()))
+
+    df_new = df_new[df_new['Datetime'] > last_hour]
+    if (df_old['Datetime'] > last_hour).any():
+        # drop the incomplete tail hours stored by the previous run
+        df = pd.concat([df_old[df_old['Datetime'] <= last_hour], df_new], ignore_index=True)
+        df.to_csv(path, sep=';', index=False)
+    else:
+        df_new.to_csv(path, sep=';', index=False, mode='a', header=False)
+
+    return df_new
+
+# the stored forms of the dataset: the CSV read by update_dataset and the year-partitioned Arrow dataset
+def write_new_dataset(start_date: datetime, end_date: datetime, csv_path: str = 'data/dataset.csv',
+                      root: str = 'data/dataset', cache: SmardCache | None = None, weather_path: str = 'data/weather.csv',
+                      regional_weather: bool = False) -> tuple[pd.DataFrame, pd.DataFrame]:
+    with span('build'):
+        df, coverage = build_dataset(start_date=start_date, end_date=end_date, cache=cache, weather_path=weather_path,
+                                     return_coverage=True,
+                                     weather_stations=STATIONS_50HERTZ if regional_weather else None)
+    with span('write'):
+        df.to_csv(csv_path, sep=';', index=False)
+        write_dataset(df, root)
+    return df, coverage
+
+def append_new_hours(csv_path: str = 'data/dataset.csv', root: str = 'data/dataset',
+                     cache: SmardCache | None = None) -> pd.DataFrame:
+    with span('update'):
+        df = update_dataset(csv_path, cache=cache)
+        if len(df):
+            append_dataset(df, root)
+    return df
+
+def write_new_panel(start_date: datetime, end_date: datetime, root: str = 'data/panel',
+                    cache: SmardCache | None = None) -> pd.DataFrame:
+    # every consumption and generation filter of all four control areas
+    panel = fetch_smard_panel(start_date=start_date, end_date=end_date, filter_groups=[CONSUMPTION, GENERATION],
+                              regions=TSO_REGIONS, cache=cache)
+    write_panel(panel, root)
+    return panel
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update data/dataset.csv")
+    parser.add_argument('--update', action='store_true', help="append the hours missing since the last complete hour")
+    parser.add_argument('--panel', action='store_true', help="fetch every filter of all four control areas into data/panel")
+    parser.add_argument('--regional-weather', action='store_true', help="average the weather of all 50Hertz stations")
+    parser.add_argument('--trace', default=None, help="write a Chrome trace (JSON) of the stages to this path")
+    args = parser.parse_args()
+
+    cache = SmardCache('data/cache/smard')
+    with traced(args.trace):
+        if args.panel:
+            panel = write_new_panel(datetime(2015, 1, 1), datetime.now(), cache=cache)
+            print(panel.groupby(['region', 'series'], observed=True)['value'].count())
+        elif args.update:
+            df = append_new_hours(cache=cache)
+            print(f"appended {len(df)} hours")
+        else:
+            df, coverage = write_new_dataset(datetime(2015, 1, 1), datetime(2015, 2, 1), cache=cache,
+                                             regional_weather=args.regional_weather)
+            print(coverage)
+            print(df.head())
+            print(df.tail())
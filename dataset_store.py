@@ -0,0 +1,157 @@
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+CALENDAR_COLUMNS = ['Hour', 'DayOfWeek', 'Month', 'IsWeekend']
+SCHOOL_HOLIDAY_CODES = pd.CategoricalDtype(categories=list(range(8)))
+DEFAULT_TZ = 'Europe/Berlin'
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    # float32 measurements, int8 calendar columns, bool Holiday, categorical SchoolHoliday
+    df = df.copy()
+    for column in df.columns:
+        if column == 'Datetime':
+            continue
+        if column in CALENDAR_COLUMNS:
+            df[column] = df[column].astype(np.int8)
+        elif column == 'Holiday':
+            df[column] = df[column].astype(bool)
+        elif column == 'SchoolHoliday':
+            codes = pd.to_numeric(df[column], errors='coerce').fillna(0).astype(np.int8)
+            df[column] = codes.astype(SCHOOL_HOLIDAY_CODES)
+        elif pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = df[column].astype(np.float32)
+    return df
+
+def _partition_path(root: Path, year: int) -> Path:
+    return root / f"year={year}.arrow"
+
+def _write_partition(path: Path, table: pa.Table) -> None:
+    # uncompressed IPC files can be memory-mapped and read without copying
+    tmp = path.with_suffix('.tmp')
+    with pa.OSFile(str(tmp), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+def _years(datetimes: pd.Series) -> pd.Series:
+    # partitions are calendar years in DEFAULT_TZ whatever zone the frame is stored in, as read_dataset selects them
+    return (datetimes.dt.tz_convert(DEFAULT_TZ) if datetimes.dt.tz is not None else datetimes).dt.year
+
+def write_dataset(df: pd.DataFrame, root: str = 'data/dataset') -> None:
+    # one Arrow IPC file per calendar year, replacing the years df covers
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    df = compact_dtypes(df.sort_values('Datetime'))
+    for year, part in df.groupby(_years(df['Datetime']), sort=True):
+        table = pa.Table.from_pandas(part, preserve_index=False)
+        _write_partition(_partition_path(root, year), table)
+
+def append_dataset(df: pd.DataFrame, root: str = 'data/dataset') -> None:
+    # stored hours from the first new hour on are replaced
+    first = df['Datetime'].min()
+    try:
+        # the partition of the first new hour is rewritten, so its earlier hours are read back
+        stored = read_dataset(root, start=pd.Timestamp(_local_year(first), 1, 1, tz=DEFAULT_TZ))
+        stored = stored[stored['Datetime'] < first]
+    except FileNotFoundError:
+        # no partition of that year yet, e.g. the first hours after New Year (concat drops None)
+        stored = None
+    write_dataset(pd.concat([stored, compact_dtypes(df)], ignore_index=True), root)
+
+def _local_year(value) -> int:
+    ts = pd.Timestamp(value)
+    return ts.tz_convert(DEFAULT_TZ).year if ts.tz is not None else ts.year
+
+def _to_ns(value, tz: str) -> int:
+    ts = pd.Timestamp(value)
+    if ts.tz is None:
+        ts = ts.tz_localize(tz)
+    return ts.value
+
+def read_dataset(root: str = 'data/dataset', columns: list[str] | None = None,
+                 start=None, end=None) -> pd.DataFrame:
+    # only partitions overlapping [start, end] are mapped, and the range is cut
+    # by binary search on the sorted Datetime column before conversion
+    root = Path(root)
+    paths = sorted(root.glob('year=*.arrow'))
+    if not paths:
+        raise FileNotFoundError(f"no dataset partitions under {root}")
+    first_year = _local_year(start) if start is not None else -1
+    last_year = _local_year(end) if end is not None else 10_000
+    paths = [path for path in paths if first_year <= int(path.stem.split('=')[1]) <= last_year]
+    if columns is not None and 'Datetime' not in columns:
+        columns = ['Datetime'] + list(columns)
+
+    tables = []
+    for path in paths:
+        table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        tz = table.schema.field('Datetime').type.tz or DEFAULT_TZ
+        times = table.column('Datetime').to_numpy().view(np.int64)
+        lo = np.searchsorted(times, _to_ns(start, tz), side='left') if start is not None else 0
+        hi = np.searchsorted(times, _to_ns(end, tz), side='right') if end is not None else len(times)
+        tables.append(table.slice(lo, hi - lo))
+    if not tables:
+        raise FileNotFoundError(f"no dataset partitions under {root} between {start} and {end}")
+
+    return pa.concat_tables(tables).to_pandas(split_blocks=True)
+
+def write_panel(panel: pd.DataFrame, root: str = 'data/panel') -> None:
+    # long (Datetime, region, series, value) panel, one IPC file per year sorted by region, series, time
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    panel = panel.assign(value=panel['value'].astype(np.float32))
+    for year, part in panel.groupby(_years(panel['Datetime']), sort=True):
+        part = part.sort_values(['region', 'series', 'Datetime'], ignore_index=True)
+        _write_partition(_partition_path(root, year), pa.Table.from_pandas(part, preserve_index=False))
+
+def read_panel(root: str = 'data/panel', regions: list[str] | None = None, series: list[str] | None = None,
+               start=None, end=None) -> pd.DataFrame:
+    # filtered on the memory-mapped tables before conversion to pandas
+    import pyarrow.compute as pc
+
+    root = Path(root)
+    paths = sorted(root.glob('year=*.arrow'))
+    first_year = _local_year(start) if start is not None else -1
+    last_year = _local_year(end) if end is not None else 10_000
+    paths = [path for path in paths if first_year <= int(path.stem.split('=')[1]) <= last_year]
+    if not paths:
+        raise FileNotFoundError(f"no panel partitions under {root}")
+
+    tables = []
+    for path in paths:
+        table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+        tz = table.schema.field('Datetime').type.tz or DEFAULT_TZ
+        mask = None
+        for column, values in (('region', regions), ('series', series)):
+            if values is not None:
+                keep = pc.is_in(pc.cast(table.column(column), pa.string()), value_set=pa.array(values))
+                mask = keep if mask is None else pc.and_(mask, keep)
+        if start is not None:
+            keep = pc.greater_equal(table.column('Datetime'), pa.scalar(_to_ns(start, tz), pa.timestamp('ns', tz)))
+            mask = keep if mask is None else pc.and_(mask, keep)
+        if end is not None:
+            keep = pc.less_equal(table.column('Datetime'), pa.scalar(_to_ns(end, tz), pa.timestamp('ns', tz)))
+            mask = keep if mask is None else pc.and_(mask, keep)
+        tables.append(table if mask is None else table.filter(mask))
+
+    panel = pa.concat_tables(tables, promote_options='permissive').to_pandas()
+    return panel.sort_values(['region', 'series', 'Datetime'], ignore_index=True)
+
+def convert_csv(csv_path: str = 'data/dataset.csv', root: str = 'data/dataset') -> None:
+    df = pd.read_csv(csv_path, delimiter=';')
+    df['Datetime'] = pd.to_datetime(df['Datetime'], utc=True).dt.tz_convert(DEFAULT_TZ)
+    write_dataset(df, root)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the semicolon CSV dataset into year-partitioned Arrow files")
+    parser.add_argument('csv_path', nargs='?', default='data/dataset.csv')
+    parser.add_argument('root', nargs='?', default='data/dataset')
+    args = parser.parse_args()
+    convert_csv(args.csv_path, args.root)
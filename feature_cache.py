@@ -0,0 +1,183 @@
+import copy
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from batch_predict import origin_exog, origin_windows, predict_batched
+from tracing import count, span
+
+ROLLING_STATS = ('mean', 'std', 'min', 'max', 'sum', 'median')
+
+def window_spec(window_features) -> tuple[list[str], list[int]]:
+    # flatten skforecast RollingFeatures objects into parallel (stat, window size) lists
+    stats, sizes = [], []
+    for window_feature in window_features or []:
+        for stat, size in zip(window_feature.stats, window_feature.window_sizes):
+            if stat not in ROLLING_STATS:
+                raise ValueError(f"rolling statistic '{stat}' is not supported by the feature cache")
+            stats.append(stat)
+            sizes.append(int(size))
+    return stats, sizes
+
+# lag + rolling-window (+ exog) design matrix of a whole series, built once as one C-contiguous array.
+# Row r holds the features of target y[r + window_size], so the training matrix of any fold is a
+# slice view, and new observations only add rows at the end (extend)
+class LagMatrix:
+    def __init__(self, y, lags, stats: list[str] = (), sizes: list[int] = (), capacity: int | None = None,
+                 exog: np.ndarray | None = None):
+        y = np.asarray(y, dtype=float)
+        self.lags = np.asarray(lags, dtype=np.int64)
+        self.stats = list(stats)
+        self.sizes = list(sizes)
+        self.n_exog = 0 if exog is None else np.shape(exog)[1]
+        self.window_size = int(max([self.lags.max()] + self.sizes))
+        self.n_features = len(self.lags) + len(self.stats) + self.n_exog
+        capacity = max(capacity or 0, len(y))
+        self._y = np.empty(capacity)
+        self._X = np.empty((max(capacity - self.window_size, 0), self.n_features))
+        self.n = 0
+        self.extend(y, exog)
+
+    @classmethod
+    def from_forecaster(cls, forecaster, y, capacity: int | None = None, exog: np.ndarray | None = None):
+        stats, sizes = window_spec(forecaster.window_features)
+        return cls(y, forecaster.lags, stats, sizes, capacity, exog)
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._y[:self.n]
+
+    @property
+    def X(self) -> np.ndarray:
+        return self._X[:max(self.n - self.window_size, 0)]
+
+    def rows(self, start: int, end: int) -> tuple[np.ndarray, np.ndarray]:
+        # training pairs whose window lies inside y[start:end], as views
+        lo, hi = start, max(end - self.window_size, start)
+        return self._X[lo:hi], self._y[lo + self.window_size:hi + self.window_size]
+
+    def _grow(self, n: int) -> None:
+        capacity = max(n, 2 * len(self._y))
+        y = np.empty(capacity)
+        y[:self.n] = self._y[:self.n]
+        X = np.empty((max(capacity - self.window_size, 0), self.n_features))
+        X[:len(self.X)] = self.X
+        self._y, self._X = y, X
+
+    def extend(self, values, exog: np.ndarray | None = None) -> None:
+        # exog rows belong to the same hours as values
+        values = np.asarray(values, dtype=float)
+        if self.n_exog and (exog is None or len(exog) != len(values)):
+            raise ValueError("the matrix has exog columns, pass one exog row per new value")
+        old_n, new_n = self.n, self.n + len(values)
+        if new_n > len(self._y):
+            self._grow(new_n)
+        self._y[old_n:new_n] = values
+        self.n = new_n
+
+        lo, hi = max(self.window_size, old_n), new_n
+        if hi <= lo:
+            return
+        X = self._X[lo - self.window_size:hi - self.window_size]
+        for j, lag in enumerate(self.lags):
+            X[:, j] = self._y[lo - lag:hi - lag]
+        for k, (stat, size) in enumerate(zip(self.stats, self.sizes)):
+            # closed='left': the window of target t is y[t - size:t], like RollingFeatures
+            rolling = pd.Series(self._y[lo - size:hi]).rolling(size, closed='left')
+            X[:, len(self.lags) + k] = getattr(rolling, stat)().to_numpy()[size:]
+        if self.n_exog:
+            X[:, len(self.lags) + len(self.stats):] = np.asarray(exog, dtype=float)[lo - old_n:]
+
+    def share(self) -> tuple[SharedMemory, dict]:
+        # copy y and X into one shared block; the caller keeps the block alive and unlinks it
+        y, X = self.y, self.X
+        shm = SharedMemory(create=True, size=max(y.nbytes + X.nbytes, 1))
+        np.ndarray(y.shape, dtype=y.dtype, buffer=shm.buf)[:] = y
+        np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf, offset=y.nbytes)[:] = X
+        spec = {'name': shm.name, 'n': self.n, 'n_rows': len(X), 'lags': self.lags.tolist(),
+                'stats': self.stats, 'sizes': self.sizes, 'n_exog': self.n_exog}
+        return shm, spec
+
+    @classmethod
+    def attach(cls, spec: dict) -> tuple[SharedMemory, 'LagMatrix']:
+        # read-only LagMatrix over a block created by share(), without copying
+        shm = SharedMemory(name=spec['name'])
+        matrix = cls.__new__(cls)
+        matrix.lags = np.asarray(spec['lags'], dtype=np.int64)
+        matrix.stats, matrix.sizes = list(spec['stats']), list(spec['sizes'])
+        matrix.n_exog = spec.get('n_exog', 0)
+        matrix.window_size = int(max([matrix.lags.max()] + matrix.sizes))
+        matrix.n_features = len(matrix.lags) + len(matrix.stats) + matrix.n_exog
+        matrix.n = spec['n']
+        matrix._y = np.ndarray((spec['n'],), dtype=float, buffer=shm.buf)
+        matrix._X = np.ndarray((spec['n_rows'], matrix.n_features), dtype=float, buffer=shm.buf, offset=matrix._y.nbytes)
+        matrix._y.flags.writeable = False
+        matrix._X.flags.writeable = False
+        return shm, matrix
+
+def backtesting_cached(forecaster, y: pd.Series, cv, matrix: LagMatrix | None = None,
+                       exog: pd.DataFrame | np.ndarray | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # backtesting_forecaster for a ForecasterRecursive whose folds all read from one LagMatrix;
+    # a prebuilt (e.g. shared) matrix must already cover y. exog is a frame indexed by time (e.g. from a
+    # FeatureStore) covering y, or an array with one row per hour of y
+    from sklearn.base import clone
+    from sklearn.metrics import mean_absolute_error
+
+    if forecaster.differentiation is not None or forecaster.transformer_y is not None:
+        raise ValueError("the feature cache does not support differentiation or transformer_y")
+    cv = copy.deepcopy(cv)
+    cv.set_params({'window_size': forecaster.window_size, 'verbose': False})
+    folds = cv.split(X=y, as_pandas=True)
+
+    values = y.to_numpy(dtype=float)
+    if isinstance(exog, (pd.Series, pd.DataFrame)):
+        # rows are matched to y by time, as skforecast does, not by position
+        positions = exog.index.get_indexer(y.index)
+        if (positions < 0).any():
+            raise ValueError(f"exog must cover every hour of y, {y.index[positions < 0][0]} is missing")
+        exog = exog.to_frame() if isinstance(exog, pd.Series) else exog
+        exog = exog.to_numpy(dtype=float)[positions]
+    elif exog is not None:
+        exog = np.asarray(exog, dtype=float)
+        if len(exog) != len(values):
+            raise ValueError("exog without an index must have one row per hour of y")
+    train_end = folds['train_end'].iloc[0]
+    if matrix is None:
+        with span('backtest.matrix', rows=train_end):
+            matrix = LagMatrix.from_forecaster(forecaster, values[:train_end], capacity=len(values),
+                                               exog=None if exog is None else exog[:train_end])
+    elif (matrix.n != len(values) or not np.array_equal(matrix.lags, forecaster.lags)
+          or window_spec(forecaster.window_features) != (matrix.stats, matrix.sizes) or matrix.n_exog != (0 if exog is None else exog.shape[1])):
+        raise ValueError("the cached matrix was built for another series or feature set")
+    # the last fold's batch may run past the end of y; those predictions are dropped below
+    horizon = int((folds['test_end_with_gap'] - folds['last_window_end']).max())
+    padded = None if exog is None else np.vstack([exog, np.full((horizon, exog.shape[1]), np.nan)])
+    # folds between two refits share one estimator, so their origins are predicted as one batch
+    folds['model'] = folds['fit_forecaster'].astype(bool).cumsum()
+    predictions = []
+    for _, group in folds.groupby('model', sort=True):
+        first = group.iloc[0]
+        # one span per refit, covering the folds predicted with that estimator
+        with span('backtest.folds', first_fold=int(first.fold), folds=len(group)):
+            if first.train_end > matrix.n:
+                matrix.extend(values[matrix.n:first.train_end], None if exog is None else exog[matrix.n:first.train_end])
+            with span('backtest.fit', rows=int(first.train_end - first.train_start)):
+                estimator = clone(forecaster.estimator)
+                estimator.fit(*matrix.rows(first.train_start, first.train_end))
+
+            origins = group['last_window_end'].to_numpy()
+            steps = int((group['test_end_with_gap'] - group['last_window_end']).max())
+            windows = origin_windows(values, origins, matrix.window_size)
+            future = None if padded is None else origin_exog(padded, origins, steps)
+            with span('backtest.predict', origins=len(origins), steps=steps):
+                pred = predict_batched(estimator, windows, matrix.lags, matrix.stats, matrix.sizes, steps, future)
+            count('backtest.folds', len(group))
+        for row, fold in zip(pred, group.itertuples()):
+            keep = slice(fold.test_start_with_gap - fold.last_window_end, fold.test_end_with_gap - fold.last_window_end)
+            predictions.append(pd.DataFrame({'fold': fold.fold, 'pred': row[keep]},
+                                            index=y.index[fold.test_start_with_gap:fold.test_end_with_gap]))
+
+    predictions = pd.concat(predictions)
+    metric = pd.DataFrame({'mean_absolute_error': [mean_absolute_error(y.loc[predictions.index], predictions['pred'])]})
+    return metric, predictions
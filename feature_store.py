@@ -0,0 +1,139 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from alignment import HOUR_NS, align_source, canonical_index, to_utc_ns
+
+CALENDAR_FEATURES = ['Hour', 'DayOfWeek', 'Month', 'IsWeekend', 'Holiday', 'SchoolHoliday']
+WEATHER_FEATURES = ['Temperature']
+FORECAST_FEATURES = ['Forecast Wind Offshore', 'Forecast Wind Onshore', 'Forecast Solar', 'Forecast Other']
+# inputs known when a forecast is made: the calendar and SMARD's day-ahead generation forecasts. The
+# dataset holds observed weather only, whose values for the forecast hours are the actuals, so
+# models and backtests leave WEATHER_FEATURES out until archived weather forecasts are available
+EXOG_FEATURES = CALENDAR_FEATURES + ['Forecast Wind Onshore', 'Forecast Solar']
+
+def calendar_features(index_ns: np.ndarray, calendar=None, tz: str = 'Europe/Berlin') -> dict:
+    # known in advance for any hour, so they are computed for the horizon as well as for history
+    local = pd.DatetimeIndex(index_ns, tz='UTC').tz_convert(tz)
+    features = {'Hour': local.hour, 'DayOfWeek': local.dayofweek, 'Month': local.month,
+                'IsWeekend': local.dayofweek >= 5}
+    if calendar is not None:
+        features['Holiday'], features['SchoolHoliday'] = calendar.label(local)
+    return {name: np.asarray(values, dtype=float) for name, values in features.items()}
+
+def read_forecasts(path: str) -> pd.DataFrame:
+    # weather and generation forecasts in the dataset CSV layout: ';'-separated, a Datetime column with
+    # UTC offsets and one column per exog feature
+    forecasts = pd.read_csv(path, sep=';')
+    forecasts['Datetime'] = pd.to_datetime(forecasts['Datetime'], utc=True)
+    return forecasts
+
+# exogenous features of a contiguous hourly UTC grid, materialized once as one C-contiguous float
+# matrix. Row i is hour start + i hours; slices by time are views, so training history and the
+# forecast horizon are served without recomputing or copying features
+class FeatureStore:
+    def __init__(self, start_ns: int, columns: list[str], values: np.ndarray, tz: str = 'Europe/Berlin'):
+        self.start_ns = int(start_ns)
+        self.columns = list(columns)
+        self.values = values
+        self.tz = tz
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, columns: list[str] = EXOG_FEATURES, calendar=None, horizon_hours: int = 0,
+              forecasts: pd.DataFrame | None = None, tz: str = 'Europe/Berlin') -> 'FeatureStore':
+        # history comes from the dataset frame, horizon_hours more rows are added after its last hour.
+        # Calendar columns are recomputed for every hour (Holiday/SchoolHoliday need the calendar for
+        # the horizon); other columns take dataset values and, where those are missing, forecasts
+        index = canonical_index(df['Datetime'].min(), df['Datetime'].max() + pd.Timedelta(hours=horizon_hours))
+        derived = calendar_features(index, calendar, tz)
+        missing = [name for name in ('Holiday', 'SchoolHoliday') if name in columns and name not in derived]
+        if missing and horizon_hours:
+            raise ValueError(f"{missing} need a holiday calendar to be known for the horizon")
+
+        observed = [column for column in columns if column not in derived]
+        history, _ = align_source(df[['Datetime'] + observed], index, name='dataset')
+        if forecasts is not None:
+            known = [column for column in observed if column in forecasts.columns]
+            ahead, _ = align_source(forecasts[['Datetime'] + known], index, name='forecasts')
+            history[known] = history[known].fillna(ahead[known])
+
+        values = np.empty((len(index), len(columns)))
+        for j, column in enumerate(columns):
+            values[:, j] = derived[column] if column in derived else history[column].to_numpy(dtype=float)
+        return cls(index[0] if len(index) else 0, columns, values, tz)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        index = pd.DatetimeIndex(self.start_ns + HOUR_NS * np.arange(len(self), dtype=np.int64), tz='UTC')
+        return index.tz_convert(self.tz)
+
+    def positions(self, datetimes) -> np.ndarray:
+        times = pd.DatetimeIndex(datetimes).tz_convert('UTC').as_unit('ns').asi8
+        offsets = times - self.start_ns
+        if (offsets % HOUR_NS).any() or (offsets < 0).any() or (offsets >= len(self) * HOUR_NS).any():
+            raise KeyError("some hours are not in the feature store")
+        return offsets // HOUR_NS
+
+    def rows(self, start, end, columns: list[str] | None = None) -> np.ndarray:
+        # hours start..end (both included) as a view; a column subset is a copy unless it is contiguous
+        lo, hi = self.positions([pd.Timestamp(start), pd.Timestamp(end)])
+        rows = self.values[lo:hi + 1]
+        if columns is None:
+            return rows
+        take = [self.columns.index(column) for column in columns]
+        if take == list(range(take[0], take[0] + len(take))):
+            return rows[:, take[0]:take[0] + len(take)]
+        return rows[:, take]
+
+    def exog_for(self, index: pd.DatetimeIndex, columns: list[str] | None = None) -> pd.DataFrame:
+        # exog frame sharing the index of y (contiguous hours), as skforecast expects it
+        values = self.rows(index[0], index[-1], columns)
+        if len(values) != len(index):
+            raise ValueError("exog can only be served for a contiguous hourly index")
+        return pd.DataFrame(values, index=index, columns=columns or self.columns, copy=False)
+
+    def horizon(self, last_window_end, steps: int, columns: list[str] | None = None) -> pd.DataFrame:
+        # exog of the steps hours following the last observed hour
+        first = pd.Timestamp(last_window_end) + pd.Timedelta(hours=1)
+        index = pd.date_range(first, periods=steps, freq='h')
+        return self.exog_for(index, columns)
+
+    def extend(self, end, calendar=None, forecasts: pd.DataFrame | None = None) -> 'FeatureStore':
+        # a copy reaching at least to hour end: calendar columns are computed for the added hours, the
+        # other columns stay NaN there unless forecasts cover them. Values already known are kept,
+        # forecasts only fill the gaps, as in build
+        end_ns = int(to_utc_ns([pd.Timestamp(end)])[0]) // HOUR_NS * HOUR_NS
+        n_rows = max(len(self), (end_ns - self.start_ns) // HOUR_NS + 1)
+        index = self.start_ns + HOUR_NS * np.arange(n_rows, dtype=np.int64)
+        values = np.full((n_rows, len(self.columns)), np.nan)
+        values[:len(self)] = self.values
+        derived = calendar_features(index[len(self):], calendar, self.tz)
+        for j, column in enumerate(self.columns):
+            if column in derived:
+                values[len(self):, j] = derived[column]
+        if forecasts is not None:
+            known = [column for column in self.columns if column in forecasts.columns and column not in CALENDAR_FEATURES]
+            ahead, _ = align_source(forecasts[['Datetime'] + known], index, name='forecasts')
+            for column in known:
+                j = self.columns.index(column)
+                values[:, j] = np.where(np.isnan(values[:, j]), ahead[column].to_numpy(dtype=float), values[:, j])
+        return FeatureStore(self.start_ns, self.columns, values, self.tz)
+
+    def save(self, root: str) -> None:
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        np.save(root / 'values.npy', np.ascontiguousarray(self.values))
+        (root / 'meta.json').write_text(json.dumps({'start_ns': self.start_ns, 'columns': self.columns, 'tz': self.tz}))
+
+    @classmethod
+    def load(cls, root: str, mmap: bool = True) -> 'FeatureStore':
+        # memory-mapped, so worker processes read the same pages instead of rebuilding features
+        root = Path(root)
+        meta = json.loads((root / 'meta.json').read_text())
+        values = np.load(root / 'values.npy', mmap_mode='r' if mmap else None)
+        return cls(meta['start_ns'], meta['columns'], values, meta['tz'])
@@ -0,0 +1,201 @@
+import gzip
+import io
+import json
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+
+from create_dataset import HOLIDAY_API_URL, SCHOOL_HOLIDAYS_URL
+from smard_client import SMARD_BASE_URL
+
+# upstream of every service the stand-in answers for, used when recording
+UPSTREAMS = {
+    'smard': SMARD_BASE_URL,
+    'digidates': HOLIDAY_API_URL,
+    'schulferien': SCHOOL_HOLIDAYS_URL,
+    'meteostat': 'https://data.meteostat.net',
+}
+HOUR_MS = 3600 * 1000
+
+def _local(timestamp, tz: str) -> pd.Timestamp:
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.tz_localize(tz) if timestamp.tz is None else timestamp.tz_convert(tz)
+
+def synthetic_values(key: int, hours_ms: np.ndarray, level: float | None = None) -> np.ndarray:
+    # deterministic hourly series per key (filter or station id): daily, weekly and yearly cycles
+    # plus noise seeded by the key and the first hour, so every chunk is reproducible on its own
+    hours = np.asarray(hours_ms, dtype=np.int64) // HOUR_MS
+    level = 1000.0 + (key * 7919) % 9000 if level is None else level
+    phase = (key % 24) / 24
+    rng = np.random.default_rng([key, int(hours[0]) if len(hours) else 0])
+    return level * (1 + 0.15 * np.sin(2 * np.pi * (hours / 24 + phase)) + 0.05 * np.sin(2 * np.pi * hours / 168)
+                    + 0.10 * np.cos(2 * np.pi * hours / 8766)) + rng.normal(0, 0.02 * level, len(hours))
+
+def synthetic_hourly(start, end, columns: list[str] = ['Power'], tz: str = 'Europe/Berlin') -> pd.DataFrame:
+    # multi-year hourly frame (Datetime plus one synthetic column per name) of configurable length
+    index = pd.date_range(_local(start, tz), _local(end, tz), freq='h', inclusive='left')
+    hours_ms = index.asi8 // 10**6
+    df = pd.DataFrame({'Datetime': index})
+    for k, column in enumerate(columns):
+        df[column] = synthetic_values(k + 1, hours_ms)
+    return df
+
+def easter(year: int) -> date:
+    # Gregorian Easter Sunday (anonymous algorithm)
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def berlin_holidays(year: int) -> dict:
+    sunday = easter(year)
+    days = {date(year, 1, 1): "Neujahr", date(year, 3, 8): "Internationaler Frauentag",
+            sunday - timedelta(days=2): "Karfreitag", sunday + timedelta(days=1): "Ostermontag",
+            date(year, 5, 1): "Tag der Arbeit", sunday + timedelta(days=39): "Christi Himmelfahrt",
+            sunday + timedelta(days=50): "Pfingstmontag", date(year, 10, 3): "Tag der Deutschen Einheit",
+            date(year, 12, 25): "1. Weihnachtstag", date(year, 12, 26): "2. Weihnachtstag"}
+    return {day.isoformat(): name for day, name in sorted(days.items())}
+
+def school_holidays_html(year: int, state: str = 'Berlin') -> str:
+    # table laid out like schulferien.org: two header rows, one row per state, one column per holiday
+    names = ['Winterferien', 'Osterferien', 'Pfingstferien', 'Sommerferien', 'Herbstferien', 'Weihnachtsferien']
+    cells = ["30.01. - 04.02.", "03.04. - 14.04.", "19.05.", "13.07. - 25.08.", "02.10. - 14.10.", "22.12. - 02.01."]
+    header = ''.join(f"<th>{year}</th>" for _ in range(7)), '<th>Land</th>' + ''.join(f"<th>{name}</th>" for name in names)
+    rows = ''.join(f"<tr><td>{name}</td>" + ''.join(f"<td>{cell}</td>" for cell in cells) + "</tr>"
+                   for name in [state, 'Hamburg'])
+    return f"<html><body><table><thead><tr>{header[0]}</tr><tr>{header[1]}</tr></thead><tbody>{rows}</tbody></table></body></html>"
+
+def meteostat_csv(station: str, year: int, end_ms: int) -> bytes:
+    # gzipped bulk CSV in Meteostat's hourly layout; hours after end_ms are not published yet
+    index = pd.date_range(f"{year}-01-01", f"{year}-12-31 23:00", freq='h')
+    index = index[index.asi8 // 10**6 < end_ms]
+    hours_ms = index.asi8 // 10**6
+    key = int(station) if station.isdigit() else 1
+    met = {'temp': synthetic_values(key, hours_ms, 10.0) - 10.0, 'rhum': np.clip(synthetic_values(key + 1, hours_ms, 70.0), 0, 100),
+           'prcp': 0.0, 'snwd': np.nan, 'wdir': 180.0, 'wspd': synthetic_values(key + 2, hours_ms, 12.0),
+           'wpgt': np.nan, 'pres': synthetic_values(key + 3, hours_ms, 1013.0), 'tsun': np.nan, 'coco': 3.0}
+    df = pd.DataFrame({'year': index.year, 'month': index.month, 'day': index.day, 'hour': index.hour, **met,
+                       **{f"{column}_source": 'dwd_hourly' for column in met}})
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as file:
+        file.write(df.round(1).to_csv(index=False).encode())
+    return buffer.getvalue()
+
+# local stand-in for SMARD, digidates, schulferien.org and the Meteostat bulk data, one URL prefix per
+# service (http://host:port/<service>/...). Responses recorded under root are replayed byte for byte;
+# anything not recorded is synthesized for the hours [start, end), or with record=True fetched once
+# from the real service and stored, so later runs replay it
+class FixtureServer:
+    def __init__(self, root: str = 'data/fixtures', start='2021-03-01', end='2024-03-03', record: bool = False,
+                 host: str = '127.0.0.1', port: int = 0, tz: str = 'Europe/Berlin'):
+        self.root = Path(root)
+        self.start = _local(start, tz)
+        self.end = _local(end, tz)
+        self.record = record
+        self.tz = tz
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def url(self, service: str) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{service}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fixture-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _fixture_path(self, service: str, path: str, query: str) -> Path:
+        name = path.strip('/') or 'index'
+        if query:
+            name += '__' + query.replace('&', '_')
+        return self.root / service / name
+
+    def response(self, service: str, path: str, query: str = '') -> tuple[int, bytes]:
+        fixture = self._fixture_path(service, path, query)
+        if fixture.exists():
+            return 200, fixture.read_bytes()
+        if self.record:
+            upstream = UPSTREAMS[service] + ('/' + path.strip('/') if path.strip('/') else '') + ('/' if path.endswith('/') else '')
+            response = requests.get(upstream + (f"?{query}" if query else ''), timeout=60)
+            if response.status_code == 200:
+                fixture.parent.mkdir(parents=True, exist_ok=True)
+                fixture.write_bytes(response.content)
+            return response.status_code, response.content
+        return self._synthesize(service, path.strip('/'), query)
+
+    def _synthesize(self, service: str, path: str, query: str) -> tuple[int, bytes]:
+        params = dict(part.split('=', 1) for part in query.split('&') if '=' in part)
+        end_ms = int(self.end.value // 10**6)
+        if service == 'smard':
+            filter_id, region, name = path.split('/')
+            step = HOUR_MS // 4 if 'quarterhour' in name else HOUR_MS
+            weeks = pd.date_range(self.start.floor('D') - pd.Timedelta(days=self.start.dayofweek), self.end, freq='7D')
+            weeks_ms = [int(ts.value // 10**6) for ts in weeks]
+            if name.startswith('index_'):
+                return 200, json.dumps({'timestamps': weeks_ms}).encode()
+            ts = int(name.rsplit('_', 1)[1].removesuffix('.json'))
+            if ts not in weeks_ms:
+                return 404, b''
+            following = weeks_ms[weeks_ms.index(ts) + 1] if ts != weeks_ms[-1] else ts + 7 * 24 * HOUR_MS
+            times = np.arange(ts, following, step, dtype=np.int64)
+            values = np.round(synthetic_values(int(filter_id), times), 2)
+            series = [[int(t), float(v) if t < end_ms else None] for t, v in zip(times, values)]
+            return 200, json.dumps({'meta_data': {'version': 1}, 'series': series}).encode()
+        if service == 'digidates':
+            return 200, json.dumps(berlin_holidays(int(params['year']))).encode()
+        if service == 'schulferien':
+            return 200, school_holidays_html(int(path.split('/')[0])).encode()
+        if service == 'meteostat':
+            _, year, file = path.split('/')
+            return 200, meteostat_csv(file.split('.')[0], int(year), end_ms)
+        return 404, b''
+
+    def _handler(self):
+        server = self
+
+        class FixtureHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                service, _, path = url.path.lstrip('/').partition('/')
+                if service not in UPSTREAMS:
+                    status, body = 404, b''
+                else:
+                    status, body = server.response(service, path, url.query)
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return FixtureHandler
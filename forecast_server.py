@@ -0,0 +1,346 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from alignment import HOUR_NS, to_utc_ns
+from batch_predict import predict_batched, raw_predictor
+from feature_cache import window_spec
+from feature_store import FeatureStore, read_forecasts
+
+# keeps a fitted ForecasterRecursive and the recent observations in memory. Forecast requests are
+# queued and a single worker thread answers everything queued within max_wait_ms with one
+# predict_batched call; answers are cached per (origin, steps) until new observations arrive.
+# The feature store is kept horizon_hours ahead of the next hour as observations arrive; requests
+# whose exog are not known for every hour of their horizon fail on their own
+class ForecastService:
+    def __init__(self, forecaster, y: pd.Series, features: FeatureStore | None = None, history_hours: int = 24*14,
+                 max_batch: int = 256, max_wait_ms: float = 1.0, tz: str = 'Europe/Berlin', calendar=None,
+                 horizon_hours: int = 24*14, request_timeout: float = 5.0):
+        if forecaster.differentiation is not None or forecaster.transformer_y is not None:
+            raise ValueError("served forecasters cannot use differentiation or transformer_y")
+        if forecaster.exog_in_ and features is None:
+            raise ValueError("the forecaster was fitted with exog, serve it with a FeatureStore")
+        self.estimator = raw_predictor(forecaster.estimator)
+        self.lags = forecaster.lags
+        self.stats, self.sizes = window_spec(forecaster.window_features)
+        self.window_size = int(forecaster.window_size)
+        self.features = features
+        self.calendar = calendar
+        self.horizon_hours = horizon_hours
+        self.request_timeout = request_timeout
+        self.exog_columns = [features.columns.index(column) for column in forecaster.exog_names_in_] if forecaster.exog_in_ else None
+        self.keep = self.window_size + history_hours
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.tz = tz
+
+        values = y.to_numpy(dtype=float)[-self.keep:]
+        self._values = values.copy()
+        self._start_ns = int(to_utc_ns(y.index[-len(values):][:1])[0])
+        self._next_ns = self._start_ns + len(values) * HOUR_NS
+        self._extend_features()
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._queue = queue.Queue()
+        self._latencies = deque(maxlen=100_000)
+        self._batches = deque(maxlen=100_000)
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='forecast-batcher', daemon=True)
+        self._worker.start()
+
+    @property
+    def next_hour(self) -> pd.Timestamp:
+        # default origin, the first hour without an observation
+        return pd.Timestamp(self._next_ns, tz='UTC').tz_convert(self.tz)
+
+    def observe(self, datetimes, values) -> int:
+        # new or revised hourly observations; hours skipped between the stored tail and new ones become NaN
+        times = to_utc_ns(datetimes)
+        values = np.asarray(values, dtype=float)
+        if (times % HOUR_NS).any():
+            raise ValueError("observations must be on the hourly grid")
+        with self._lock:
+            positions = (times - self._start_ns) // HOUR_NS
+            positions, values = positions[positions >= 0], values[positions >= 0]
+            if not len(positions):
+                return 0
+            n_new = max(int(positions.max()) + 1 - len(self._values), 0)
+            if n_new:
+                self._values = np.concatenate([self._values, np.full(n_new, np.nan)])
+            self._values[positions] = values
+            if len(self._values) > self.keep:
+                drop = len(self._values) - self.keep
+                self._values = self._values[drop:].copy()
+                self._start_ns += drop * HOUR_NS
+            self._next_ns = self._start_ns + len(self._values) * HOUR_NS
+            self._extend_features()
+            self._cache.clear()
+        return n_new
+
+    def add_forecasts(self, forecasts: pd.DataFrame) -> None:
+        # weather and generation forecasts (Datetime plus exog columns) filling the hours the store
+        # does not know yet; known values are kept
+        if self.features is None:
+            raise ValueError("the forecaster uses no exog")
+        with self._lock:
+            end = self.features.index[-1] if len(self.features) else self.next_hour
+            self.features = self.features.extend(max(end, forecasts['Datetime'].max()), self.calendar, forecasts)
+            self._cache.clear()
+
+    def _extend_features(self) -> None:
+        # grown by twice the horizon at a time, so the copy happens once every horizon_hours
+        if self.features is None:
+            return
+        end_ns = self.features.start_ns + (len(self.features) - 1) * HOUR_NS
+        if end_ns < self._next_ns + self.horizon_hours * HOUR_NS:
+            end = pd.Timestamp(self._next_ns + 2 * self.horizon_hours * HOUR_NS, tz='UTC')
+            self.features = self.features.extend(end, self.calendar)
+
+    def forecast(self, origin=None, steps: int = 24, timeout: float | None = 5.0) -> pd.Series:
+        start = time.perf_counter()
+        origin_ns = self._next_ns if origin is None else self._to_ns(origin)
+        key = (origin_ns, steps)
+        pred = self._cache.get(key)
+        if pred is None:
+            future = Future()
+            self._queue.put((key, future))
+            pred = future.result(timeout=timeout)
+        self._latencies.append(time.perf_counter() - start)
+
+        index = pd.DatetimeIndex(origin_ns + HOUR_NS * np.arange(steps, dtype=np.int64), tz='UTC').tz_convert(self.tz)
+        return pd.Series(pred, index=index, name='pred')
+
+    def _to_ns(self, timestamp) -> int:
+        # naive timestamps are wall times of the service time zone
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp.tz is None:
+            timestamp = timestamp.tz_localize(self.tz)
+        return int(to_utc_ns([timestamp])[0])
+
+    def _run(self) -> None:
+        while not self._closed:
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            # coalesce whatever else arrives within max_wait into the same model calls
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._predict(batch)
+
+    def _predict(self, batch: list) -> None:
+        with self._lock:
+            pending = {}
+            for key, future in batch:
+                if key in self._cache:
+                    future.set_result(self._cache[key])
+                else:
+                    pending.setdefault(key, []).append(future)
+            # a request that cannot be answered fails alone instead of the whole batch
+            inputs = {}
+            for key, futures in pending.items():
+                try:
+                    inputs[key] = self._inputs(key)
+                except (KeyError, ValueError) as error:
+                    for future in futures:
+                        future.set_exception(error)
+            # one model call per horizon length, so no request needs exog beyond its own horizon
+            by_steps = {}
+            for key in inputs:
+                by_steps.setdefault(key[1], []).append(key)
+            for steps, keys in by_steps.items():
+                try:
+                    pred = self._predict_keys(steps, [inputs[key] for key in keys])
+                except Exception as error:
+                    for key in keys:
+                        for future in pending[key]:
+                            future.set_exception(error)
+                    continue
+                for key, row in zip(keys, pred):
+                    row = row.copy()
+                    self._cache[key] = row
+                    for future in pending[key]:
+                        future.set_result(row)
+                self._batches.append(len(keys))
+
+    def _inputs(self, key: tuple) -> tuple:
+        # window and exog rows of one request, or the error that request gets
+        origin_ns, steps = key
+        origin = (origin_ns - self._start_ns) // HOUR_NS
+        if steps < 1:
+            raise ValueError("steps must be at least 1")
+        if (origin_ns - self._start_ns) % HOUR_NS or not self.window_size <= origin <= len(self._values):
+            raise ValueError(f"origins must be whole hours between {self.window_size} hours after the first kept hour and the next hour")
+        window = self._values[origin - self.window_size:origin]
+
+        exog = None
+        if self.exog_columns is not None:
+            hours = pd.DatetimeIndex(origin_ns + HOUR_NS * np.arange(steps, dtype=np.int64), tz='UTC')
+            try:
+                rows = self.features.positions(hours)
+            except KeyError:
+                raise ValueError(f"no exog beyond {self.features.index[-1]}, the horizon ends {hours[-1].tz_convert(self.tz)}") from None
+            exog = self.features.values[rows][:, self.exog_columns]
+            unknown = np.isnan(exog).any(axis=0)
+            if unknown.any():
+                names = [self.features.columns[j] for j in np.array(self.exog_columns)[unknown]]
+                first = hours[np.isnan(exog).any(axis=1)][0].tz_convert(self.tz)
+                raise ValueError(f"exog {names} unknown from {first} on, post forecasts for them first")
+        return window, exog
+
+    def _predict_keys(self, steps: int, inputs: list) -> np.ndarray:
+        windows = np.stack([window for window, _ in inputs])
+        exog = None if self.exog_columns is None else np.stack([exog for _, exog in inputs])
+        return predict_batched(self.estimator, windows, self.lags, self.stats, self.sizes, steps, exog)
+
+    def latency_percentiles(self) -> dict:
+        latencies = np.array(self._latencies) * 1000
+        batches = np.array(self._batches)
+        if not len(latencies):
+            return {'requests': 0}
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        return {'requests': len(latencies), 'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99, 'max_ms': latencies.max(),
+                'model_calls': len(batches), 'mean_batch': batches.mean() if len(batches) else 0.0}
+
+    def close(self) -> None:
+        self._closed = True
+        self._worker.join()
+
+def make_handler(service: ForecastService):
+    class ForecastHandler(BaseHTTPRequestHandler):
+        # keep-alive, so clients do not pay a TCP handshake per forecast, and no Nagle delay
+        # between the header and body writes
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _send(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                if url.path == '/forecast':
+                    pred = service.forecast(query.get('origin'), int(query.get('steps', 24)), service.request_timeout)
+                    self._send(200, {'Datetime': [str(ts) for ts in pred.index], 'Power': pred.tolist()})
+                elif url.path == '/stats':
+                    self._send(200, {**service.latency_percentiles(), 'next_hour': str(service.next_hour)})
+                else:
+                    self._send(404, {'error': f"unknown path {url.path}"})
+            except (KeyError, ValueError) as error:
+                self._send(400, {'error': str(error)})
+            except FutureTimeout:
+                self._send(504, {'error': "the forecast was not computed in time"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path not in ('/observations', '/forecasts'):
+                self._send(404, {'error': f"unknown path {url.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                if url.path == '/forecasts':
+                    # {'Datetime': [...], '<exog column>': [...], ...}
+                    service.add_forecasts(pd.DataFrame(body).assign(Datetime=pd.to_datetime(body['Datetime'], utc=True)))
+                    self._send(200, {'features_until': str(service.features.index[-1])})
+                    return
+                n_new = service.observe(pd.to_datetime(body['Datetime'], utc=True), body['Power'])
+                self._send(200, {'new_hours': n_new, 'next_hour': str(service.next_hour)})
+            except (KeyError, ValueError) as error:
+                self._send(400, {'error': str(error)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ForecastHandler
+
+def serve(service: ForecastService, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+def observed_power(df: pd.DataFrame) -> pd.Series:
+    # hourly Power up to its last observed hour
+    y = df.set_index('Datetime').sort_index()['Power'].asfreq('h')
+    return y.loc[:y.last_valid_index()]
+
+def load_model(name: str, models_dir: str = 'models', root: str = 'data/dataset', horizon_hours: int = 24,
+               forecasts_path: str | None = None) -> tuple[object, pd.Series, FeatureStore | None, object]:
+    # a MODEL_REGISTRY configuration or a saved forecaster, brought up to the newest observation of the
+    # dataset, with Power, the features of its exog columns (horizon_hours past the last observed
+    # hour, filled from the forecasts CSV where given) and the holiday calendar those were built with
+    from backtest_harness import MODEL_REGISTRY
+    from create_dataset import load_holiday_calendar
+    from dataset_store import read_dataset
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry(models_dir)
+    config, meta = MODEL_REGISTRY.get(name), registry.meta(name)
+    if config is None and meta is None:
+        raise KeyError(f"unknown model '{name}': not in MODEL_REGISTRY and not saved in {models_dir}")
+    columns = (config.get('exog') if config is not None else meta['exog']) or []
+    df = read_dataset(root, columns=['Power'] + columns)
+    y = observed_power(df)
+
+    features, exog, calendar = None, None, None
+    if columns:
+        calendar = load_holiday_calendar(years=range(y.index[0].year, y.index[-1].year + 2))
+        forecasts = read_forecasts(forecasts_path) if forecasts_path else None
+        features = FeatureStore.build(df, columns=columns, calendar=calendar, horizon_hours=horizon_hours,
+                                      forecasts=forecasts)
+        exog = features.exog_for(y.index)
+    # a configured model is fitted and saved on first use (or after a config change); otherwise only the
+    # saved model's last window moves up to the newest observation, without retraining
+    if config is not None:
+        forecaster = registry.load_or_build(name, config, y, exog)
+    else:
+        forecaster, _ = registry.warm_start(name, y, exog)
+    return forecaster, y, features, calendar
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve day-ahead Power forecasts over HTTP on localhost")
+    parser.add_argument('--model', default='lgbm_recursive_exog')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--horizon-days', type=int, default=14,
+                        help="calendar features are kept this far ahead of the newest observation")
+    parser.add_argument('--forecasts', default=None,
+                        help="CSV (';', Datetime and exog columns) of weather and generation forecasts for the horizon; "
+                             "more can be posted to /forecasts")
+    args = parser.parse_args()
+
+    try:
+        forecaster, y, features, calendar = load_model(args.model, args.models_dir, 'data/dataset',
+                                                       24 * args.horizon_days, args.forecasts)
+    except KeyError as error:
+        raise SystemExit(error.args[0])
+    service = ForecastService(forecaster, y, features, calendar=calendar, horizon_hours=24 * args.horizon_days)
+    server = serve(service, args.host, args.port)
+    print(f"serving {args.model} on http://{args.host}:{args.port}/forecast, next hour {service.next_hour}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -1,13 +1,82 @@
+import argparse
+import calendar
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import seaborn as sns
-from statsmodels.graphics.tsaplots import plot_acf
-import calendar
+from analytics import SEASONS, analytics_for
 
 plt.rcParams['font.family'] = 'Fira Sans'
 plt.rcParams['font.size'] = 20
 EXPORT = False 
 PLOT = True
+PLOT_DIR = 'plots'
+# long time series are drawn with at most this many points per line
+MAX_POINTS = 2000
+ANALYTICS_COLUMNS = ['Power', 'Grid Load', 'Residual Load', 'Temperature']
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    # positions of n_out points keeping the shape of the line (largest triangle three buckets): the
+    # first and last point, and per bucket the point spanning the largest triangle with the point
+    # kept before it and the mean of the next bucket
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    next_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    next_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    # the last bucket looks ahead to the last point
+    next_x, next_y = np.r_[next_x[1:], x[-1]], np.r_[next_y[1:], y[-1]]
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+def downsample(df: pd.DataFrame, columns: list[str], n_out: int = MAX_POINTS) -> dict[str, pd.Series]:
+    # every column as its own LTTB-reduced line indexed by Datetime; missing hours are left out
+    lines = {}
+    for column in columns:
+        series = df.set_index('Datetime')[column].dropna()
+        x = series.index.asi8.astype(float)
+        lines[column] = series.iloc[lttb(x, series.to_numpy(dtype=float), n_out)]
+    return lines
+
+def violin_stats(values: pd.Series, keys: list[pd.Series], bins: int = 200) -> dict:
+    # matplotlib violin statistics per key (tuple for several keys) from one 2D histogram over all
+    # groups, smoothed like a kernel density, instead of one KDE over every group's raw values
+    from scipy.ndimage import gaussian_filter1d
+
+    valid = values.notna()
+    values, keys = values[valid], [key[valid] for key in keys]
+    grouped = values.groupby(keys, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    summary = grouped.agg(['mean', 'median', 'min', 'max', 'count'])
+    lo, hi = values.min(), values.max()
+    width = (hi - lo) / bins if hi > lo else 1.0
+    positions = np.clip(((values.to_numpy() - lo) / width).astype(np.int64), 0, bins - 1)
+    hist = np.bincount(codes * bins + positions, minlength=len(summary) * bins).reshape(len(summary), bins)
+    density = gaussian_filter1d(hist.astype(float), sigma=2, axis=1, mode='constant')
+    density /= density.sum(axis=1, keepdims=True) * width
+    coords = lo + width * (np.arange(bins) + 0.5)
+    return {key: {'coords': coords, 'vals': density[k], 'mean': row['mean'], 'median': row['median'],
+                  'min': row['min'], 'max': row['max']}
+            for k, (key, row) in enumerate(summary.iterrows())}
+
+def between(df: pd.DataFrame, start: str, end: str) -> pd.DataFrame:
+    # rows shown by a plot with a fixed x range, a day of margin on each side
+    datetimes = df['Datetime'].dt.tz_localize(None) if df['Datetime'].dt.tz is not None else df['Datetime']
+    keep = (datetimes >= pd.Timestamp(start) - pd.Timedelta(days=1)) & (datetimes <= pd.Timestamp(end) + pd.Timedelta(days=1))
+    return df[keep]
 
 def plot_power_time(df):
     plt.figure(figsize=(10, 6))
@@ -19,14 +88,16 @@ def plot_power_time(df):
     plt.grid()
     plt.tight_layout()
     if EXPORT:
-        plt.savefig('plots/power_over_time.pdf', bbox_inches='tight', transparent=True)
+        plt.savefig(f'{PLOT_DIR}/power_over_time.pdf', bbox_inches='tight', transparent=True)
     if PLOT:
         plt.show()
+    plt.close()
 
-def plot_power_distribution_by_year(df):
-    df['Year'] = df['Datetime'].dt.year
+def plot_power_distribution_by_year(distributions):
+    years = list(distributions)
     plt.figure(figsize=(10, 6))
-    sns.violinplot(data=df, x='Year', y='Power')
+    plt.gca().violin(list(distributions.values()), positions=range(len(years)), showmeans=True)
+    plt.xticks(range(len(years)), years)
     if not EXPORT:
         plt.title("Distribution of Power by Year")
     plt.xlabel("")
@@ -34,13 +105,13 @@ def plot_power_distribution_by_year(df):
     plt.grid()
     plt.tight_layout()
     if EXPORT:
-        plt.savefig('plots/power_distribution_by_year.pdf', bbox_inches='tight', transparent=True)
+        plt.savefig(f'{PLOT_DIR}/power_distribution_by_year.pdf', bbox_inches='tight', transparent=True)
     if PLOT:
         plt.show()
+    plt.close()
 
-def plot_average_annual_course(df):
-    df['DayOfYear'] = df['Datetime'].dt.dayofyear
-    yearly_mean = df.groupby('DayOfYear')['Power'].mean()
+def plot_average_annual_course(analytics):
+    yearly_mean = analytics.profile('Power', ['DayOfYear']).set_index('DayOfYear')['mean']
 
     month_days = [pd.Timestamp(2021, m, 1).day_of_year for m in range(1, 13)]
     month_days.append(366)
@@ -59,26 +130,19 @@ def plot_average_annual_course(df):
     plt.grid()
     plt.tight_layout()
     if EXPORT:
-        plt.savefig('plots/average_annual_course.pdf', bbox_inches='tight', transparent=True)
+        plt.savefig(f'{PLOT_DIR}/average_annual_course.pdf', bbox_inches='tight', transparent=True)
     if PLOT:
         plt.show()
+    plt.close()
 
-def plot_power_distribution_by_day_and_season(df):
-    month = df['Datetime'].dt.month
-    season_map = {
-        12: 'Winter', 1: 'Winter', 2: 'Winter',
-        3: 'Spring', 4: 'Spring', 5: 'Spring',
-        6: 'Summer', 7: 'Summer', 8: 'Summer',
-        9: 'Autumn', 10: 'Autumn', 11: 'Autumn'
-    }
-    df['Season'] = month.map(season_map)
+def plot_power_distribution_by_day_and_season(distributions):
     order = ['Winter', 'Spring', 'Summer', 'Autumn']
 
     fig, axes = plt.subplots(2, 2, figsize=(10, 6), sharey=True)
     for ax, season in zip(axes.flat, order):
-        temp = df[df['Season'] == season]
-        data = [temp[temp['DayOfWeek'] == d]['Power'] for d in range(7)]
-        ax.violinplot(data, showmeans=True)
+        days = [d for d in range(7) if (season, d) in distributions]
+        if days:
+            ax.violin([distributions[(season, d)] for d in days], positions=[d + 1 for d in days], showmeans=True)
         ax.set_title(season)
         ax.set_xlabel("Day of the Week")
         ax.set_ylabel("Average Power [MWh]")
@@ -89,22 +153,15 @@ def plot_power_distribution_by_day_and_season(df):
         fig.suptitle("Average Power by Day – per Season", y=0.98)
     plt.tight_layout()
     if EXPORT:
-        plt.savefig('plots/power_distribution_by_day_and_season.pdf', bbox_inches='tight', transparent=True)
+        plt.savefig(f'{PLOT_DIR}/power_distribution_by_day_and_season.pdf', bbox_inches='tight', transparent=True)
     if PLOT:
         plt.show()
+    plt.close()
 
-def plot_average_power_by_day_and_season(df):
-    month = df['Datetime'].dt.month
-    season_map = {
-        12: 'Winter', 1: 'Winter', 2: 'Winter',
-        3: 'Spring', 4: 'Spring', 5: 'Spring',
-        6: 'Summer', 7: 'Summer', 8: 'Summer',
-        9: 'Autumn', 10: 'Autumn', 11: 'Autumn'
-    }
-    df['Season'] = month.map(season_map)
+def plot_average_power_by_day_and_season(analytics):
     order = ['Winter', 'Spring', 'Summer', 'Autumn']
 
-    grp = df.groupby(['Season','DayOfWeek'])['Power'].agg(['mean', 'std']).reset_index()
+    grp = analytics.profile('Power', ['Season', 'DayOfWeek'])
 
     fig, axes = plt.subplots(2, 2, figsize=(10, 6), sharey=True, sharex=True)
 
@@ -127,23 +184,15 @@ def plot_average_power_by_day_and_season(df):
         fig.suptitle("Average Power by Day – per Season", y=0.98)
     plt.tight_layout()
     if EXPORT:
-        plt.savefig('plots/average_power_by_day_and_season.pdf', bbox_inches='tight', transparent=True)
+        plt.savefig(f'{PLOT_DIR}/average_power_by_day_and_season.pdf', bbox_inches='tight', transparent=True)
     if PLOT:
         plt.show()
+    plt.close()
 
-def plot_average_power_by_hour_and_season(df):
-    df['Hour'] = df['Datetime'].dt.hour
-    month = df['Datetime'].dt.month
-    season_map = {
-        12: 'Winter', 1: 'Winter', 2: 'Winter',
-        3: 'Spring', 4: 'Spring', 5: 'Spring',
-        6: 'Summer', 7: 'Summer', 8: 'Summer',
-        9: 'Autumn', 10: 'Autumn', 11: 'Autumn'
-    }
-    df['Season'] = month.map(season_map)
+def plot_average_power_by_hour_and_season(analytics):
     order = ['Winter', 'Spring', 'Summer', 'Autumn']
 
-    grp = df.groupby(['Season','Hour'])['Power'].agg(['mean', 'std']).reset_index()
+    grp = analytics.profile('Power', ['Season', 'Hour'])
 
     fig, axes = plt.subplots(2, 2, figsize=(10, 6), sharey=True, sharex=True)
     for ax, season in zip(axes.flat, order):
@@ -164,9 +213,10 @@ def plot_average_power_by_hour_and_season(df):
         fig.suptitle("Average Power by Hour – per Season", y=0.98)
     plt.tight_layout()
     if EXPORT:
-        plt.savefig('plots/average_power_by_hour_and_season.pdf', bbox_inches='tight', transparent=True)
+        plt.savefig(f'{PLOT_DIR}/average_power_by_hour_and_season.pdf', bbox_inches='tight', transparent=True)
     if PLOT:
         plt.show()
+    plt.close()
 
 def plot_power_generation_by_source(df):
     plt.figure(figsize=(10,6))
@@ -199,14 +249,15 @@ def plot_power_generation_by_source(df):
         plt.title("Power Generation by Source")
     plt.tight_layout()
     if EXPORT:
-        plt.savefig('plots/power_generation_by_source.png', dpi = 500, bbox_inches='tight', transparent=True)
+        plt.savefig(f'{PLOT_DIR}/power_generation_by_source.png', dpi = 500, bbox_inches='tight', transparent=True)
     if PLOT:
         plt.show()
+    plt.close()
 
-def plot_grid_and_residual_load_over_time(df):
+def plot_grid_and_residual_load_over_time(lines):
     plt.figure(figsize=(10,6))
-    plt.plot(df['Datetime'], df['Grid Load'], color='tab:blue', label='Grid Load')
-    plt.plot(df['Datetime'], df['Residual Load'], color='tab:orange', alpha=0.7, label='Residual Load')
+    plt.plot(lines['Grid Load'].index, lines['Grid Load'], color='tab:blue', label='Grid Load')
+    plt.plot(lines['Residual Load'].index, lines['Residual Load'], color='tab:orange', alpha=0.7, label='Residual Load')
     if not EXPORT:
         plt.title("Grid and Residual Load Over Time")
     plt.xlabel("Time")
@@ -215,14 +266,15 @@ def plot_grid_and_residual_load_over_time(df):
     plt.legend(loc="lower right")
     plt.tight_layout()
     if EXPORT:
-        plt.savefig('plots/grid_and_residual_load_over_time.pdf', bbox_inches='tight', transparent=True)
+        plt.savefig(f'{PLOT_DIR}/grid_and_residual_load_over_time.pdf', bbox_inches='tight', transparent=True)
     if PLOT:
         plt.show()
+    plt.close()
 
-def plot_power_and_temperature_over_time(df):
+def plot_power_and_temperature_over_time(lines):
     plt.figure(figsize=(10, 6))
-    plt.plot(df['Datetime'], df['Power'], label='Power')
-    plt.plot(df['Datetime'], df['Temperature'], color='tab:orange', alpha=0.7, label='Temperature')
+    plt.plot(lines['Power'].index, lines['Power'], label='Power')
+    plt.plot(lines['Temperature'].index, lines['Temperature'], color='tab:orange', alpha=0.7, label='Temperature')
     if not EXPORT:
         plt.title("Power and Temperature over Time")
     plt.ylabel("Power [MWh]")
@@ -230,44 +282,135 @@ def plot_power_and_temperature_over_time(df):
     plt.legend(loc="upper right")
     plt.tight_layout()
     if EXPORT:
-        plt.savefig('plots/power_and_temperature_over_time.pdf', bbox_inches='tight', transparent=True)
+        plt.savefig(f'{PLOT_DIR}/power_and_temperature_over_time.pdf', bbox_inches='tight', transparent=True)
     if PLOT:
         plt.show()
+    plt.close()
+
+CORRELATION_COLUMNS = ['Power','Solar Generation','Wind Onshore Generation', 'Lignite Generation' ,'Grid Load', 'Residual Load', 'Other Renewables Generation',
+                       'Temperature','Average Wind Speed','Sunshine Duration']
 
-def plot_correlation_heatmap(df):
-    plt.rcParams['font.size'] = 12
-    plt.figure()
-    num_cols = ['Power','Solar Generation','Wind Onshore Generation', 'Lignite Generation' ,'Grid Load', 'Residual Load', 'Other Renewables Generation',
-                'Temperature','Average Wind Speed','Sunshine Duration']
+def plot_correlation_heatmap(corr):
+    # smaller font only for this figure, other figures rendered by the same process keep theirs
+    with plt.rc_context({'font.size': 12}):
+        plt.figure()
+        sns.heatmap(corr, cmap='coolwarm', annot=True, fmt=".2f", center=0, square=True, annot_kws={"size": 8})
+        if not EXPORT:
+            plt.title("Correlation between Power, Generation and Weather")
+        plt.tight_layout()
+        if EXPORT:
+            plt.savefig(f'{PLOT_DIR}/correlation_heatmap.pdf', bbox_inches='tight', transparent=True)
+        if PLOT:
+            plt.show()
+        plt.close()
 
-    corr = df[num_cols].corr()
-    sns.heatmap(corr, cmap='coolwarm', annot=True, fmt=".2f", center=0, square=True, annot_kws={"size": 8})
+# precomputed acf out to a year, with the white-noise confidence band
+def plot_autocorrelation(analytics, column='Power', lags=24*366):
+    acf = analytics.acf_of(column).iloc[:lags + 1]
+    band = analytics.confidence(column)
+    fig, ax = plt.subplots(figsize=(10, 4))
+    ax.plot(acf.index, acf.to_numpy(), linewidth=0.8)
+    ax.axhspan(-band, band, color='tab:blue', alpha=0.2)
+    for lag, label in [(24, 'day'), (24*7, 'week'), (24*365, 'year')]:
+        if lag <= lags:
+            ax.axvline(lag, color='gray', linestyle='--', linewidth=0.8)
+            ax.annotate(label, (lag, 1.0), fontsize=12, ha='left', va='top')
     if not EXPORT:
-        plt.title("Correlation between Power, Generation and Weather")
+        ax.set_title(f"Autocorrelation of {column}")
+    ax.set_xlabel("Lag [h]")
+    ax.grid()
     plt.tight_layout()
     if EXPORT:
-        plt.savefig('plots/correlation_heatmap.pdf', bbox_inches='tight', transparent=True)
+        plt.savefig(f'{PLOT_DIR}/autocorrelation.pdf', bbox_inches='tight', transparent=True)
     if PLOT:
         plt.show()
+    plt.close()
+
+# report figures: plot function and the (small) input it is drawn from, prepared once from the
+# dataset and the cached analytics so workers never receive the full data
+FIGURES = {
+    'power_over_time': (plot_power_time, lambda df, analytics: between(df, '2024-01-01', '2024-01-14')[['Datetime', 'Power']]),
+    'power_distribution_by_year': (plot_power_distribution_by_year,
+                                   lambda df, analytics: violin_stats(df['Power'], [df['Datetime'].dt.year])),
+    'average_annual_course': (plot_average_annual_course, lambda df, analytics: analytics),
+    'power_distribution_by_day_and_season': (plot_power_distribution_by_day_and_season,
+                                             lambda df, analytics: violin_stats(df['Power'], [df['Datetime'].dt.month.map(SEASONS), df['Datetime'].dt.dayofweek])),
+    'average_power_by_day_and_season': (plot_average_power_by_day_and_season, lambda df, analytics: analytics),
+    'average_power_by_hour_and_season': (plot_average_power_by_hour_and_season, lambda df, analytics: analytics),
+    'power_generation_by_source': (plot_power_generation_by_source, lambda df, analytics: between(df, '2023-07-10', '2023-07-20')),
+    'grid_and_residual_load_over_time': (plot_grid_and_residual_load_over_time,
+                                         lambda df, analytics: downsample(df, ['Grid Load', 'Residual Load'])),
+    'power_and_temperature_over_time': (plot_power_and_temperature_over_time,
+                                        lambda df, analytics: downsample(df, ['Power', 'Temperature'])),
+    'correlation_heatmap': (plot_correlation_heatmap, lambda df, analytics: df[CORRELATION_COLUMNS].corr()),
+    'autocorrelation': (plot_autocorrelation, lambda df, analytics: analytics),
+}
+
+def _configure(export: bool, plot: bool, plot_dir: str) -> None:
+    global EXPORT, PLOT, PLOT_DIR
+    EXPORT, PLOT, PLOT_DIR = export, plot, plot_dir
+    if not plot:
+        plt.switch_backend('agg')
+
+def _render(name: str, data) -> float:
+    start = time.perf_counter()
+    FIGURES[name][0](data)
+    return time.perf_counter() - start
+
+def render_report(df: pd.DataFrame, figures: list[str] | None = None, plot_dir: str = 'plots',
+                  workers: int | None = None) -> dict[str, float]:
+    # writes the figures into plot_dir without showing them, split over worker processes; returns
+    # the render time per figure
+    figures = figures or list(FIGURES)
+    analytics = analytics_for(df, [column for column in ANALYTICS_COLUMNS if column in df])
+    inputs = {name: FIGURES[name][1](df, analytics) for name in figures}
+    os.makedirs(plot_dir, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(figures))
+    if workers == 1:
+        _configure(True, False, plot_dir)
+        return {name: _render(name, inputs[name]) for name in figures}
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_configure, initargs=(True, False, plot_dir)) as executor:
+        futures = {name: executor.submit(_render, name, inputs[name]) for name in figures}
+        return {name: future.result() for name, future in futures.items()}
+
+def check_figures(figures: list[str] | None) -> None:
+    unknown = [name for name in figures or [] if name not in FIGURES]
+    if unknown:
+        raise ValueError(f"unknown figures: {', '.join(unknown)}; available: {', '.join(FIGURES)}")
+
+def explore(root: str = 'data/dataset', figures: list[str] | None = None, plot_dir: str = 'plots',
+            workers: int | None = None, show: bool = False) -> dict[str, float]:
+    # the figures of the stored dataset, shown one by one or written by render_report (whose timings
+    # are returned; nothing is timed when they are shown)
+    from dataset_store import read_dataset
+
+    check_figures(figures)
+    df = read_dataset(root)
+    if not show:
+        return render_report(df, figures, plot_dir, workers)
+    analytics = analytics_for(df, [column for column in ANALYTICS_COLUMNS if column in df])
+    for name in figures or FIGURES:
+        FIGURES[name][0](FIGURES[name][1](df, analytics))
+    return {}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the exploration figures of the dataset")
+    parser.add_argument('figures', nargs='*', help=f"default: all of {', '.join(FIGURES)}")
+    parser.add_argument('--out', default='plots')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--show', action='store_true', help="show the figures one by one instead of writing them")
+    args = parser.parse_args()
+
+    try:
+        check_figures(args.figures)
+    except ValueError as error:
+        parser.error(str(error))
 
-def plot_autocorrelation(df):
-    fig, ax = plt.subplots(figsize=(5, 2))
-    plot_acf(df['Power'], ax=ax, lags=60)
-    plt.show()
-
-# load dataset
-df = pd.read_csv('data/dataset.csv', delimiter=';')
-df['Datetime'] = pd.to_datetime(df['Datetime'])
-
-# plotting
-# plot_power_time(df)
-# plot_power_distribution_by_year(df)
-# plot_average_annual_course(df)
-# plot_power_distribution_by_day_and_season(df)
-# plot_average_power_by_day_and_season(df)
-# plot_average_power_by_hour_and_season(df)
-# plot_power_generation_by_source(df)
-# plot_grid_and_residual_load_over_time(df)
-# plot_power_and_temperature_over_time(df)
-plot_correlation_heatmap(df)
-# plot_autocorrelation(df)
+    start = time.perf_counter()
+    timings = explore('data/dataset', args.figures, args.out, args.workers, args.show)
+    for name, seconds in timings.items():
+        print(f"{name:40s} {seconds:6.2f} s")
+    if not args.show:
+        print(f"report written to {args.out}/ in {time.perf_counter() - start:.1f} s")
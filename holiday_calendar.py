@@ -0,0 +1,98 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DAY_NS = 86_400 * 10**9
+
+def _day_numbers(dates) -> np.ndarray:
+    # days since 1970-01-01 of naive (local) dates
+    return pd.DatetimeIndex(dates).as_unit('ns').asi8 // DAY_NS
+
+def _intervals(days: np.ndarray, codes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # run-length encode sorted days into [start, end] intervals of consecutive days with the same code
+    if len(days) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.int8)
+    breaks = np.flatnonzero((np.diff(days) != 1) | (np.diff(codes) != 0)) + 1
+    starts = np.r_[0, breaks]
+    ends = np.r_[breaks, len(days)] - 1
+    return days[starts], days[ends], codes[starts]
+
+# public holidays, school holidays and bridge days as sorted [start, end] day intervals.
+# label() maps an hourly index of any length onto them with one searchsorted pass
+class HolidayCalendar:
+    def __init__(self, public_days, school_days, school_codes, years, tz: str = 'Europe/Berlin'):
+        public_days = np.unique(np.asarray(public_days, dtype=np.int64))
+        school_days = np.asarray(school_days, dtype=np.int64)
+        school_codes = np.asarray(school_codes, dtype=np.int8)
+        # keep the last code given for a day, so later sources override earlier ones
+        order = np.argsort(school_days, kind='stable')
+        school_days, school_codes = school_days[order], school_codes[order]
+        last = np.r_[school_days[1:] != school_days[:-1], True] if len(school_days) else np.empty(0, dtype=bool)
+        school_days, school_codes = school_days[last], school_codes[last]
+
+        self.years = sorted({int(year) for year in years})
+        self.tz = tz
+        self.public_starts, self.public_ends, _ = _intervals(public_days, np.zeros(len(public_days), dtype=np.int8))
+        self.school_starts, self.school_ends, self.school_codes = _intervals(school_days, school_codes)
+
+    @classmethod
+    def from_frames(cls, df_holidays: pd.DataFrame, df_school_holidays: pd.DataFrame, years, tz: str = 'Europe/Berlin'):
+        codes = pd.to_numeric(df_school_holidays['holiday']).to_numpy(dtype=np.int8)
+        return cls(_day_numbers(df_holidays['Holiday']), _day_numbers(df_school_holidays['date']), codes, years, tz)
+
+    @classmethod
+    def from_csv(cls, holidays_path: str = 'data/holidays.csv', school_path: str = 'data/holidays_school.csv',
+                 tz: str = 'Europe/Berlin'):
+        df_holidays = pd.read_csv(holidays_path, index_col=0, parse_dates=['Holiday'])
+        df_school_holidays = pd.read_csv(school_path, parse_dates=['date'])
+        years = df_holidays['Holiday'].dt.year.unique()
+        return cls.from_frames(df_holidays, df_school_holidays, years, tz)
+
+    def _expand(self, starts, ends) -> np.ndarray:
+        lengths = ends - starts + 1
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(starts, lengths) + offsets
+
+    def days(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        school_days = self._expand(self.school_starts, self.school_ends)
+        school_codes = np.repeat(self.school_codes, self.school_ends - self.school_starts + 1)
+        return self._expand(self.public_starts, self.public_ends), school_days, school_codes
+
+    def merge(self, other: 'HolidayCalendar') -> 'HolidayCalendar':
+        public_days, school_days, school_codes = self.days()
+        other_public, other_school, other_codes = other.days()
+        return HolidayCalendar(np.r_[public_days, other_public], np.r_[school_days, other_school],
+                               np.r_[school_codes, other_codes], self.years + other.years, self.tz)
+
+    def save(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        public_days, school_days, school_codes = self.days()
+        np.savez(path, public_days=public_days, school_days=school_days, school_codes=school_codes,
+                 years=np.asarray(self.years), tz=np.asarray(self.tz))
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(data['public_days'], data['school_days'], data['school_codes'], data['years'], str(data['tz']))
+
+    def label(self, datetimes) -> tuple[np.ndarray, np.ndarray]:
+        # holidays apply to the local calendar date of each timestamp
+        index = pd.DatetimeIndex(datetimes)
+        if index.tz is not None:
+            index = index.tz_convert(self.tz).tz_localize(None)
+        days = index.as_unit('ns').asi8 // DAY_NS
+
+        holiday = np.zeros(len(days), dtype=bool)
+        if len(self.public_starts):
+            pos = np.searchsorted(self.public_starts, days, side='right') - 1
+            holiday = (pos >= 0) & (days <= self.public_ends[np.maximum(pos, 0)])
+
+        school = np.zeros(len(days), dtype=np.int8)
+        if len(self.school_starts):
+            pos = np.searchsorted(self.school_starts, days, side='right') - 1
+            inside = (pos >= 0) & (days <= self.school_ends[np.maximum(pos, 0)])
+            school[inside] = self.school_codes[pos[inside]]
+
+        return holiday, school
@@ -0,0 +1,189 @@
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backtest_harness import _limit_threads, build_forecaster
+
+SEARCH_SPACE = {
+    'lags': [24, 48, 24*7, 24*14],
+    'window_sizes': [[24, 72, 72, 72], [24*3, 24*7, 24*7, 24*7], [24*7, 24*14, 24*14, 24*14]],
+    'n_estimators': [100, 300, 600],
+    'learning_rate': [0.03, 0.05, 0.1],
+    'num_leaves': [15, 31, 63],
+    'min_child_samples': [10, 20, 50],
+}
+
+def sample_configs(space: dict, n_trials: int, seed: int = 123) -> list[dict]:
+    # the same seed always gives the same trials, which is what lets a study resume
+    rng = np.random.default_rng(seed)
+    configs, seen = [], set()
+    grid_size = math.prod(len(choices) for choices in space.values())
+    while len(configs) < min(n_trials, grid_size):
+        config = {name: choices[rng.integers(len(choices))] for name, choices in space.items()}
+        key = trial_id(config)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+def trial_id(config: dict) -> str:
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+def to_forecaster_config(config: dict) -> dict:
+    params = {name: value for name, value in config.items() if name not in ('lags', 'window_sizes')}
+    return {'forecaster': 'recursive', 'estimator': 'lightgbm', 'lags': config['lags'],
+            'window_features': {'stats': ['mean', 'std', 'min', 'max'], 'window_sizes': config['window_sizes']},
+            'params': {'random_state': 123, 'verbose': -1, **params}}
+
+def study_fingerprint(y: pd.Series, settings: dict) -> str:
+    # search space, seed, budgets and data a study was started with; its trials are only reused for the same
+    from model_registry import data_fingerprint
+
+    return hashlib.sha1((json.dumps(settings, sort_keys=True) + data_fingerprint(y)).encode()).hexdigest()[:16]
+
+# every finished (trial, rung) is committed at once, so an interrupted search loses at most the running trials
+class StudyStore:
+    def __init__(self, path: str = 'results/studies.db'):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS trials (
+                                       study TEXT, trial_id TEXT, rung INTEGER, budget_hours INTEGER,
+                                       params TEXT, mean_absolute_error REAL, wall_time_s REAL, error TEXT,
+                                       finished TEXT, PRIMARY KEY (study, trial_id, rung))""")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS studies (
+                                       study TEXT PRIMARY KEY, fingerprint TEXT, settings TEXT, created TEXT)""")
+        self.connection.commit()
+
+    def begin(self, study: str, fingerprint: str, settings: dict) -> None:
+        # a study resumes only with the fingerprint it was started with, so no stale scores are reused
+        row = self.connection.execute("SELECT fingerprint FROM studies WHERE study = ?", (study,)).fetchone()
+        if row is not None and row[0] == fingerprint:
+            return
+        if row is not None or self.connection.execute("SELECT 1 FROM trials WHERE study = ? LIMIT 1", (study,)).fetchone():
+            raise ValueError(f"study '{study}' was run with another search space, seed, settings or data; "
+                             "use a new study name or restart it")
+        self.connection.execute("INSERT INTO studies VALUES (?, ?, ?, ?)",
+                                (study, fingerprint, json.dumps(settings, sort_keys=True),
+                                 pd.Timestamp.now(tz='UTC').isoformat()))
+        self.connection.commit()
+
+    def delete(self, study: str) -> None:
+        self.connection.execute("DELETE FROM trials WHERE study = ?", (study,))
+        self.connection.execute("DELETE FROM studies WHERE study = ?", (study,))
+        self.connection.commit()
+
+    def done(self, study: str, rung: int) -> dict:
+        rows = self.connection.execute("SELECT trial_id, mean_absolute_error FROM trials WHERE study = ? AND rung = ?",
+                                       (study, rung)).fetchall()
+        return dict(rows)
+
+    def record(self, study: str, rung: int, budget_hours: int, config: dict, result: dict) -> None:
+        self.connection.execute("INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                (study, trial_id(config), rung, budget_hours, json.dumps(config, sort_keys=True),
+                                 result.get('mean_absolute_error'), result.get('wall_time_s'), result.get('error'),
+                                 pd.Timestamp.now(tz='UTC').isoformat()))
+        self.connection.commit()
+
+    def trials(self, study: str) -> pd.DataFrame:
+        return pd.read_sql_query("SELECT * FROM trials WHERE study = ? ORDER BY rung, mean_absolute_error",
+                                 self.connection, params=(study,))
+
+    def close(self) -> None:
+        self.connection.close()
+
+def evaluate_trial(config: dict, y: pd.Series, initial_train_size: int, budget_hours: int,
+                   steps: int, refit: bool | int, threads: int) -> dict:
+    from threadpoolctl import threadpool_limits
+    from skforecast.model_selection import TimeSeriesFold
+    from feature_cache import backtesting_cached
+
+    start = time.perf_counter()
+    try:
+        with threadpool_limits(limits=threads):
+            forecaster = build_forecaster(to_forecaster_config(config), n_jobs=threads)
+            cv = TimeSeriesFold(steps=steps, initial_train_size=initial_train_size, refit=refit, verbose=False)
+            metric, _ = backtesting_cached(forecaster, y.iloc[:initial_train_size + budget_hours], cv)
+        result = {'mean_absolute_error': float(metric['mean_absolute_error'].iloc[0])}
+    except Exception as error:
+        result = {'mean_absolute_error': None, 'error': repr(error)}
+    result['wall_time_s'] = time.perf_counter() - start
+    return result
+
+def rung_budgets(full_hours: int, n_rungs: int, eta: int, steps: int) -> list[int]:
+    # whole forecast days, growing by eta per rung up to the full backtest span
+    budgets = [full_hours // eta ** (n_rungs - 1 - rung) for rung in range(n_rungs)]
+    return [max(steps, budget // steps * steps) for budget in budgets[:-1]] + [full_hours]
+
+def successive_halving(y: pd.Series, initial_train_size: int, study: str = 'lgbm_recursive',
+                       space: dict | None = None, n_trials: int = 27, eta: int = 3, n_rungs: int = 3,
+                       steps: int = 24, refit: bool | int = False, workers: int | None = None,
+                       store_path: str = 'results/studies.db', seed: int = 123, restart: bool = False) -> pd.DataFrame:
+    space = space or SEARCH_SPACE
+    configs = sample_configs(space, n_trials, seed)
+    budgets = rung_budgets(len(y) - initial_train_size, n_rungs, eta, steps)
+    cpus = os.cpu_count() or 1
+    workers = workers or cpus
+    threads = max(1, cpus // workers)
+
+    settings = {'space': space, 'seed': seed, 'n_trials': n_trials, 'eta': eta, 'n_rungs': n_rungs, 'steps': steps,
+                'refit': refit, 'initial_train_size': initial_train_size}
+    store = StudyStore(store_path)
+    context = multiprocessing.get_context('spawn')
+    try:
+        if restart:
+            store.delete(study)
+        store.begin(study, study_fingerprint(y, settings), settings)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_limit_threads, initargs=(threads,)) as executor:
+            for rung, budget in enumerate(budgets):
+                done = store.done(study, rung)
+                pending = [config for config in configs if trial_id(config) not in done]
+                futures = {executor.submit(evaluate_trial, config, y, initial_train_size, budget, steps, refit, threads): config
+                           for config in pending}
+                for future in as_completed(futures):
+                    result = future.result()
+                    store.record(study, rung, budget, futures[future], result)
+                    done[trial_id(futures[future])] = result['mean_absolute_error']
+
+                # promote the best 1/eta of this rung (failed trials last, ties broken by id)
+                ranked = sorted(configs, key=lambda config: (done[trial_id(config)] is None,
+                                                             done[trial_id(config)] or 0.0, trial_id(config)))
+                configs = ranked[:max(1, len(configs) // eta)]
+    finally:
+        trials = store.trials(study)
+        store.close()
+
+    return trials
+
+if __name__ == "__main__":
+    from dataset_store import read_dataset
+    from toy_model import backtest_series
+
+    parser = argparse.ArgumentParser(description="Tune the recursive LGBM forecaster with successive halving")
+    parser.add_argument('--study', default='lgbm_recursive')
+    parser.add_argument('--trials', type=int, default=27)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--rungs', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--validation-days', type=int, default=365, help="length of the full backtest span")
+    parser.add_argument('--restart', action='store_true', help="drop the stored trials of the study first")
+    args = parser.parse_args()
+
+    df = read_dataset('data/dataset', columns=['Power'])
+    df_power = df.set_index('Datetime').sort_index()
+    y = backtest_series(df_power)
+    initial_train_size = len(y) - 24 * args.validation_days
+
+    trials = successive_halving(y, initial_train_size, study=args.study, n_trials=args.trials,
+                                eta=args.eta, n_rungs=args.rungs, workers=args.workers, restart=args.restart)
+    print(trials[trials['rung'] == trials['rung'].max()].head())
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+def data_fingerprint(y: pd.Series, exog: pd.DataFrame | None = None) -> str:
+    # hash of the values, hours and exog columns a forecaster was fitted or last updated on
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(y.to_numpy(dtype=float)).tobytes())
+    digest.update(f"{y.index[0]}|{y.index[-1]}|{len(y)}".encode())
+    if exog is not None:
+        digest.update(json.dumps(list(exog.columns)).encode())
+        digest.update(np.ascontiguousarray(exog.to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(data, indent=1))
+    os.replace(tmp, path)
+
+def _set_last_window(forecaster, y: pd.Series) -> None:
+    tail = y.iloc[-forecaster.window_size:]
+    if isinstance(forecaster.last_window_, pd.DataFrame):
+        tail = tail.to_frame(forecaster.series_name_in_ or y.name)
+    forecaster.last_window_ = tail
+
+# fitted forecasters on disk, one directory per name. meta.json records the feature configuration,
+# the hours the forecaster has seen and their fingerprint; the pickle name contains the fingerprint,
+# so meta.json is switched atomically to a complete file and a crash never pairs a stale model with it
+class ModelRegistry:
+    def __init__(self, root: str = 'models'):
+        self.root = Path(root)
+
+    def meta(self, name: str) -> dict | None:
+        path = self.root / name / 'meta.json'
+        return json.loads(path.read_text()) if path.exists() else None
+
+    def save(self, name: str, forecaster, y: pd.Series, exog: pd.DataFrame | None = None,
+             config: dict | None = None, trained_through=None) -> dict:
+        # y (and exog) are the hours the forecaster has seen, the last of them form its last window
+        directory = self.root / name
+        directory.mkdir(parents=True, exist_ok=True)
+        old = self.meta(name)
+        fingerprint = data_fingerprint(y, exog)
+        filename = f"forecaster-{fingerprint[:12]}.joblib"
+        # uncompressed, so the arrays inside can be memory-mapped on load
+        joblib.dump(forecaster, directory / filename)
+
+        meta = {'name': name,
+                'file': filename,
+                'forecaster': type(forecaster).__name__,
+                'estimator': type(getattr(forecaster, 'estimator', None)).__name__,
+                'config': config,
+                'window_size': int(forecaster.window_size),
+                'exog': None if exog is None else list(exog.columns),
+                'trained_through': str(trained_through if trained_through is not None else y.index[-1]),
+                'seen_through': str(y.index[-1]),
+                'n_seen': len(y),
+                'fingerprint': fingerprint,
+                'saved': pd.Timestamp.now(tz='UTC').isoformat()}
+        _write_json(directory / 'meta.json', meta)
+        if old is not None and old['file'] != filename:
+            (directory / old['file']).unlink(missing_ok=True)
+        return meta
+
+    def load(self, name: str, mmap: bool = True) -> tuple[object, dict]:
+        meta = self.meta(name)
+        if meta is None:
+            raise KeyError(f"no saved forecaster named '{name}' under {self.root}")
+        forecaster = joblib.load(self.root / name / meta['file'], mmap_mode='r' if mmap else None)
+        return forecaster, meta
+
+    def matches(self, meta: dict, y: pd.Series, exog: pd.DataFrame | None = None) -> bool:
+        # the stored hours are unchanged in y (no revisions), so the model can be warm started
+        seen = y.loc[:meta['seen_through']]
+        if len(seen) != meta['n_seen'] or (exog is None) != (meta['exog'] is None):
+            return False
+        return data_fingerprint(seen, None if exog is None else exog.loc[seen.index]) == meta['fingerprint']
+
+    def warm_start(self, name: str, y: pd.Series, exog: pd.DataFrame | None = None, refit: str = 'window',
+                   boost_rounds: int = 50) -> tuple[object, dict]:
+        # bring a saved forecaster up to the end of y:
+        #   'window'      only the last window moves forward, the estimator is kept
+        #   'incremental' boosted trees (LightGBM, XGBoost) continue training on the new hours,
+        #                 other estimators are refitted
+        #   'full'        refit on all of y
+        forecaster, meta = self.load(name)
+        if not self.matches(meta, y, exog):
+            raise ValueError(f"the data seen by '{name}' changed since it was saved, refit it")
+        new = y.loc[y.index > pd.Timestamp(meta['seen_through'])]
+        if len(new) == 0:
+            return forecaster, meta
+
+        trained_through = meta['trained_through']
+        if refit == 'incremental' and not _continue_boosting(forecaster, y, exog, len(new), boost_rounds):
+            refit = 'full'
+        if refit == 'full':
+            forecaster.fit(y=y, exog=exog)
+        if refit in ('incremental', 'full'):
+            trained_through = y.index[-1]
+        _set_last_window(forecaster, y)
+        meta = self.save(name, forecaster, y, exog, config=meta['config'], trained_through=trained_through)
+        return forecaster, meta
+
+    def load_or_fit(self, name: str, fit, y: pd.Series, exog: pd.DataFrame | None = None,
+                    config: dict | None = None, refit: str = 'window') -> object:
+        # fit() builds and fits a new forecaster on y; it only runs when nothing usable is saved
+        meta = self.meta(name)
+        # compared the way it was stored, as JSON
+        config = json.loads(json.dumps(config))
+        if meta is not None and meta['config'] == config and self.matches(meta, y, exog):
+            forecaster, _ = self.warm_start(name, y, exog, refit=refit)
+            return forecaster
+        forecaster = fit()
+        self.save(name, forecaster, y, exog, config=config)
+        return forecaster
+
+    def load_or_build(self, name: str, config: dict, y: pd.Series, exog: pd.DataFrame | None = None,
+                      refit: str = 'window') -> object:
+        # the forecaster described by config (backtest_harness.build_forecaster), fitted on y unless a saved
+        # one with the same config and unchanged data can be warm started
+        from backtest_harness import build_forecaster
+
+        def fit():
+            forecaster = build_forecaster(config)
+            forecaster.fit(y=y, exog=exog)
+            return forecaster
+
+        return self.load_or_fit(name, fit, y, exog, config=config, refit=refit)
+
+def _continue_boosting(forecaster, y: pd.Series, exog: pd.DataFrame | None, n_new: int, boost_rounds: int) -> bool:
+    # add boost_rounds trees fitted on the training rows of the new hours only
+    estimator = getattr(forecaster, 'estimator', None)
+    kind = type(estimator).__name__
+    if kind not in ('LGBMRegressor', 'XGBRegressor') or not hasattr(forecaster, 'create_train_X_y'):
+        return False
+    tail = slice(len(y) - n_new - forecaster.window_size, None)
+    X_new, y_new = forecaster.create_train_X_y(y=y.iloc[tail], exog=None if exog is None else exog.iloc[tail])
+
+    n_estimators = estimator.get_params()['n_estimators']
+    estimator.set_params(n_estimators=boost_rounds)
+    try:
+        if kind == 'LGBMRegressor':
+            estimator.fit(X_new, y_new, init_model=estimator.booster_)
+        else:
+            estimator.fit(X_new, y_new, xgb_model=estimator.get_booster())
+    finally:
+        estimator.set_params(n_estimators=n_estimators)
+    forecaster.training_range_ = pd.Index([forecaster.training_range_[0], y.index[-1]])
+    return True
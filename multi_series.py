@@ -0,0 +1,139 @@
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backtest_harness import _limit_threads, build_estimator
+from batch_predict import origin_windows, predict_batched, raw_predictor
+from feature_cache import LagMatrix
+
+# short and seasonal lags instead of all 168, so the stacked matrix of every series stays small
+GLOBAL_LAGS = list(range(1, 25)) + [48, 72, 24*7]
+GLOBAL_CONFIG = {'estimator': 'lightgbm', 'lags': GLOBAL_LAGS,
+                 'window_features': {'stats': ['mean', 'std', 'min', 'max'], 'window_sizes': [24, 24*7, 24*7, 24*7]},
+                 'params': {'random_state': 123, 'verbose': -1}}
+
+def panel_to_series(panel: pd.DataFrame) -> dict[str, pd.Series]:
+    # one hourly series per (region, series) of a long panel, keyed 'region/series'
+    series = {}
+    for (region, name), group in panel.groupby(['region', 'series'], observed=True, sort=True):
+        values = group.set_index('Datetime')['value'].astype(float).sort_index()
+        series[f"{region}/{name}"] = values.asfreq('h').rename(f"{region}/{name}")
+    return series
+
+def _fill_rows(spec: dict, code: int, values: np.ndarray, offset: int, lags, stats, sizes) -> int:
+    # worker: build the lag/window rows of one series and write them into its slice of the shared block
+    shm = SharedMemory(name=spec['name'])
+    try:
+        X = np.ndarray((spec['rows'], spec['features']), dtype=np.float32, buffer=shm.buf)
+        y = np.ndarray((spec['rows'],), dtype=np.float32, buffer=shm.buf, offset=X.nbytes)
+        matrix = LagMatrix(values, lags, stats, sizes)
+        n = len(matrix.X)
+        X[offset:offset + n, :-1] = matrix.X
+        X[offset:offset + n, -1] = code
+        y[offset:offset + n] = matrix.y[matrix.window_size:]
+        del X, y
+    finally:
+        shm.close()
+    return n
+
+# one estimator for all series (global model). Every series is standardized with its own training
+# mean/std and gets an ordinal series code as last feature. The stacked training matrix is filled
+# by worker processes, one series each, directly in shared memory; prediction runs all series
+# through predict_batched, so each forecast step is one model call for the whole panel
+class GlobalForecaster:
+    def __init__(self, config: dict = GLOBAL_CONFIG):
+        self.config = config
+        self.lags = np.asarray(config['lags'], dtype=np.int64)
+        window_features = config.get('window_features') or {'stats': [], 'window_sizes': []}
+        self.stats, self.sizes = list(window_features['stats']), list(window_features['window_sizes'])
+        self.window_size = int(max([self.lags.max()] + self.sizes))
+        self.n_features = len(self.lags) + len(self.stats) + 1
+        self.series_names = []
+        self.scales = {}
+        self.estimator = None
+
+    def _code(self, name: str) -> int:
+        return self.series_names.index(name)
+
+    def fit(self, series: dict[str, pd.Series], workers: int | None = None) -> 'GlobalForecaster':
+        cpus = os.cpu_count() or 1
+        workers = workers or cpus
+        self.series_names = sorted(series)
+        self.scales = {}
+        scaled = {}
+        for name in self.series_names:
+            values = series[name].to_numpy(dtype=float)
+            mean, std = np.nanmean(values), np.nanstd(values)
+            self.scales[name] = (float(mean), float(std) if std > 0 else 1.0)
+            scaled[name] = (values - self.scales[name][0]) / self.scales[name][1]
+
+        offsets = np.cumsum([0] + [max(len(scaled[name]) - self.window_size, 0) for name in self.series_names])
+        rows = int(offsets[-1])
+        shm = SharedMemory(create=True, size=max(rows * (self.n_features + 1) * 4, 1))
+        spec = {'name': shm.name, 'rows': rows, 'features': self.n_features}
+        try:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_limit_threads, initargs=(1,)) as executor:
+                futures = [executor.submit(_fill_rows, spec, code, scaled[name], int(offsets[code]),
+                                           self.lags, self.stats, self.sizes)
+                           for code, name in enumerate(self.series_names)]
+                for future in futures:
+                    future.result()
+
+            X = np.ndarray((rows, self.n_features), dtype=np.float32, buffer=shm.buf)
+            y = np.ndarray((rows,), dtype=np.float32, buffer=shm.buf, offset=X.nbytes)
+            # targets that are missing in a series (gaps) cannot be learned from
+            keep = ~np.isnan(y)
+            X_train, y_train = (X, y) if keep.all() else (X[keep], y[keep])
+            # the estimator itself is multithreaded over all cores (data-parallel tree building)
+            self.estimator = build_estimator(self.config['estimator'], self.config.get('params', {}), n_jobs=cpus)
+            fit_kwargs = {'categorical_feature': [self.n_features - 1]} if self.config['estimator'] == 'lightgbm' else {}
+            self.estimator.fit(X_train, y_train, **fit_kwargs)
+            del X, y, X_train, y_train
+        finally:
+            shm.close()
+            shm.unlink()
+        return self
+
+    def predict(self, series: dict[str, pd.Series], steps: int = 24) -> pd.DataFrame:
+        # forecasts of the steps hours after the end of every series, in original units
+        names = [name for name in self.series_names if name in series]
+        ends = {series[name].index[-1] for name in names}
+        if len(ends) != 1:
+            raise ValueError("all series must end at the same hour to be forecast together")
+        windows = np.empty((len(names), self.window_size))
+        codes = np.empty((len(names), steps, 1))
+        for i, name in enumerate(names):
+            values = series[name].to_numpy(dtype=float)
+            mean, std = self.scales[name]
+            windows[i] = origin_windows((values - mean) / std, [len(values)], self.window_size)[0]
+            codes[i] = self._code(name)
+        index = pd.date_range(ends.pop() + pd.Timedelta(hours=1), periods=steps, freq='h')
+        pred = predict_batched(raw_predictor(self.estimator), windows, self.lags, self.stats, self.sizes, steps, codes)
+
+        scale = np.array([self.scales[name] for name in names])
+        pred = pred * scale[:, 1:2] + scale[:, 0:1]
+        return pd.DataFrame(pred.T, index=index, columns=names)
+
+if __name__ == "__main__":
+    from dataset_store import read_panel
+
+    parser = argparse.ArgumentParser(description="Fit one global forecaster for every SMARD series of the panel")
+    parser.add_argument('--regions', nargs='+', default=None)
+    parser.add_argument('--start', default='2020-01-01')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    series = panel_to_series(read_panel('data/panel', regions=args.regions, start=args.start))
+    forecaster = GlobalForecaster().fit(series, workers=args.workers)
+    predictions = forecaster.predict(series, steps=24)
+    Path('results').mkdir(exist_ok=True)
+    predictions.to_csv('results/global_forecast.csv')
+    print(predictions.iloc[:, :6])
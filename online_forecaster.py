@@ -0,0 +1,197 @@
+import copy
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from alignment import HOUR_NS, to_utc_ns
+
+# hourly values in a buffer of twice the capacity: every value is written at i and i + capacity,
+# so an append is O(1) and the latest n <= capacity values are always one contiguous view
+class RingBuffer:
+    def __init__(self, capacity: int, next_ns: int):
+        # next_ns is the hour the next appended value belongs to
+        self.capacity = capacity
+        self._data = np.full(2 * capacity, np.nan)
+        self._pos = 0
+        self.size = 0
+        self.next_ns = next_ns
+
+    def append(self, values) -> None:
+        for value in np.asarray(values, dtype=float).ravel():
+            self._data[self._pos] = self._data[self._pos + self.capacity] = value
+            self._pos = (self._pos + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+        self.next_ns += len(np.atleast_1d(values)) * HOUR_NS
+
+    def last(self, n: int | None = None) -> np.ndarray:
+        n = self.size if n is None else n
+        if n > self.size:
+            raise ValueError(f"only {self.size} hours are buffered, {n} requested")
+        end = self._pos + self.capacity
+        return self._data[end - n:end]
+
+    def index(self, n: int | None = None, tz: str = 'Europe/Berlin') -> pd.DatetimeIndex:
+        n = self.size if n is None else n
+        index = pd.DatetimeIndex(self.next_ns - HOUR_NS * np.arange(n, 0, -1, dtype=np.int64), tz='UTC')
+        return index.tz_convert(tz)
+
+    def series(self, n: int | None = None, tz: str = 'Europe/Berlin', name: str = 'Power') -> pd.Series:
+        index = self.index(n, tz)
+        return pd.Series(self.last(n), index=pd.DatetimeIndex(index, freq='h'), name=name)
+
+# streaming wrapper around a fitted ForecasterRecursive or ForecasterEquivalentDate. New hours only
+# go into the ring buffer, predictions pass its tail as last_window. Full refits on the buffered
+# history run in a background thread, every refit_every_hours or when the recent forecast error
+# exceeds drift_ratio times the error measured right after the last refit; the fitted copy then
+# replaces the served model with a single reference swap, so predict never waits for training.
+# Refits only see the buffered hours, so they are saved under '<name>.online' in the registry and
+# the full-history model under name stays warm-startable. One lock guards the buffer and the
+# forecast/error bookkeeping shared by observe, predict and the refit thread
+class OnlineForecaster:
+    def __init__(self, forecaster, y: pd.Series, features=None, capacity: int | None = None,
+                 refit_every_hours: int | None = 24*7, drift_ratio: float | None = 1.5, drift_window: int = 24*7,
+                 registry=None, name: str | None = None, on_refit=None, tz: str = 'Europe/Berlin'):
+        self.model = forecaster
+        self.features = features
+        self.refit_every_hours = refit_every_hours
+        self.drift_ratio = drift_ratio
+        self.drift_window = drift_window
+        self.registry, self.name = registry, name
+        self.on_refit = on_refit
+        self.tz = tz
+        self.name_y = y.name or 'Power'
+
+        # refits train on the buffered hours, so capacity is also the training history length
+        capacity = capacity or len(y)
+        kept = y.iloc[-capacity:]
+        self.buffer = RingBuffer(capacity, int(to_utc_ns(kept.index[:1])[0]))
+        self.buffer.append(kept.to_numpy(dtype=float))
+
+        self.generation = 0
+        self.hours_since_refit = 0
+        self.last_refit = None
+        self.last_error = None
+        self._forecasts = {}
+        self._errors = deque(maxlen=drift_window)
+        self._baseline = None
+        self._lock = threading.Lock()
+        self._refit_lock = threading.Lock()
+        self._refitting = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='refit')
+
+    @property
+    def next_hour(self) -> pd.Timestamp:
+        return pd.Timestamp(self.buffer.next_ns, tz='UTC').tz_convert(self.tz)
+
+    def observe(self, datetimes, values) -> int:
+        # hours must continue the buffer; hours already buffered are ignored. Missing values are
+        # refused, they would end up in the last window of every forecast and in the next refit
+        times = to_utc_ns(datetimes)
+        values = np.asarray(values, dtype=float)
+        with self._lock:
+            new = times >= self.buffer.next_ns
+            times, values = times[new], values[new]
+            if not len(times):
+                return 0
+            if (np.diff(np.r_[self.buffer.next_ns - HOUR_NS, times]) != HOUR_NS).any():
+                raise ValueError("observations must continue the buffer hour by hour")
+            if np.isnan(values).any():
+                raise ValueError("observations must not be missing, fill them before they are streamed")
+
+            for time_ns, value in zip(times, values):
+                pred = self._forecasts.pop(time_ns, None)
+                if pred is not None:
+                    self._errors.append(abs(value - pred))
+            self.buffer.append(values)
+            self.hours_since_refit += len(values)
+
+            if self._baseline is None and len(self._errors) == self.drift_window:
+                self._baseline = float(np.mean(self._errors))
+            due = self._refit_due()
+        if due:
+            self.refit()
+        return len(values)
+
+    def drift(self) -> float | None:
+        # recent mean absolute error relative to the one measured after the last refit
+        baseline, errors = self._baseline, list(self._errors)
+        if baseline is None or not baseline or not errors:
+            return None
+        return float(np.mean(errors)) / baseline
+
+    def _refit_due(self) -> bool:
+        if self.refit_every_hours and self.hours_since_refit >= self.refit_every_hours:
+            return True
+        drift = self.drift()
+        return self.drift_ratio is not None and drift is not None and drift > self.drift_ratio
+
+    def predict(self, steps: int = 24, exog: pd.DataFrame | None = None) -> pd.Series:
+        with self._lock:
+            model = self.model
+            # a copy, later observations overwrite the ring buffer
+            last_window = self.buffer.series(model.window_size, self.tz, self.name_y).copy()
+        if exog is None and self.features is not None and getattr(model, 'exog_in_', False):
+            exog = self.features.horizon(last_window.index[-1], steps, list(model.exog_names_in_))
+        if exog is not None:
+            pred = model.predict(steps=steps, last_window=last_window, exog=exog)
+        else:
+            pred = model.predict(steps=steps, last_window=last_window)
+        # remembered to score the forecast error (drift) once the hours are observed
+        with self._lock:
+            for time_ns, value in zip(to_utc_ns(pred.index), pred.to_numpy()):
+                if time_ns >= self.buffer.next_ns:
+                    self._forecasts.setdefault(int(time_ns), float(value))
+            while len(self._forecasts) > 4 * self.drift_window:
+                self._forecasts.pop(next(iter(self._forecasts)))
+        return pred
+
+    def refit(self):
+        # start a background refit unless one is already running; returns its future
+        with self._refit_lock:
+            if self._refitting is None or self._refitting.done():
+                with self._lock:
+                    y = self.buffer.series(None, self.tz, self.name_y).copy()
+                    self.hours_since_refit = 0
+                self._refitting = self._executor.submit(self._refit, y)
+            return self._refitting
+
+    def _refit(self, y: pd.Series) -> None:
+        start = time.perf_counter()
+        try:
+            model = copy.deepcopy(self.model)
+            exog = None
+            if self.features is not None and getattr(model, 'exog_in_', False):
+                exog = self.features.exog_for(y.index, list(model.exog_names_in_))
+            if exog is not None:
+                model.fit(y=y, exog=exog)
+            else:
+                model.fit(y=y)
+            if self.registry is not None and self.name:
+                meta = self.registry.meta(self.name) or {}
+                self.registry.save(f"{self.name}.online", model, y, exog, config=meta.get('config'))
+        except Exception as error:
+            self.last_error = repr(error)
+            return
+        # predictions pass the buffered window explicitly, so hours observed while training need no replay
+        with self._lock:
+            self.model = model
+            self.generation += 1
+            self.last_refit = {'fitted_through': str(y.index[-1]), 'wall_time_s': time.perf_counter() - start}
+            self.last_error = None
+            self._errors.clear()
+            self._baseline = None
+        if self.on_refit is not None:
+            self.on_refit(model)
+
+    def status(self) -> dict:
+        return {'next_hour': str(self.next_hour), 'generation': self.generation,
+                'hours_since_refit': self.hours_since_refit, 'drift': self.drift(),
+                'refitting': self._refitting is not None and not self._refitting.done(),
+                'last_refit': self.last_refit, 'last_error': self.last_error}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
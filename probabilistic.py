@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from batch_predict import origin_windows, predict_batched, raw_predictor
+from feature_cache import window_spec
+
+def backtest_residuals(y: pd.Series, predictions: pd.DataFrame) -> pd.DataFrame:
+    # out-of-sample errors (y - pred) of backtesting predictions, with the step ahead (1..steps)
+    # each one was forecast at, counted within its fold
+    steps = predictions.groupby('fold').cumcount() + 1 if 'fold' in predictions else np.arange(1, len(predictions) + 1)
+    residuals = y.loc[predictions.index].to_numpy(dtype=float) - predictions['pred'].to_numpy(dtype=float)
+    return pd.DataFrame({'step': np.asarray(steps), 'residual': residuals}, index=predictions.index).dropna()
+
+def bootstrap_paths(forecaster, y: pd.Series, residuals, steps: int = 24, n_samples: int = 1000,
+                    exog: pd.DataFrame | None = None, seed: int = 123) -> tuple[np.ndarray, np.ndarray]:
+    # point forecast and n_samples simulated paths after the end of y. Every path starts from the same
+    # window and gets a residual drawn at each step, which is fed back into later steps. The point
+    # forecast is one more row without noise, so all of it is one batched prediction per step.
+    # residuals are one-step-ahead errors: the feedback already compounds them over the horizon, so
+    # drawing multi-step errors would count that growth twice. A backtest_residuals frame is reduced
+    # to its step 1 rows; an array or Series is taken to hold one-step errors already
+    if forecaster.differentiation is not None or forecaster.transformer_y is not None:
+        raise ValueError("bootstrapping does not support differentiation or transformer_y")
+    if isinstance(residuals, pd.DataFrame):
+        residuals = residuals.loc[residuals['step'] == 1, 'residual']
+    residuals = np.asarray(residuals, dtype=float)
+    residuals = residuals[~np.isnan(residuals)]
+    if not len(residuals):
+        raise ValueError("no residuals to draw from")
+    stats, sizes = window_spec(forecaster.window_features)
+    window = origin_windows(y.to_numpy(dtype=float), [len(y)], forecaster.window_size)
+    windows = np.repeat(window, n_samples + 1, axis=0)
+
+    rng = np.random.default_rng(seed)
+    noise = np.zeros((n_samples + 1, steps))
+    noise[1:] = rng.choice(residuals, size=(n_samples, steps))
+
+    future = None
+    if forecaster.exog_in_:
+        if exog is None:
+            raise ValueError("the forecaster was fitted with exog, pass exog for the forecast hours")
+        hours = pd.date_range(y.index[-1] + pd.Timedelta(hours=1), periods=steps, freq='h')
+        if not exog.index[:steps].equals(hours):
+            raise ValueError(f"exog must hold the {steps} hours from {hours[0]}, the hour after the end of y")
+        values = exog[forecaster.exog_names_in_].to_numpy(dtype=float)[:steps]
+        future = np.broadcast_to(values, (n_samples + 1,) + values.shape)
+    pred = predict_batched(raw_predictor(forecaster.estimator), windows, forecaster.lags, stats, sizes, steps,
+                           future, noise)
+    return pred[0], pred[1:]
+
+def predict_bootstrap_interval(forecaster, y: pd.Series, residuals, steps: int = 24, interval: tuple = (5, 95),
+                               quantiles: tuple = (), n_samples: int = 1000, exog: pd.DataFrame | None = None,
+                               seed: int = 123) -> pd.DataFrame:
+    # 'pred', 'lower_bound', 'upper_bound' (percentiles of the simulated paths) and optional q_<quantile> columns
+    point, paths = bootstrap_paths(forecaster, y, residuals, steps, n_samples, exog, seed)
+    index = pd.date_range(y.index[-1] + pd.Timedelta(hours=1), periods=steps, freq='h')
+    bounds = np.percentile(paths, interval, axis=0)
+    df = pd.DataFrame({'pred': point, 'lower_bound': bounds[0], 'upper_bound': bounds[1]}, index=index)
+    for quantile in quantiles:
+        df[f"q_{quantile}"] = np.quantile(paths, quantile, axis=0)
+    return df
+
+def calibrate_conformal(residuals: pd.DataFrame, interval: float = 0.9) -> pd.Series:
+    # split conformal half-widths per step ahead, from calibration residuals (backtest_residuals)
+    # that the model was not fitted on; the finite-sample rank ceil((n + 1) * interval) keeps coverage
+    def width(errors: pd.Series) -> float:
+        errors = np.sort(np.abs(errors.to_numpy()))
+        rank = int(np.ceil((len(errors) + 1) * interval))
+        return errors[min(rank, len(errors)) - 1]
+
+    return residuals.groupby('step')['residual'].apply(width).rename('width')
+
+def conformal_interval(predictions: pd.DataFrame, widths: pd.Series) -> pd.DataFrame:
+    # adds 'lower_bound'/'upper_bound' to point predictions: backtest predictions (with 'fold') or a
+    # single forecast whose rows are steps 1..n
+    steps = predictions.groupby('fold').cumcount() + 1 if 'fold' in predictions else pd.Series(np.arange(1, len(predictions) + 1))
+    half = widths.reindex(np.asarray(steps)).to_numpy()
+    if np.isnan(half).any():
+        raise ValueError("the calibration residuals do not cover every step ahead")
+    predictions = predictions.copy()
+    predictions['lower_bound'] = predictions['pred'] - half
+    predictions['upper_bound'] = predictions['pred'] + half
+    return predictions
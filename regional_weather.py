@@ -0,0 +1,171 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from alignment import align_source, canonical_index
+from tracing import count
+
+WEATHER_COLUMNS = {
+    'time': 'Datetime',
+    'temp': 'Temperature',
+    'dwpt': 'Dew Point',
+    'rhum': 'Relative Humidity',
+    'prcp': 'Precipitation',
+    'snow': 'Snow Depth',
+    'wdir': 'Wind Direction',
+    'wspd': 'Average Wind Speed',
+    'wpgt': 'Peak Wind Speed',
+    'pres': 'Average Sea-Level Air Pressure',
+    'tsun': 'Sunshine Duration',
+    'coco': 'Weather Condition Code'
+}
+
+# averaged over stations; wind direction and condition codes are not meaningful as weighted means
+AGGREGATED_COLUMNS = ['Temperature', 'Dew Point', 'Relative Humidity', 'Precipitation', 'Snow Depth',
+                      'Average Wind Speed', 'Peak Wind Speed', 'Average Sea-Level Air Pressure', 'Sunshine Duration']
+
+# Meteostat (WMO) stations spread over the 50Hertz control area: id -> (name, latitude, longitude)
+STATIONS_50HERTZ = {
+    '10147': ('Hamburg-Fuhlsbuettel', 53.63, 9.99),
+    '10162': ('Schwerin', 53.64, 11.39),
+    '10170': ('Rostock-Warnemuende', 54.18, 12.08),
+    '10361': ('Magdeburg', 52.10, 11.58),
+    '10379': ('Potsdam', 52.38, 13.06),
+    '10382': ('Berlin-Tegel', 52.56, 13.31),
+    '10384': ('Berlin-Tempelhof', 52.47, 13.40),
+    '10469': ('Leipzig/Halle', 51.43, 12.24),
+    '10488': ('Dresden-Klotzsche', 51.13, 13.75),
+    '10496': ('Cottbus', 51.78, 14.32),
+    '10554': ('Erfurt-Weimar', 50.98, 10.96),
+}
+
+# larger cities of the area (latitude, longitude); stations near demand get the weight
+LOAD_CENTRES_50HERTZ = [(52.52, 13.40), (53.55, 10.00), (51.34, 12.37), (51.05, 13.74),
+                        (50.98, 11.03), (52.13, 11.63), (54.09, 12.14)]
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(a))
+
+def inverse_distance_weights(stations: dict, points, power: float = 2.0) -> np.ndarray:
+    # one weight per station: inverse-distance weights to every point (e.g. load centres), averaged
+    # over the points and normalized to sum to 1
+    lat = np.array([station[1] for station in stations.values()])
+    lon = np.array([station[2] for station in stations.values()])
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    distance = haversine_km(lat[None, :], lon[None, :], points[:, :1], points[:, 1:2])
+    weights = 1.0 / np.maximum(distance, 1.0) ** power
+    weights = (weights / weights.sum(axis=1, keepdims=True)).mean(axis=0)
+    return weights / weights.sum()
+
+def fetch_station_year(station_id: str, year: int) -> pd.DataFrame:
+    from meteostat import Hourly
+
+    df = Hourly(station_id, datetime(year, 1, 1), datetime(year, 12, 31, 23)).fetch()
+    df.index = df.index.tz_localize('UTC')
+    return df.reset_index().rename(columns=WEATHER_COLUMNS)
+
+# raw hourly data of many stations, cached as one Parquet file per station and year. Past years are
+# complete once cached; the current year is fetched again. Stations are fetched concurrently and
+# aggregated with fixed weights, renormalized per hour over the stations that reported a value
+class RegionalWeather:
+    def __init__(self, stations: dict = STATIONS_50HERTZ, weights: np.ndarray | dict | None = None,
+                 points=LOAD_CENTRES_50HERTZ, cache_root: str = 'data/cache/weather', workers: int = 8,
+                 fetch=fetch_station_year, offline: bool = False):
+        self.stations = dict(stations)
+        self.ids = list(self.stations)
+        self.cache_root = Path(cache_root)
+        self.workers = workers
+        self.fetch = fetch
+        self.offline = offline
+        self.weights = self._weights(weights, points)
+
+    def _weights(self, weights, points) -> np.ndarray:
+        # explicit weights (array or {station: weight}, e.g. area shares), else the cached
+        # inverse-distance weights to the points
+        if isinstance(weights, dict):
+            weights = np.array([weights.get(station_id, 0.0) for station_id in self.ids], dtype=float)
+        if weights is None:
+            path = self.cache_root / 'weights.json'
+            cached = json.loads(path.read_text()) if path.exists() else {}
+            key = json.dumps([self.ids, np.asarray(points, dtype=float).tolist()])
+            if key not in cached:
+                cached[key] = inverse_distance_weights(self.stations, points).tolist()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix('.tmp')
+                tmp.write_text(json.dumps(cached))
+                os.replace(tmp, path)
+            weights = cached[key]
+        weights = np.asarray(weights, dtype=float)
+        if len(weights) != len(self.ids) or weights.sum() <= 0:
+            raise ValueError("one non-negative weight per station is needed")
+        return weights / weights.sum()
+
+    def _path(self, station_id: str, year: int) -> Path:
+        return self.cache_root / station_id / f"{year}.parquet"
+
+    def station_year(self, station_id: str, year: int) -> pd.DataFrame:
+        path = self._path(station_id, year)
+        if path.exists() and (self.offline or year < pd.Timestamp.now(tz='UTC').year):
+            count('weather.cache_hits')
+            return pd.read_parquet(path)
+        if self.offline:
+            raise FileNotFoundError(f"weather of station {station_id} in {year} is not cached")
+        df = self.fetch(station_id, year)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return df
+
+    def station_data(self, start, end) -> dict[str, pd.DataFrame]:
+        # all station-years overlapping [start, end], fetched concurrently
+        years = range(pd.Timestamp(start).year, pd.Timestamp(end).year + 1)
+        jobs = [(station_id, year) for station_id in self.ids for year in years]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            frames = list(executor.map(lambda job: self.station_year(*job), jobs))
+
+        data = {station_id: [] for station_id in self.ids}
+        for (station_id, _), df in zip(jobs, frames):
+            if len(df):
+                data[station_id].append(df)
+        return {station_id: pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame(columns=['Datetime'])
+                for station_id, dfs in data.items()}
+
+    def aggregate(self, station_data: dict[str, pd.DataFrame], start, end,
+                  columns: list[str] = AGGREGATED_COLUMNS) -> pd.DataFrame:
+        # (hours, stations, columns) cube on the UTC hourly grid, then one weighted reduction
+        index = canonical_index(pd.Timestamp(start), pd.Timestamp(end))
+        cube = np.full((len(index), len(self.ids), len(columns)), np.nan)
+        for k, station_id in enumerate(self.ids):
+            df = station_data.get(station_id)
+            if df is None or not len(df):
+                continue
+            df = df.reindex(columns=['Datetime'] + columns)
+            df['Datetime'] = pd.to_datetime(df['Datetime'], utc=True)
+            aligned, _ = align_source(df.drop_duplicates('Datetime'), index, name=station_id)
+            cube[:, k, :] = aligned[columns].to_numpy(dtype=float)
+
+        # weights of stations without a value in an hour are left out and the rest renormalized
+        present = ~np.isnan(cube)
+        weights = self.weights[None, :, None] * present
+        total = weights.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = np.where(total > 0, np.nansum(cube * self.weights[None, :, None], axis=1) / total, np.nan)
+
+        df = pd.DataFrame(values, columns=columns)
+        df.insert(0, 'Datetime', pd.DatetimeIndex(index, tz='UTC'))
+        df['Stations Reporting'] = present.any(axis=2).sum(axis=1)
+        return df
+
+    def fetch_hourly(self, start, end, columns: list[str] = AGGREGATED_COLUMNS) -> pd.DataFrame:
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if start.tz is None:
+            start, end = start.tz_localize('UTC'), end.tz_localize('UTC')
+        return self.aggregate(self.station_data(start, end), start, end, columns)
@@ -0,0 +1,73 @@
+import json
+import os
+from pathlib import Path
+
+# weekly SMARD chunks on disk, keyed by (filter_id, region, resolution, timestamp).
+# index.json keeps the last seen remote timestamps and the complete chunks; a chunk
+# is complete once a newer week exists, so only the open week is downloaded again
+class SmardCache:
+    def __init__(self, root: str = 'data/cache/smard'):
+        self.root = Path(root)
+        self._indexes = {}
+        self._dirty = set()
+
+    def _dir(self, filter_id: int, region: str, resolution: str) -> Path:
+        return self.root / f"{filter_id}_{region}_{resolution}"
+
+    def _index(self, filter_id: int, region: str, resolution: str) -> dict:
+        key = (filter_id, region, resolution)
+        if key not in self._indexes:
+            path = self._dir(*key) / "index.json"
+            if path.exists():
+                with open(path) as f:
+                    index = json.load(f)
+                self._indexes[key] = {"timestamps": index["timestamps"], "complete": set(index["complete"])}
+            else:
+                self._indexes[key] = {"timestamps": [], "complete": set()}
+        return self._indexes[key]
+
+    def timestamps(self, filter_id: int, region: str, resolution: str) -> list[int]:
+        return self._index(filter_id, region, resolution)["timestamps"]
+
+    def set_timestamps(self, filter_id: int, region: str, resolution: str, timestamps: list[int]) -> None:
+        index = self._index(filter_id, region, resolution)
+        if index["timestamps"] != timestamps:
+            index["timestamps"] = list(timestamps)
+            self._dirty.add((filter_id, region, resolution))
+
+    def is_complete(self, filter_id: int, region: str, resolution: str, timestamp: int) -> bool:
+        return timestamp in self._index(filter_id, region, resolution)["complete"]
+
+    def get(self, filter_id: int, region: str, resolution: str, timestamp: int) -> list | None:
+        path = self._dir(filter_id, region, resolution) / f"{timestamp}.json"
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def put(self, filter_id: int, region: str, resolution: str, timestamp: int, series: list, complete: bool) -> None:
+        directory = self._dir(filter_id, region, resolution)
+        directory.mkdir(parents=True, exist_ok=True)
+        _write_json(directory / f"{timestamp}.json", series)
+
+        index = self._index(filter_id, region, resolution)
+        if complete:
+            index["complete"].add(timestamp)
+        else:
+            index["complete"].discard(timestamp)
+        self._dirty.add((filter_id, region, resolution))
+
+    def flush(self) -> None:
+        for key in self._dirty:
+            index = self._indexes[key]
+            self._dir(*key).mkdir(parents=True, exist_ok=True)
+            _write_json(self._dir(*key) / "index.json",
+                        {"timestamps": index["timestamps"], "complete": sorted(index["complete"])})
+        self._dirty.clear()
+
+def _write_json(path: Path, data) -> None:
+    # write-then-rename, so an interrupted run never leaves a truncated chunk behind
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tracing import count
+
+SMARD_BASE_URL = "https://www.smard.de/app/chart_data"
+WEEK_MS = 7 * 24 * 3600 * 1000
+
+# spaces out request starts per host to at most `rate` requests per second
+class RateLimiter:
+    def __init__(self, rate: float | None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url: str) -> None:
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def create_session(pool_size: int = 8, retries: int = 5, backoff_factor: float = 0.5) -> requests.Session:
+    retry = Retry(total=retries,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset({"GET"}),
+                  respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# keep-alive session plus a bounded thread pool for the SMARD chart_data API;
+# base_url can point at any server with the same layout, e.g. a local stand-in
+class SmardClient:
+    def __init__(self, base_url: str = SMARD_BASE_URL, workers: int = 8, rate_limit: float | None = 20.0,
+                 retries: int = 5, backoff_factor: float = 0.5, timeout: float = 60):
+        self.base_url = base_url.rstrip("/")
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.session = create_session(pool_size=self.workers, retries=retries, backoff_factor=backoff_factor)
+        self.limiter = RateLimiter(rate_limit)
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
+
+    def get_json(self, url: str) -> dict:
+        self.limiter.wait(url)
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        count('http.requests')
+        count('http.bytes_downloaded', len(response.content))
+        return response.json()
+
+    def get_timestamps(self, filter_id: int, region: str, resolution: str) -> list[int]:
+        url = f"{self.base_url}/{filter_id}/{region}/index_{resolution}.json"
+        return self.get_json(url)["timestamps"]
+
+    def get_series(self, filter_id: int, region: str, resolution: str, timestamp: int) -> list:
+        url = f"{self.base_url}/{filter_id}/{region}/{filter_id}_{region}_{resolution}_{timestamp}.json"
+        return self.get_json(url)["series"]
+
+    def map(self, func: Callable, items: Iterable) -> Iterator:
+        # results come back in input order, whatever order the requests finish in
+        if self.workers == 1:
+            return map(func, items)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="smard")
+        return self._executor.map(func, items)
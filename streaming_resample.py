@@ -0,0 +1,107 @@
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+HOUR_NS = 3600 * 10**9
+
+# incremental version of load_dataset's localize + resample('1h', closed='left', label='right').mean() * 4.
+# Only the open hour and the DST fold state are carried from one chunk to the next
+class HourlyResampler:
+    def __init__(self, tz: str = 'Europe/Berlin', factor: float = 4.0):
+        self.tz = tz
+        self.factor = factor
+        self.columns = None
+        self._prev_local = None
+        self._fold = False
+        self._label = None
+        self._sums = None
+        self._counts = None
+        self._last_emitted = None
+
+    def _localize(self, local: pd.DatetimeIndex) -> np.ndarray:
+        # repeated wall times after the autumn clock change are ambiguous: they are summer time
+        # until the local time jumps backwards, winter time afterwards (what ambiguous='infer' does)
+        probe = local.tz_localize(self.tz, ambiguous='NaT', nonexistent='shift_forward')
+        ambiguous = np.asarray(probe.isna())
+        local_ns = local.as_unit('ns').asi8
+        prev = local_ns[0] if self._prev_local is None else self._prev_local
+        backwards = np.diff(local_ns, prepend=prev) < 0
+
+        run = np.cumsum(~ambiguous)
+        fold = pd.Series(backwards & ambiguous).groupby(run).cummax().to_numpy()
+        if self._fold:
+            fold |= ambiguous & (run == 0)
+        self._fold = bool(ambiguous[-1] and fold[-1])
+        self._prev_local = local_ns[-1]
+
+        utc = local.tz_localize(self.tz, ambiguous=~fold, nonexistent='shift_forward')
+        return utc.tz_convert('UTC').as_unit('ns').asi8
+
+    def _emit(self, labels: np.ndarray, sums: np.ndarray, counts: np.ndarray) -> pd.DataFrame:
+        # hours without any reading come out as NaN rows, like resample does
+        first = labels[0] if self._last_emitted is None else self._last_emitted + HOUR_NS
+        grid = first + HOUR_NS * np.arange((labels[-1] - first) // HOUR_NS + 1, dtype=np.int64)
+        values = np.full((len(grid), sums.shape[1]), np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values[(labels - first) // HOUR_NS] = np.where(counts > 0, sums / counts, np.nan) * self.factor
+        self._last_emitted = labels[-1]
+
+        df = pd.DataFrame(values, columns=self.columns)
+        df.insert(0, 'Datetime', pd.DatetimeIndex(grid, tz='UTC'))
+        return df
+
+    def feed(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        if self.columns is None:
+            self.columns = [column for column in chunk.columns if column != 'Datetime']
+        if chunk.empty:
+            return self._emit_empty()
+        local = pd.DatetimeIndex(pd.to_datetime(chunk['Datetime'], format='%Y-%m-%d %H:%M:00'))
+        labels = (self._localize(local) // HOUR_NS + 1) * HOUR_NS
+        if (np.diff(labels) < 0).any() or (self._label is not None and labels[0] < self._label):
+            raise ValueError("readings must be in chronological order to be streamed")
+
+        values = chunk[self.columns].to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        hours, starts = np.unique(labels, return_index=True)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0)
+        counts = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+
+        # merge with the hour left open by the previous chunk
+        if self._label is not None:
+            if hours[0] == self._label:
+                sums[0] += self._sums
+                counts[0] += self._counts
+            else:
+                hours = np.r_[self._label, hours]
+                sums = np.vstack([self._sums, sums])
+                counts = np.vstack([self._counts, counts])
+
+        # the last hour may continue in the next chunk
+        self._label, self._sums, self._counts = hours[-1], sums[-1], counts[-1]
+        if len(hours) == 1:
+            return self._emit_empty()
+        return self._emit(hours[:-1], sums[:-1], counts[:-1])
+
+    def flush(self) -> pd.DataFrame:
+        if self._label is None:
+            return self._emit_empty()
+        df = self._emit(np.array([self._label]), self._sums[None, :], self._counts[None, :])
+        self._label = self._sums = self._counts = None
+        return df
+
+    def _emit_empty(self) -> pd.DataFrame:
+        df = pd.DataFrame(np.empty((0, len(self.columns or []))), columns=self.columns)
+        df.insert(0, 'Datetime', pd.DatetimeIndex([], tz='UTC'))
+        return df
+
+def iter_hourly(path: str, chunksize: int = 100_000, delimiter: str = ';', tz: str = 'Europe/Berlin') -> Iterator[pd.DataFrame]:
+    # peak memory depends on chunksize, not on the length of the file
+    resampler = HourlyResampler(tz=tz)
+    for chunk in pd.read_csv(path, delimiter=delimiter, chunksize=chunksize):
+        df = resampler.feed(chunk)
+        if len(df):
+            yield df
+    df = resampler.flush()
+    if len(df):
+        yield df
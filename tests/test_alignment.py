@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from alignment import align_sources
+
+def test_coverage_reports_gaps_per_source():
+    hours = pd.date_range('2024-03-30', periods=48, freq='h', tz='Europe/Berlin')
+    load = pd.DataFrame({'Datetime': hours, 'Power': np.arange(48.)})
+    # weather misses 3 hours in a row and 1 hour alone, and is stored in UTC
+    weather = pd.DataFrame({'Datetime': hours.tz_convert('UTC'), 'Temperature': np.arange(48.)}).drop([10, 11, 12, 30])
+    # quarter-hourly readings, averaged into the hour they end
+    quarters = pd.date_range(hours[0] - pd.Timedelta(hours=1), hours[-1], freq='15min', inclusive='left')
+    solar = pd.DataFrame({'Datetime': quarters, 'Solar': np.repeat(np.arange(48.), 4)})
+
+    df, coverage = align_sources({'load': load, 'weather': weather, 'solar': solar}, raw=('solar',), tz='Europe/Berlin')
+    assert df['Datetime'].equals(pd.Series(hours, name='Datetime'))
+    np.testing.assert_array_equal(df['Solar'], np.arange(48.))
+    assert df['Temperature'].isna().sum() == 4
+
+    report = coverage.set_index('source')
+    assert report.loc['load', 'coverage'] == 1.0 and report.loc['load', 'gaps'] == 0
+    assert report.loc['weather', 'present'] == 44
+    assert report.loc['weather', 'gaps'] == 2 and report.loc['weather', 'max_gap_hours'] == 3
+    assert report.loc['weather', 'last'] == hours[-1].tz_convert('UTC')
+    assert report.loc['solar', 'coverage'] == 1.0
+
+def test_repeated_columns_are_rejected():
+    hours = pd.date_range('2024-01-01', periods=4, freq='h', tz='UTC')
+    frame = pd.DataFrame({'Datetime': hours, 'Power': 1.0})
+    with pytest.raises(ValueError, match="repeats columns"):
+        align_sources({'a': frame, 'b': frame})
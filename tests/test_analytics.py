@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from analytics import acf_fft, pacf_durbin_levinson
+
+stattools = pytest.importorskip('statsmodels.tsa.stattools')
+
+def hourly_load(hours: int = 24 * 60) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(hours)
+    return 1000 + 100 * np.sin(2 * np.pi * t / 24) + 30 * np.sin(2 * np.pi * t / 168) + rng.normal(0, 10, hours)
+
+def test_acf_equals_statsmodels():
+    values = hourly_load()
+    np.testing.assert_allclose(acf_fft(values, nlags=400)[:, 0], stattools.acf(values, nlags=400, fft=False),
+                               atol=1e-10)
+    # every column of a 2-d array at once
+    both = np.column_stack([values, values[::-1]])
+    np.testing.assert_allclose(acf_fft(both, nlags=50)[:, 1], stattools.acf(values[::-1], nlags=50), atol=1e-10)
+
+def test_acf_scales_lag_sums_by_their_valid_pairs():
+    values = hourly_load()
+    values[[5, 100, 101, 700]] = np.nan
+    x = values - np.nanmean(values)
+    n = len(x)
+    # sum over the valid pairs of each lag, scaled up to the n - k pairs of a complete series
+    acov = np.array([np.nansum(x[k:] * x[:n - k]) / np.sum(~np.isnan(x[k:] * x[:n - k])) * (n - k) / n
+                     for k in range(101)])
+    np.testing.assert_allclose(acf_fft(values, nlags=100)[:, 0], acov / acov[0], atol=1e-10)
+
+def test_pacf_equals_statsmodels():
+    values = hourly_load()
+    pacf = pacf_durbin_levinson(acf_fft(values, nlags=200), nlags=200)[:, 0]
+    np.testing.assert_allclose(pacf, stattools.pacf(values, nlags=200, method='ldb'), atol=1e-8)
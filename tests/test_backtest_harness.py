@@ -0,0 +1,7 @@
+from backtest_harness import MODEL_REGISTRY
+from feature_store import WEATHER_FEATURES
+
+def test_configured_models_use_no_observed_weather():
+    # observed weather of the forecast hours would be the actuals, in backtests and forecasts alike
+    for name, config in MODEL_REGISTRY.items():
+        assert not set(config.get('exog') or []) & set(WEATHER_FEATURES), name
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+from lightgbm import LGBMRegressor
+from skforecast.preprocessing import RollingFeatures
+from skforecast.recursive import ForecasterRecursive
+
+from batch_predict import predict_origins
+
+def series(hours: int = 24 * 30) -> tuple[pd.Series, pd.DataFrame]:
+    index = pd.date_range('2024-01-01', periods=hours, freq='h', tz='UTC')
+    rng = np.random.default_rng(0)
+    y = pd.Series(np.sin(np.arange(hours) * 2 * np.pi / 24) * 100 + 1000 + rng.normal(0, 5, hours), index=index, name='Power')
+    exog = pd.DataFrame({'Hour': index.hour.astype(float), 'Temperature': rng.normal(5, 3, hours)}, index=index)
+    return y, exog
+
+@pytest.mark.parametrize('with_exog', [False, True])
+def test_batched_origins_equal_forecaster_predict(with_exog):
+    y, exog = series()
+    window_features = RollingFeatures(stats=['mean', 'std', 'min', 'max', 'sum', 'median'],
+                                      window_sizes=[24, 48, 12, 36, 24, 24])
+    forecaster = ForecasterRecursive(estimator=LGBMRegressor(n_estimators=20, random_state=0, verbose=-1), lags=24,
+                                     window_features=window_features)
+    forecaster.fit(y[:24 * 20], exog=exog[:24 * 20] if with_exog else None)
+
+    origins = [48, 24 * 20, 24 * 20 + 7, 24 * 25]
+    batched = predict_origins(forecaster, y, origins, steps=36, exog=exog if with_exog else None)
+    for origin in origins:
+        expected = forecaster.predict(steps=36, last_window=y.iloc[origin - forecaster.window_size:origin],
+                                      exog=exog.iloc[origin:origin + 36] if with_exog else None)
+        assert batched.index[origins.index(origin)] == y.index[origin]
+        np.testing.assert_allclose(batched.loc[y.index[origin]].to_numpy(), expected.to_numpy(), rtol=1e-9)
+
+def test_origins_by_timestamp_need_exog_for_their_horizon():
+    y, exog = series()
+    forecaster = ForecasterRecursive(estimator=LGBMRegressor(n_estimators=5, verbose=-1), lags=24)
+    forecaster.fit(y[:24 * 20], exog=exog[:24 * 20])
+    assert len(predict_origins(forecaster, y, [y.index[100]], steps=24, exog=exog)) == 1
+    with pytest.raises(ValueError, match="exog must cover"):
+        predict_origins(forecaster, y, [y.index[-10]], steps=24, exog=exog)
@@ -0,0 +1,8 @@
+import benchmark
+
+def test_refit_stages_backtest_every_fold_cached_and_uncached():
+    stages = ['backtest_lgbm_refit', 'backtest_lgbm_refit_cached']
+    results = benchmark.run(years=0.2, folds=2, repeat=1, memory=False, stages=stages)
+    assert set(results['stages']) == set(stages)
+    for name in stages:
+        assert results['stages'][name]['folds'] == 2 and results['stages'][name]['rows'] == 48
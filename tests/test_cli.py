@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest_harness
+import create_dataset
+from cli import main
+from dataset_store import write_dataset
+
+CONFIG = {'forecaster': 'recursive', 'estimator': 'lightgbm', 'lags': 24, 'exog': ['Hour', 'Temperature'],
+          'params': {'n_estimators': 10, 'random_state': 123, 'verbose': -1}}
+
+def test_predict_needs_forecasts_of_observed_exog(tmp_path, monkeypatch, capsys):
+    # Temperature is only observed up to the end of the dataset, Hour is known for any hour
+    times = pd.date_range('2024-01-01', periods=24 * 30, freq='h', tz='Europe/Berlin')
+    df = pd.DataFrame({'Datetime': times, 'Power': np.sin(np.arange(len(times)) / 4) + 10, 'Hour': times.hour,
+                       'Temperature': np.cos(np.arange(len(times)) / 24)})
+    write_dataset(df, tmp_path / 'dataset')
+    monkeypatch.setitem(backtest_harness.MODEL_REGISTRY, 'lgbm_small', CONFIG)
+    monkeypatch.setattr(create_dataset, 'load_holiday_calendar', lambda years: None)
+    argv = ['predict', '--model', 'lgbm_small', '--root', str(tmp_path / 'dataset'), '--models', str(tmp_path / 'models')]
+
+    with pytest.raises(SystemExit, match=r"\['Temperature'\].*--forecasts"):
+        main(argv)
+
+    ahead = pd.date_range(times[-1] + pd.Timedelta(hours=1), periods=24, freq='h')
+    pd.DataFrame({'Datetime': ahead, 'Temperature': 0.5}).to_csv(tmp_path / 'forecasts.csv', sep=';', index=False)
+    main(argv + ['--forecasts', str(tmp_path / 'forecasts.csv'), '--out', str(tmp_path / 'forecast.csv')])
+    forecast = pd.read_csv(tmp_path / 'forecast.csv', sep=';')
+    assert len(forecast) == 24 and forecast['pred'].notna().all()
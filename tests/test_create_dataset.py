@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import create_dataset
+from create_dataset import CONSUMPTION, _download_smard_series, fetch_smard_data, last_complete_hour, update_dataset
+from fixture_server import FixtureServer
+from smard_cache import SmardCache
+from smard_client import WEEK_MS, SmardClient
+
+# serves three weekly chunks in order and fails on the last one
+class FailingClient:
+    def __init__(self, fail_at: int):
+        self.fail_at = fail_at
+
+    def map(self, func, items):
+        return map(func, items)
+
+    def get_timestamps(self, filter_id, region, resolution):
+        return [0, WEEK_MS, 2 * WEEK_MS]
+
+    def get_series(self, filter_id, region, resolution, timestamp):
+        if timestamp == self.fail_at:
+            raise ConnectionError("chunk failed")
+        return [[timestamp, 1.0]]
+
+def test_failed_download_keeps_index_of_written_chunks(tmp_path):
+    cache = SmardCache(tmp_path)
+    with pytest.raises(ConnectionError):
+        _download_smard_series(FailingClient(fail_at=2 * WEEK_MS), 0, 3 * WEEK_MS, {1: 'Power'}, 'r', 'hour', cache=cache)
+
+    reopened = SmardCache(tmp_path)
+    assert reopened.timestamps(1, 'r', 'hour') == [0, WEEK_MS, 2 * WEEK_MS]
+    assert reopened.is_complete(1, 'r', 'hour', 0)
+    assert reopened.is_complete(1, 'r', 'hour', WEEK_MS)
+
+def test_update_accepts_naive_end_date(tmp_path):
+    path = tmp_path / 'dataset.csv'
+    times = pd.date_range('2024-01-01', periods=48, freq='h', tz='Europe/Berlin')
+    df = pd.DataFrame({'Datetime': times, **{column: 1.0 for column in CONSUMPTION.values()}})
+    df.to_csv(path, sep=';', index=False)
+
+    assert update_dataset(str(path), end_date=datetime(2024, 1, 2, 12)).empty
+
+def test_holiday_calendar_keeps_christmas_holidays_of_the_year_before(tmp_path, monkeypatch):
+    def school_holidays(year_start, year_end, state):
+        # Weihnachtsferien as listed on the page of year_start - the ones starting in December
+        days = pd.date_range(f"{year_start}-12-23", f"{year_start + 1}-01-03", freq='D')
+        return pd.DataFrame({'date': days, 'holiday': '6'})
+
+    monkeypatch.setattr(create_dataset, 'fetch_holiday_data',
+                        lambda years, region: pd.DataFrame({'Holiday': pd.to_datetime([f"{years[0]}-01-01"])}))
+    monkeypatch.setattr(create_dataset, 'scrap_school_holidays_data', school_holidays)
+    calendar = create_dataset.load_holiday_calendar([2025], cache_path=str(tmp_path / 'holidays.npz'))
+
+    _, school = calendar.label(pd.DatetimeIndex(['2025-01-02 12:00'], tz='Europe/Berlin'))
+    assert school[0] == 6
+
+def test_unpublished_hours_stay_missing(tmp_path):
+    # the fixture server answers null for the hours of the open week after its end
+    with FixtureServer(tmp_path, start='2024-01-01', end='2024-01-10 10:00') as server:
+        with SmardClient(server.url('smard'), rate_limit=None) as client:
+            df = fetch_smard_data(datetime(2024, 1, 8), datetime(2024, 1, 14), CONSUMPTION, '50Hertz', 'hour',
+                                  client=client)
+
+    last = pd.Timestamp('2024-01-10 09:00', tz='Europe/Berlin')
+    assert last_complete_hour(df) == last
+    assert df.loc[df['Datetime'] > last, list(CONSUMPTION.values())].isna().all().all()
+    assert df.loc[df['Datetime'] <= last, list(CONSUMPTION.values())].notna().all().all()
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from dataset_store import append_dataset, read_dataset, write_dataset
+
+def hourly(start, periods: int, tz: str = 'Europe/Berlin') -> pd.DataFrame:
+    times = pd.date_range(start, periods=periods, freq='h', tz=tz)
+    return pd.DataFrame({'Datetime': times, 'Power': np.arange(periods, dtype=float)})
+
+def test_append_into_a_new_year(tmp_path):
+    write_dataset(hourly('2025-12-31 00:00', 24), tmp_path)
+    # the first new hour falls in a year that has no partition yet
+    append_dataset(hourly('2026-01-01 00:00', 6), tmp_path)
+
+    df = read_dataset(tmp_path)
+    assert len(df) == 24 + 6
+    assert df['Datetime'].is_monotonic_increasing
+    assert sorted(path.name for path in tmp_path.glob('*.arrow')) == ['year=2025.arrow', 'year=2026.arrow']
+
+def test_append_replaces_the_stored_tail_across_new_year(tmp_path):
+    write_dataset(hourly('2025-12-31 00:00', 20), tmp_path)
+    append_dataset(hourly('2025-12-31 18:00', 12), tmp_path)
+
+    df = read_dataset(tmp_path)
+    assert len(df) == 18 + 12
+    assert df['Datetime'].iloc[-1] == pd.Timestamp('2026-01-01 05:00', tz='Europe/Berlin')
+
+def test_append_to_an_empty_store(tmp_path):
+    append_dataset(hourly('2026-01-01', 5), tmp_path)
+    assert len(read_dataset(tmp_path)) == 5
+
+def test_utc_frame_is_selected_by_local_year(tmp_path):
+    write_dataset(hourly('2019-12-31 20:00', 10, tz='UTC'), tmp_path)
+
+    df = read_dataset(tmp_path, start=pd.Timestamp('2020-01-01 00:00', tz='Europe/Berlin'))
+    assert df['Datetime'].iloc[0] == pd.Timestamp('2019-12-31 23:00', tz='UTC')
+    assert len(df) == 7
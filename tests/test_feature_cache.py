@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from skforecast.model_selection import TimeSeriesFold, backtesting_forecaster
+from skforecast.recursive import ForecasterRecursive
+
+from feature_cache import LagMatrix, backtesting_cached
+
+def test_extend_a_matrix_shorter_than_its_window():
+    matrix = LagMatrix(np.arange(10.), range(1, 49))
+    matrix.extend(np.arange(10., 15.))
+    assert matrix.n == 15 and len(matrix.X) == 0
+
+    matrix.extend(np.arange(15., 60.))
+    expected = LagMatrix(np.arange(60.), range(1, 49))
+    np.testing.assert_array_equal(matrix.X, expected.X)
+    np.testing.assert_array_equal(matrix.y, expected.y)
+
+def test_matrix_with_other_lags_is_rejected():
+    y = pd.Series(np.sin(np.arange(300) / 4), index=pd.date_range('2024-01-01', periods=300, freq='h', tz='UTC'))
+    forecaster = ForecasterRecursive(estimator=LinearRegression(), lags=24)
+    cv = TimeSeriesFold(steps=24, initial_train_size=200, refit=False)
+
+    metric, _ = backtesting_cached(forecaster, y, cv, matrix=LagMatrix(y.to_numpy(), range(1, 25)))
+    assert metric['mean_absolute_error'].iloc[0] < 1e-6
+    with pytest.raises(ValueError, match="another series or feature set"):
+        backtesting_cached(forecaster, y, cv, matrix=LagMatrix(y.to_numpy(), range(1, 49)))
+
+def test_exog_is_matched_to_y_by_time():
+    index = pd.date_range('2024-01-01', periods=300, freq='h', tz='UTC')
+    y = pd.Series(np.sin(np.arange(300) / 4) + np.arange(300) % 24 / 10, index=index)
+    exog = pd.DataFrame({'Hour': (index.hour).astype(float)}, index=index)
+    forecaster = ForecasterRecursive(estimator=LinearRegression(), lags=24)
+    cv = TimeSeriesFold(steps=24, initial_train_size=200, refit=True)
+
+    expected, _ = backtesting_forecaster(forecaster, y, cv, metric='mean_absolute_error', exog=exog, show_progress=False)
+    # a longer frame is fine, its rows are taken by time
+    longer = pd.concat([exog, pd.DataFrame({'Hour': [0.0]}, index=[index[-1] + pd.Timedelta(hours=1)])])
+    metric, _ = backtesting_cached(forecaster, y, cv, exog=longer)
+    np.testing.assert_allclose(metric['mean_absolute_error'], expected['mean_absolute_error'])
+
+    with pytest.raises(ValueError, match="cover every hour of y"):
+        backtesting_cached(forecaster, y, cv, exog=exog.shift(1, freq='h'))
+    with pytest.raises(ValueError, match="one row per hour"):
+        backtesting_cached(forecaster, y, cv, exog=longer.to_numpy())
@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from skforecast.recursive import ForecasterRecursive
+
+from feature_store import FeatureStore
+from forecast_server import ForecastService, serve
+
+def fitted_service(**kwargs) -> tuple[ForecastService, pd.Series]:
+    # Temperature is observed for the history only, so the horizon needs forecasts for it
+    index = pd.date_range('2024-01-01', periods=24 * 20, freq='h', tz='UTC')
+    df = pd.DataFrame({'Datetime': index, 'Power': np.sin(np.arange(len(index)) / 4) + 10,
+                       'Temperature': np.cos(np.arange(len(index)) / 24)})
+    y = df.set_index('Datetime')['Power'].asfreq('h')
+    features = FeatureStore.build(df, columns=['Hour', 'Temperature'], horizon_hours=48)
+    forecaster = ForecasterRecursive(estimator=LinearRegression(), lags=24)
+    forecaster.fit(y, exog=features.exog_for(y.index))
+    return ForecastService(forecaster, y, features, tz='UTC', horizon_hours=48, **kwargs), y
+
+def submit(service: ForecastService, keys: list) -> list[Future]:
+    futures = [Future() for _ in keys]
+    service._predict(list(zip(keys, futures)))
+    return futures
+
+def test_bad_requests_fail_alone():
+    service, y = fitted_service()
+    try:
+        forecasts = pd.DataFrame({'Datetime': pd.date_range(service.next_hour, periods=24, freq='h'), 'Temperature': 0.5})
+        service.add_forecasts(forecasts)
+        next_ns = service._next_ns
+        hour = 3600 * 10**9
+        good, too_early, nan_exog = submit(service, [(next_ns, 24), (next_ns - 10**6 * hour, 24), (next_ns, 36)])
+        assert len(good.result()) == 24
+        with pytest.raises(ValueError, match="origins"):
+            too_early.result()
+        with pytest.raises(ValueError, match="Temperature"):
+            nan_exog.result()
+
+        service.add_forecasts(forecasts.assign(Datetime=forecasts['Datetime'] + pd.Timedelta(hours=24)))
+        assert len(service.forecast(steps=36)) == 36
+    finally:
+        service.close()
+
+def test_observations_move_the_feature_horizon():
+    service, y = fitted_service()
+    try:
+        end = service.features.index[-1]
+        hours = pd.date_range(service.next_hour, periods=100, freq='h')
+        service.observe(hours, np.ones(len(hours)))
+        assert service.features.index[-1] >= service.next_hour + pd.Timedelta(hours=48)
+        assert service.features.index[-1] > end
+        assert not np.isnan(service.features.exog_for(service.features.index[-48:], ['Hour']).to_numpy()).any()
+    finally:
+        service.close()
+
+class SlowEstimator:
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    def predict(self, X):
+        time.sleep(0.2)
+        return self.estimator.predict(X)
+
+def test_slow_forecast_answers_504():
+    service, y = fitted_service(request_timeout=0.05)
+    service.add_forecasts(pd.DataFrame({'Datetime': [service.next_hour], 'Temperature': [0.5]}))
+    service.estimator = SlowEstimator(service.estimator)
+    server = serve(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/forecast?steps=1", timeout=5)
+        assert error.value.code == 504
+        assert 'not computed in time' in json.loads(error.value.read())['error']
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
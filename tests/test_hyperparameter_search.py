@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hyperparameter_search import SEARCH_SPACE, StudyStore, study_fingerprint
+
+def series(values) -> pd.Series:
+    return pd.Series(values, index=pd.date_range('2024-01-01', periods=len(values), freq='h', tz='UTC'))
+
+def test_fingerprint_covers_settings_and_data():
+    y = series(np.arange(100.))
+    settings = {'space': SEARCH_SPACE, 'seed': 123}
+    assert study_fingerprint(y, settings) == study_fingerprint(y.copy(), dict(settings))
+    assert study_fingerprint(y, settings) != study_fingerprint(y, {**settings, 'seed': 124})
+    assert study_fingerprint(y, settings) != study_fingerprint(series(np.arange(100.) + 1), settings)
+
+def test_study_resumes_only_with_the_same_fingerprint(tmp_path):
+    store = StudyStore(str(tmp_path / 'studies.db'))
+    store.begin('lgbm', 'a', {'seed': 1})
+    store.record('lgbm', 0, 24, {'lags': 24}, {'mean_absolute_error': 1.0})
+
+    store.begin('lgbm', 'a', {'seed': 1})
+    assert len(store.done('lgbm', 0)) == 1
+    with pytest.raises(ValueError, match="another search space"):
+        store.begin('lgbm', 'b', {'seed': 2})
+
+    store.delete('lgbm')
+    store.begin('lgbm', 'b', {'seed': 2})
+    assert store.done('lgbm', 0) == {}
+    store.close()
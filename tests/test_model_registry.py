@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+import backtest_harness
+from model_registry import ModelRegistry
+
+CONFIG = {'forecaster': 'recursive', 'estimator': 'lightgbm', 'lags': 24,
+          'params': {'n_estimators': 10, 'random_state': 123, 'verbose': -1}}
+
+def series(hours: int) -> pd.Series:
+    values = np.sin(np.arange(hours) * 2 * np.pi / 24) + np.random.default_rng(0).normal(0, 0.1, hours)
+    return pd.Series(values, index=pd.date_range('2024-01-01', periods=hours, freq='h', tz='UTC'))
+
+def test_load_or_build_fits_from_the_config_once(tmp_path, monkeypatch):
+    built = []
+    build_forecaster = backtest_harness.build_forecaster
+    monkeypatch.setattr(backtest_harness, 'build_forecaster', lambda config: built.append(config) or build_forecaster(config))
+    registry = ModelRegistry(tmp_path)
+    y = series(500)
+
+    first = registry.load_or_build('lgbm', CONFIG, y)
+    assert len(built) == 1 and first.estimator.n_estimators == 10
+
+    # new hours only move the last window of the saved model
+    again = registry.load_or_build('lgbm', CONFIG, series(524))
+    assert len(built) == 1
+    assert again.last_window_.index[-1] == series(524).index[-1]
+
+    # an edited config is built and fitted again instead of loading the stale model
+    changed = registry.load_or_build('lgbm', {**CONFIG, 'params': {**CONFIG['params'], 'n_estimators': 20}}, series(524))
+    assert len(built) == 2 and changed.estimator.n_estimators == 20
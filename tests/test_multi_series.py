@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from multi_series import GlobalForecaster, panel_to_series
+
+CONFIG = {'estimator': 'lightgbm', 'lags': list(range(1, 25)),
+          'window_features': {'stats': ['mean', 'max'], 'window_sizes': [24, 48]},
+          'params': {'n_estimators': 50, 'random_state': 123, 'verbose': -1}}
+
+def panel(hours: int = 24 * 40) -> pd.DataFrame:
+    # two regions on very different levels sharing one daily shape
+    index = pd.date_range('2024-01-01', periods=hours, freq='h', tz='UTC')
+    shape = np.sin(np.arange(hours) * 2 * np.pi / 24)
+    frames = [pd.DataFrame({'Datetime': index, 'region': region, 'series': 'Grid Load', 'value': level + scale * shape})
+              for region, level, scale in [('50Hertz', 8000., 1000.), ('TransnetBW', 500., 50.)]]
+    return pd.concat(frames, ignore_index=True)
+
+def test_global_forecaster_fits_and_predicts_every_series():
+    series = panel_to_series(panel())
+    assert sorted(series) == ['50Hertz/Grid Load', 'TransnetBW/Grid Load']
+    train = {name: values.iloc[:-24] for name, values in series.items()}
+
+    forecaster = GlobalForecaster(CONFIG).fit(train, workers=1)
+    predictions = forecaster.predict(train, steps=24)
+    assert list(predictions.columns) == sorted(series)
+    assert predictions.index[0] == series['50Hertz/Grid Load'].index[-24]
+    # in the units of each series, although both were learned by one model on standardized values
+    for name, values in series.items():
+        error = np.abs(predictions[name].to_numpy() - values.iloc[-24:].to_numpy()).mean()
+        assert error < 0.05 * np.ptp(values.to_numpy())
+
+def test_series_must_end_together():
+    series = panel_to_series(panel())
+    forecaster = GlobalForecaster(CONFIG).fit(series, workers=1)
+    with pytest.raises(ValueError, match="end at the same hour"):
+        forecaster.predict({'50Hertz/Grid Load': series['50Hertz/Grid Load'],
+                            'TransnetBW/Grid Load': series['TransnetBW/Grid Load'].iloc[:-1]})
@@ -0,0 +1,103 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from skforecast.recursive import ForecasterRecursive
+
+from model_registry import ModelRegistry
+from online_forecaster import OnlineForecaster
+
+def series(hours: int) -> pd.Series:
+    index = pd.date_range('2024-01-01', periods=hours, freq='h', tz='UTC')
+    return pd.Series(np.sin(np.arange(hours) * 2 * np.pi / 24) * 100 + 1000, index=index, name='Power')
+
+def fitted(y: pd.Series) -> ForecasterRecursive:
+    forecaster = ForecasterRecursive(estimator=LinearRegression(), lags=24)
+    forecaster.fit(y)
+    return forecaster
+
+def test_forecasts_start_after_the_newest_observation():
+    y = series(24 * 14)
+    online = OnlineForecaster(fitted(y[:24 * 10]), y[:24 * 10], capacity=24 * 7, refit_every_hours=None, tz='UTC')
+    try:
+        assert online.observe(y.index[24 * 10:24 * 12], y.iloc[24 * 10:24 * 12]) == 48
+        assert online.observe(y.index[24 * 11:24 * 12], y.iloc[24 * 11:24 * 12]) == 0
+        pred = online.predict(24)
+        assert pred.index[0] == y.index[24 * 12]
+        expected = online.model.predict(steps=24, last_window=y.iloc[24 * 12 - 24:24 * 12])
+        np.testing.assert_allclose(pred.to_numpy(), expected.to_numpy())
+        np.testing.assert_allclose(pred.to_numpy(), y.iloc[24 * 12:24 * 13].to_numpy(), atol=1e-6)
+    finally:
+        online.close()
+
+def test_missing_or_skipped_hours_are_refused():
+    y = series(24 * 10)
+    online = OnlineForecaster(fitted(y[:-24]), y[:-24], refit_every_hours=None, tz='UTC')
+    try:
+        with pytest.raises(ValueError, match="must not be missing"):
+            online.observe(y.index[-24:-22], [1000.0, np.nan])
+        with pytest.raises(ValueError, match="hour by hour"):
+            online.observe(y.index[-22:-20], [1000.0, 1000.0])
+        assert online.next_hour == y.index[-24]
+    finally:
+        online.close()
+
+def test_refit_keeps_the_full_history_model_warm_startable(tmp_path):
+    y = series(24 * 30)
+    registry = ModelRegistry(tmp_path)
+    forecaster = fitted(y[:24 * 20])
+    registry.save('linear', forecaster, y[:24 * 20], config={'lags': 24})
+
+    online = OnlineForecaster(forecaster, y[:24 * 20], capacity=24 * 7, refit_every_hours=24, registry=registry,
+                              name='linear', tz='UTC')
+    try:
+        online.observe(y.index[24 * 20:24 * 21], y.iloc[24 * 20:24 * 21])
+        online.refit().result()
+        assert online.generation == 1 and online.last_error is None
+        assert online.model is not forecaster
+    finally:
+        online.close()
+
+    # the refit on the 7 buffered days went to its own key; the full-history model still matches y
+    assert registry.meta('linear.online')['n_seen'] == 24 * 7
+    assert registry.meta('linear.online')['config'] == {'lags': 24}
+    assert registry.matches(registry.meta('linear'), y[:24 * 21])
+    warm, meta = registry.warm_start('linear', y[:24 * 21])
+    assert meta['n_seen'] == 24 * 21
+
+def test_observe_and_predict_from_several_threads_during_refits():
+    y = series(24 * 40)
+    online = OnlineForecaster(fitted(y[:24 * 20]), y[:24 * 20], capacity=24 * 7, refit_every_hours=12, tz='UTC')
+    errors, done = [], threading.Event()
+
+    def observe():
+        try:
+            for hour in range(24 * 20, 24 * 40):
+                online.observe(y.index[hour:hour + 1], y.iloc[hour:hour + 1])
+        except Exception as error:
+            errors.append(error)
+        finally:
+            done.set()
+
+    def predict():
+        try:
+            while not done.is_set():
+                pred = online.predict(24)
+                assert not pred.isna().any()
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=observe)] + [threading.Thread(target=predict) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    online.refit().result()
+    online.close()
+
+    assert errors == []
+    assert online.next_hour == y.index[-1] + pd.Timedelta(hours=1)
+    assert online.generation >= 1 and online.last_error is None
+    np.testing.assert_allclose(online.predict(24).to_numpy(), y.iloc[-24:].to_numpy(), atol=1e-6)
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from skforecast.recursive import ForecasterRecursive
+
+from probabilistic import bootstrap_paths
+
+def fitted(exog: bool = False) -> tuple[ForecasterRecursive, pd.Series, pd.DataFrame]:
+    index = pd.date_range('2024-01-01', periods=24 * 20 + 48, freq='h', tz='UTC')
+    hours = pd.DataFrame({'Hour': index.hour.astype(float)}, index=index)
+    y = pd.Series(np.sin(np.arange(len(index)) / 4) + 10, index=index, name='Power')
+    forecaster = ForecasterRecursive(estimator=LinearRegression(), lags=24)
+    forecaster.fit(y[:-48], exog=hours[:-48] if exog else None)
+    return forecaster, y[:-48], hours[-48:]
+
+def test_only_one_step_residuals_are_drawn():
+    forecaster, y, _ = fitted()
+    residuals = pd.DataFrame({'step': np.tile([1, 2], 50), 'residual': np.tile([0.0, 100.0], 50)})
+    point, paths = bootstrap_paths(forecaster, y, residuals, steps=6, n_samples=50)
+    np.testing.assert_allclose(paths, np.broadcast_to(point, paths.shape))
+
+def test_exog_must_start_after_y():
+    forecaster, y, future = fitted(exog=True)
+    residuals = np.zeros(10)
+    point, _ = bootstrap_paths(forecaster, y, residuals, steps=24, n_samples=5, exog=future)
+    assert len(point) == 24
+    with pytest.raises(ValueError, match="hour after the end of y"):
+        bootstrap_paths(forecaster, y, residuals, steps=24, n_samples=5, exog=future.iloc[1:])
+    with pytest.raises(ValueError, match="hour after the end of y"):
+        bootstrap_paths(forecaster, y, residuals, steps=24, n_samples=5, exog=future.iloc[:12])
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from regional_weather import RegionalWeather
+
+STATIONS = {'a': ('A', 52.5, 13.4), 'b': ('B', 51.3, 12.4), 'c': ('C', 54.1, 12.1)}
+TEMPERATURE = {'a': 10.0, 'b': 20.0, 'c': 40.0}
+
+def fetch(station_id: str, year: int) -> pd.DataFrame:
+    hours = pd.date_range(f"{year}-06-01", periods=6, freq='h', tz='UTC')
+    df = pd.DataFrame({'Datetime': hours, 'Temperature': TEMPERATURE[station_id]})
+    if station_id == 'b':
+        df.loc[2, 'Temperature'] = np.nan
+    if station_id == 'c':
+        # station c has not reported the last three hours at all
+        df = df.iloc[:3]
+    return df
+
+def test_weights_are_renormalized_over_reporting_stations(tmp_path):
+    weather = RegionalWeather(STATIONS, weights={'a': 0.5, 'b': 0.3, 'c': 0.2}, cache_root=tmp_path, fetch=fetch)
+    df = weather.fetch_hourly('2023-06-01 00:00', '2023-06-01 05:00', columns=['Temperature'])
+
+    expected = [(0.5 * 10 + 0.3 * 20 + 0.2 * 40) / 1.0] * 2 + [(0.5 * 10 + 0.2 * 40) / 0.7] + [(0.5 * 10 + 0.3 * 20) / 0.8] * 3
+    np.testing.assert_allclose(df['Temperature'], expected)
+    assert df['Stations Reporting'].tolist() == [3, 3, 2, 2, 2, 2]
+
+def test_no_reporting_station_gives_nan_and_weights_are_cached(tmp_path):
+    weather = RegionalWeather(STATIONS, cache_root=tmp_path, fetch=fetch)
+    np.testing.assert_allclose(weather.weights.sum(), 1.0)
+    assert (tmp_path / 'weights.json').exists()
+    np.testing.assert_array_equal(RegionalWeather(STATIONS, cache_root=tmp_path, fetch=fetch).weights, weather.weights)
+
+    df = weather.fetch_hourly('2023-06-01 04:00', '2023-06-01 07:00', columns=['Temperature'])
+    assert df['Temperature'].isna().tolist() == [False, False, True, True]
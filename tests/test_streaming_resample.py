@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from create_dataset import load_dataset
+
+@pytest.mark.parametrize('start, end', [('2024-03-30 12:00', '2024-04-01'), ('2024-10-26 12:00', '2024-10-28')])
+@pytest.mark.parametrize('chunksize', [5, 13, 1000])
+def test_streamed_hours_equal_load_dataset_across_dst(tmp_path, start, end, chunksize):
+    # quarter-hourly readings labelled with local wall times as in the SMARD exports: the spring
+    # switch skips 02:00-02:45, the autumn switch repeats them
+    quarters = pd.date_range(pd.Timestamp(start, tz='UTC'), pd.Timestamp(end, tz='UTC'), freq='15min', inclusive='left')
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'Datetime': quarters.tz_convert('Europe/Berlin').strftime('%Y-%m-%d %H:%M:00'),
+                       'Grid Load': rng.normal(1000, 50, len(quarters)), 'Solar': rng.normal(10, 1, len(quarters))})
+    df.loc[7:9, 'Solar'] = np.nan
+    path = tmp_path / 'quarters.csv'
+    df.to_csv(path, sep=';', index=False)
+
+    expected = load_dataset(str(path))
+    streamed = load_dataset(str(path), chunksize=chunksize)
+    pd.testing.assert_frame_equal(streamed, expected, check_dtype=False, check_index_type=False)
+    # one row per elapsed hour, none lost or doubled at the switch
+    assert (streamed['Datetime'].diff().dropna() == pd.Timedelta(hours=1)).all() and len(streamed) == len(quarters) // 4
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from skforecast.recursive import ForecasterEquivalentDate
+
+from toy_model import seasonal_naive
+
+def hourly(end: str, days: int = 10, tz: str = 'Europe/Berlin') -> pd.Series:
+    end = pd.Timestamp(end, tz=tz)
+    index = pd.date_range(end - pd.Timedelta(days=days), end, freq='h')
+    return pd.Series(np.random.default_rng(0).normal(1000, 100, len(index)), index=index, name='Power')
+
+# origins whose forecast hours (not their days before) fall on the 23-hour spring and 25-hour autumn days,
+# where ForecasterEquivalentDate can look every hour up
+@pytest.mark.parametrize('end, steps', [('2024-03-31 00:00', 24), ('2024-03-30 18:00', 30),
+                                        ('2024-10-27 00:00', 25), ('2024-10-26 21:00', 26), ('2024-06-01 05:00', 48)])
+@pytest.mark.parametrize('n_offsets', [1, 3])
+def test_seasonal_naive_equals_equivalent_date_across_dst(end, steps, n_offsets):
+    y = hourly(end)
+    forecaster = ForecasterEquivalentDate(offset=pd.DateOffset(days=1), n_offsets=n_offsets)
+    forecaster.fit(y)
+    pd.testing.assert_series_equal(seasonal_naive(y, steps, n_offsets=n_offsets), forecaster.predict(steps))
+
+def test_seasonal_naive_takes_the_same_wall_clock_hour_after_a_switch():
+    # the day after the spring switch: 02:00 did not exist the day before, the hour after the gap stands in
+    y = hourly('2024-04-01 00:00')
+    pred = seasonal_naive(y, 24)
+    assert len(pred) == 24
+    assert pred[pd.Timestamp('2024-04-01 05:00', tz='Europe/Berlin')] == y[pd.Timestamp('2024-03-31 05:00', tz='Europe/Berlin')]
+    assert pred[pd.Timestamp('2024-04-01 02:00', tz='Europe/Berlin')] == y[pd.Timestamp('2024-03-31 03:00', tz='Europe/Berlin')]
+
+    # the day after the autumn switch: the repeated 02:00 is read at its first occurrence
+    y = hourly('2024-10-28 00:00')
+    pred = seasonal_naive(y, 24)
+    assert pred[pd.Timestamp('2024-10-28 02:00', tz='Europe/Berlin')] == y[pd.Timestamp('2024-10-27 02:00+02:00')]
+    assert pred[pd.Timestamp('2024-10-28 03:00', tz='Europe/Berlin')] == y[pd.Timestamp('2024-10-27 03:00', tz='Europe/Berlin')]
+
+def test_seasonal_naive_needs_complete_days():
+    y = hourly('2024-06-01 00:00')
+    y.iloc[-5] = np.nan
+    with pytest.raises(ValueError, match="complete"):
+        seasonal_naive(y, 24)
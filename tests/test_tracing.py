@@ -0,0 +1,41 @@
+import json
+import threading
+
+import pytest
+
+from tracing import TRACER, Tracer, count, span, traced
+
+def test_disabled_tracing_records_nothing():
+    assert not TRACER.enabled
+    with traced(None):
+        with span('load', rows=3) as block:
+            block.set(rows=4)
+            count('rows_processed', 4)
+    assert type(span('load')).__name__ == '_NoopSpan'
+    assert TRACER.events == [] and TRACER.counters == {} and TRACER._sampler is None
+    assert all(thread.name != 'trace-memory' for thread in threading.enumerate())
+
+def test_traced_block_exports_spans_and_counters(tmp_path):
+    path = tmp_path / 'trace.json'
+    with traced(str(path)):
+        with span('build', region='50Hertz'):
+            count('bytes', 10)
+            with pytest.raises(RuntimeError):
+                with span('download'):
+                    count('bytes', 5)
+                    raise RuntimeError("chunk failed")
+    assert not TRACER.enabled
+
+    trace = json.loads(path.read_text())
+    spans = {event['name']: event for event in trace['traceEvents'] if event['ph'] == 'X'}
+    assert spans['build']['args']['region'] == '50Hertz' and spans['build']['args']['bytes'] == 15
+    assert spans['download']['args']['bytes'] == 5 and spans['download']['args']['failed']
+    assert trace['otherData']['counters'] == {'bytes': 15}
+
+
+def test_stopped_tracer_returns_the_shared_noop():
+    tracer = Tracer(memory_interval=0)
+    tracer.start()
+    assert tracer.span('x') is not tracer.span('x')
+    tracer.stop()
+    assert tracer.span('x') is tracer.span('y')
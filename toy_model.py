@@ -1,17 +1,24 @@
-import matplotlib.pyplot as plt
+import argparse
+
+import numpy as np
 import pandas as pd
-from skforecast.model_selection import TimeSeriesFold, backtesting_forecaster
-from skforecast.preprocessing import RollingFeatures
-from skforecast.recursive import ForecasterEquivalentDate, ForecasterRecursive
-from lightgbm import LGBMRegressor
-from xgboost import XGBRegressor
-from sklearn.ensemble import RandomForestRegressor
+
+from tracing import span, traced
+
+# matplotlib, skforecast, scikit-learn and the boosting libraries are imported by the functions
+# that use them, so importing this module (and the baseline forecast) stays fast
 
 def plot_predictions(df_power, predictions, model_name, mae):
+    import matplotlib.pyplot as plt
+
     val_week = df_power.loc[predictions.index.min():predictions.index.max()]
     fig, ax = plt.subplots()
     val_week.plot(ax=ax, label='Actual Power', color='tab:blue')
     predictions['pred'].plot(ax=ax, label='Forecast', color='tab:red')
+    if 'lower_bound' in predictions:
+        # bootstrap or conformal interval (probabilistic.py)
+        ax.fill_between(predictions.index, predictions['lower_bound'], predictions['upper_bound'],
+                        color='tab:red', alpha=0.2, label='Interval')
     plt.ylabel("Power [MWh]")
     plt.xlabel("Date")
     plt.title(f"{model_name} with MAE: {mae:.2f} MWh")
@@ -20,33 +27,83 @@ def plot_predictions(df_power, predictions, model_name, mae):
     plt.tight_layout()
     plt.show()
 
-def backtesting(df_power, forecaster, cv):
-    metric, predictions = backtesting_forecaster(
-                            forecaster = forecaster,
-                            y          = df_power.loc['2015-01-01':'2024-03-02']['Power'].asfreq('h'),
-                            cv         = cv,
-                            metric     = 'mean_absolute_error'
-                        )
+def backtest_series(df_power):
+    return df_power.loc['2015-01-01':'2024-03-02']['Power'].asfreq('h')
+
+def backtesting(df_power, forecaster, cv, cached=False, matrix=None, exog=None):
+    from feature_cache import backtesting_cached
+    from skforecast.model_selection import backtesting_forecaster
+
+    with span('backtest', forecaster=type(forecaster).__name__, cached=bool(cached or matrix is not None)) as block:
+        if cached or matrix is not None:
+            # folds slice one prebuilt lag/window matrix instead of rebuilding it on every refit
+            metric, predictions = backtesting_cached(forecaster, backtest_series(df_power), cv, matrix=matrix, exog=exog)
+        else:
+            metric, predictions = backtesting_forecaster(
+                                    forecaster = forecaster,
+                                    y          = backtest_series(df_power),
+                                    cv         = cv,
+                                    exog       = exog,
+                                    metric     = 'mean_absolute_error'
+                                )
+        block.set(rows=len(predictions))
     
     return metric, predictions 
 
 def baseline(data_train):
+    from skforecast.recursive import ForecasterEquivalentDate
+
     forecaster = ForecasterEquivalentDate(offset = pd.DateOffset(days=1), n_offsets = 1)
-    forecaster.fit(y=data_train['Power'])
+    with span('fit', forecaster='ForecasterEquivalentDate', rows=len(data_train)):
+        forecaster.fit(y=data_train['Power'])
 
     return forecaster
 
-def forecaster_recursive(estimator, lags, window_features, data_train):
+def seasonal_naive(y: pd.Series, steps: int = 24, n_offsets: int = 1) -> pd.Series:
+    # what the fitted baseline (ForecasterEquivalentDate, one-day DateOffset) predicts after the end of y:
+    # for every forecast hour the mean of the same local wall-clock hour on the n_offsets latest days
+    # observed before it, computed directly so a forecast needs neither skforecast nor a fit. Where
+    # skforecast fails on a DST switch this answers too: an hour skipped in spring takes the hour after
+    # the gap, an hour repeated in autumn its first (summer time) occurrence
+    index = pd.date_range(y.index[-1] + pd.Timedelta(hours=1), periods=steps, freq='h')
+    wall = (index.tz_localize(None) if index.tz is not None else index).to_numpy()
+    # enough days back to reach n_offsets observed days from the last forecast hour
+    days = np.arange(1, steps // 23 + n_offsets + 2)
+    candidates = pd.DatetimeIndex((wall[:, None] - days * np.timedelta64(1, 'D')).ravel())
+    if y.index.tz is not None:
+        candidates = candidates.tz_localize(y.index.tz, ambiguous=np.ones(len(candidates), dtype=bool),
+                                            nonexistent='shift_forward')
+    observed = (candidates <= y.index[-1]).reshape(steps, len(days))
+    selected = observed & (np.cumsum(observed, axis=1) <= n_offsets)
+    values = y.reindex(candidates).to_numpy(dtype=float).reshape(steps, len(days))
+    if np.isnan(values[selected]).any():
+        raise ValueError(f"y must be complete over the last {n_offsets} days")
+    return pd.Series(np.where(selected, values, 0.0).sum(axis=1) / n_offsets, index=index, name='pred')
+
+def forecaster_recursive(estimator, lags, window_features, data_train, exog=None):
+    from skforecast.recursive import ForecasterRecursive
+
     forecaster = ForecasterRecursive(estimator = estimator, lags = lags, window_features = window_features)
-    forecaster.fit(y=data_train['Power'])
+    with span('fit', forecaster='ForecasterRecursive', estimator=type(estimator).__name__, rows=len(data_train)):
+        forecaster.fit(y=data_train['Power'], exog=exog)
 
     return forecaster
 
-if __name__ == "__main__":
+def run_backtests(root: str = 'data/dataset', plot: bool = True) -> dict:
+    # the baseline and the recursive LightGBM forecaster over the last days of the dataset; returns the MAE per model
+    from skforecast.model_selection import TimeSeriesFold
+    from backtest_harness import MODEL_REGISTRY, build_forecaster
+    from dataset_store import read_dataset
+    from feature_store import EXOG_FEATURES, FeatureStore
+
     # load dataset
-    df = pd.read_csv('data/dataset.csv', delimiter=';')
-    df['Datetime'] = pd.to_datetime(df['Datetime'])
-    df = df.set_index('Datetime').sort_index()
+    with span('load'):
+        df = read_dataset(root, columns=['Power'] + EXOG_FEATURES)
+        df = df.set_index('Datetime').sort_index()
+
+    # calendar, weather and generation forecast inputs, materialized once
+    with span('features'):
+        features = FeatureStore.build(df.reset_index(), columns=EXOG_FEATURES)
 
     # create train and validation sets
     df_power = df[['Power']]
@@ -61,12 +118,25 @@ if __name__ == "__main__":
     # baseline
     model_baseline = baseline(data_train)
     metric_baseline, predictions_baseline = backtesting(df_power, model_baseline, cv)
-    plot_predictions(df_power, predictions_baseline, "Seasonal Naive Forecast", metric_baseline["mean_absolute_error"].values[0])
-
-    # recursive autoregressive model
-    window_features = RollingFeatures(  stats = ['mean', 'std', 'min', 'max'],
-                                        window_sizes = [24*3, 24*7, 24*7, 24*7])
-    estimator = LGBMRegressor(random_state=123, verbose=-1)
-    model_recursive = forecaster_recursive(estimator, lags=24*7, window_features=window_features, data_train=data_train)
-    metric_recursive, predictions_recursive = backtesting(df_power, model_recursive, cv)
-    plot_predictions(df_power, predictions_recursive, "Recursive LGBM Model", metric_recursive["mean_absolute_error"].values[0])
\ No newline at end of file
+    if plot:
+        plot_predictions(df_power, predictions_baseline, "Seasonal Naive Forecast", metric_baseline["mean_absolute_error"].values[0])
+
+    # recursive autoregressive model as configured in MODEL_REGISTRY. The backtest refits it on every
+    # fold, so nothing is loaded from or saved to the model registry here; predict and the forecast
+    # server keep the fitted model there
+    model_recursive = build_forecaster(MODEL_REGISTRY['lgbm_recursive_exog'])
+    metric_recursive, predictions_recursive = backtesting(df_power, model_recursive, cv, cached=True,
+                                                          exog=features.exog_for(backtest_series(df_power).index))
+    if plot:
+        plot_predictions(df_power, predictions_recursive, "Recursive LGBM Model", metric_recursive["mean_absolute_error"].values[0])
+
+    return {'baseline': metric_baseline["mean_absolute_error"].values[0],
+            'lgbm_recursive_exog': metric_recursive["mean_absolute_error"].values[0]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the baseline and the recursive LightGBM forecaster")
+    parser.add_argument('--trace', default=None, help="write a Chrome trace (JSON) of the stages and folds to this path")
+    args = parser.parse_args()
+
+    with traced(args.trace):
+        run_backtests()
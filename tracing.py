@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+def rss_bytes() -> int | None:
+    # resident memory of this process; None where /proc is not available
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+# returned by span() while tracing is off, so an instrumented block costs one attribute check
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+_NOOP = _NoopSpan()
+
+class Span:
+    __slots__ = ('tracer', 'name', 'attrs', 'start_ns', 'counters', 'peak_rss')
+
+    def __init__(self, tracer: 'Tracer', name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.peak_rss = None
+
+    def __enter__(self):
+        self.counters = dict(self.tracer.counters)
+        # latest sample as starting point, /proc is read again only when the span ends
+        self.peak_rss = self.tracer.rss
+        with self.tracer._lock:
+            self.tracer._open.add(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end_ns = time.perf_counter_ns()
+        self.tracer._finish(self, end_ns, failed=exc[0] is not None)
+        return False
+
+    def set(self, **attrs) -> None:
+        # attributes known only inside the block, e.g. rows produced
+        self.attrs.update(attrs)
+
+# spans (nested timed blocks per thread), process-wide counters and a background sampler of the
+# resident memory. Every span records its duration, the counter increments while it was open
+# (of all threads) and the peak RSS sampled during it. Off by default: span() then returns a shared
+# no-op and count() returns immediately
+class Tracer:
+    def __init__(self, memory_interval: float = 0.02):
+        self.enabled = False
+        self.memory_interval = memory_interval
+        self.counters = {}
+        self.events = []
+        self.samples = []
+        self.rss = None
+        self._open = set()
+        self._lock = threading.Lock()
+        self._t0 = 0
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        self.counters, self.events, self.samples = {}, [], []
+        self._t0 = time.perf_counter_ns()
+        self._stop.clear()
+        self.rss = rss_bytes()
+        self.enabled = True
+        if self.memory_interval and rss_bytes() is not None:
+            self._sampler = threading.Thread(target=self._sample, name='trace-memory', daemon=True)
+            self._sampler.start()
+
+    def stop(self) -> None:
+        self.enabled = False
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return _NOOP
+        return Span(self, name, attrs)
+
+    def count(self, name: str, value: float = 1) -> None:
+        # e.g. bytes downloaded, chunks fetched, cache hits, rows processed
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.memory_interval):
+            rss = self.rss = rss_bytes()
+            with self._lock:
+                self.samples.append((time.perf_counter_ns(), rss, dict(self.counters)))
+                for span in self._open:
+                    span.peak_rss = max(span.peak_rss or 0, rss)
+
+    def _finish(self, span: Span, end_ns: int, failed: bool) -> None:
+        rss = rss_bytes()
+        with self._lock:
+            self._open.discard(span)
+            deltas = {name: value - span.counters.get(name, 0) for name, value in self.counters.items()
+                      if value != span.counters.get(name, 0)}
+            peak = max(span.peak_rss or 0, rss or 0) or None
+            self.events.append({'name': span.name, 'start_ns': span.start_ns - self._t0, 'duration_ns': end_ns - span.start_ns,
+                                'thread': threading.get_ident(), 'thread_name': threading.current_thread().name,
+                                'attrs': span.attrs, 'counters': deltas, 'peak_rss_mb': peak / 2**20 if peak else None,
+                                'failed': failed})
+
+    def summary(self) -> dict:
+        # total and maximum time, calls and peak RSS per span name
+        summary = {}
+        for event in self.events:
+            entry = summary.setdefault(event['name'], {'calls': 0, 'total_s': 0.0, 'max_s': 0.0, 'peak_rss_mb': None})
+            seconds = event['duration_ns'] / 1e9
+            entry['calls'] += 1
+            entry['total_s'] += seconds
+            entry['max_s'] = max(entry['max_s'], seconds)
+            if event['peak_rss_mb'] is not None:
+                entry['peak_rss_mb'] = max(entry['peak_rss_mb'] or 0, event['peak_rss_mb'])
+        return summary
+
+    def chrome_trace(self) -> dict:
+        # Trace Event Format (chrome://tracing, Perfetto): complete events per span, counter events
+        # for the memory and counter samples
+        pid = os.getpid()
+        events, threads = [], {}
+        for event in self.events:
+            threads[event['thread']] = event['thread_name']
+            events.append({'name': event['name'], 'ph': 'X', 'pid': pid, 'tid': event['thread'],
+                           'ts': event['start_ns'] / 1000, 'dur': event['duration_ns'] / 1000,
+                           'args': {**event['attrs'], **event['counters'], 'peak_rss_mb': event['peak_rss_mb'],
+                                    **({'failed': True} if event['failed'] else {})}})
+        for t_ns, rss, counters in self.samples:
+            ts = (t_ns - self._t0) / 1000
+            events.append({'name': 'memory', 'ph': 'C', 'pid': pid, 'ts': ts, 'args': {'rss_mb': rss / 2**20}})
+            if counters:
+                events.append({'name': 'counters', 'ph': 'C', 'pid': pid, 'ts': ts, 'args': counters})
+        for tid, name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'counters': self.counters, 'summary': self.summary()}}
+
+    def export(self, path: str) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.chrome_trace(), default=str))
+
+TRACER = Tracer()
+span = TRACER.span
+count = TRACER.count
+
+@contextmanager
+def traced(path: str | None):
+    # traces the block into path (Chrome trace JSON); a None path leaves tracing off
+    if path is None:
+        yield TRACER
+        return
+    TRACER.start()
+    try:
+        yield TRACER
+    finally:
+        TRACER.stop()
+        TRACER.export(path)